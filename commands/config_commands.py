@@ -130,11 +130,37 @@ class ConfigCommands(app_commands.Group, name="config", description="Configuraç
             return
 
         await self.db.set_ai_moderation(interaction.guild.id, ativar)
+        if self.ctx.raid_detector:
+            self.ctx.raid_detector.set_guild_enabled(interaction.guild.id, ativar)
         status = "✅ ativada" if ativar else "⏸️ desativada"
         await interaction.response.send_message(
             f"Moderação por IA {status} para **{interaction.guild.name}**.", ephemeral=True
         )
 
+    # ── Anti-spam ──────────────────────────────────────────────────────────────
+    @app_commands.command(name="spam", description="Define o limite de mensagens por usuário (sem valores, volta ao padrão).")
+    @app_commands.describe(
+        mensagens="Máximo de mensagens dentro da janela",
+        segundos="Tamanho da janela em segundos",
+    )
+    async def set_spam_limits(
+        self,
+        interaction: discord.Interaction,
+        mensagens: Optional[app_commands.Range[int, 1, 100]] = None,
+        segundos: Optional[app_commands.Range[float, 1, 600]] = None,
+    ) -> None:
+        if not self._is_admin(interaction):
+            await interaction.response.send_message("❌ Apenas administradores podem usar este comando.", ephemeral=True)
+            return
+
+        await self.db.set_spam_limits(interaction.guild.id, mensagens, segundos)
+        if self.ctx.spam_detector:
+            self.ctx.spam_detector.set_guild_limits(interaction.guild.id, mensagens, segundos)
+            mensagens, segundos = self.ctx.spam_detector.limits(interaction.guild.id)
+        await interaction.response.send_message(
+            f"✅ Anti-spam: até **{mensagens}** mensagens a cada **{segundos:g}s** por usuário.", ephemeral=True
+        )
+
     # ── Ver configuração atual ─────────────────────────────────────────────────
     @app_commands.command(name="ver", description="Mostra a configuração atual do bot neste servidor.")
     async def show_config(self, interaction: discord.Interaction) -> None:
@@ -148,6 +174,8 @@ class ConfigCommands(app_commands.Group, name="config", description="Configuraç
         allowed = guild_config.get("allowed_channels", [])
         ignored = guild_config.get("ignored_voice_channels", [])
         dyn_roles = guild_config.get("dynamic_roles_config", {})
+        spam_messages = guild_config.get("spam_max_messages")
+        spam_window = guild_config.get("spam_time_window")
 
         def ch_list(ids: list) -> str:
             if not ids:
@@ -170,4 +198,12 @@ class ConfigCommands(app_commands.Group, name="config", description="Configuraç
             value=f"{len(dyn_roles)} cargo(s)" if dyn_roles else "*(padrão do código)*",
             inline=False,
         )
+        embed.add_field(
+            name="🚫 Anti-spam",
+            value=(
+                f"{spam_messages or 'padrão'} mensagens a cada {f'{spam_window:g}s' if spam_window else 'padrão'}"
+                if spam_messages or spam_window else "*(padrão do código)*"
+            ),
+            inline=False,
+        )
         await interaction.response.send_message(embed=embed, ephemeral=True)
@@ -17,18 +17,21 @@ class ContextCommands(app_commands.Group):
     @app_commands.checks.has_permissions(administrator=True)
     async def set_theme(self, interaction: discord.Interaction, text: str):
         await self.db.set_server_context(interaction.guild_id, "theme", text)
+        self.memory_manager.invalidate_server_context(interaction.guild_id)
         await interaction.response.send_message(f"✅ Tema do servidor atualizado para: **{text}**")
 
     @app_commands.command(name="rules", description="Define regras principais que o bot deve saber")
     @app_commands.checks.has_permissions(administrator=True)
     async def set_rules(self, interaction: discord.Interaction, text: str):
         await self.db.set_server_context(interaction.guild_id, "rules", text)
+        self.memory_manager.invalidate_server_context(interaction.guild_id)
         await interaction.response.send_message(f"✅ Regras de contexto atualizadas.")
 
     @app_commands.command(name="tone", description="Define o tom de resposta desejado (Ex: 'Zoeiro', 'Formal')")
     @app_commands.checks.has_permissions(administrator=True)
     async def set_tone(self, interaction: discord.Interaction, text: str):
         await self.db.set_server_context(interaction.guild_id, "tone", text)
+        self.memory_manager.invalidate_server_context(interaction.guild_id)
         await interaction.response.send_message(f"✅ Tom do bot atualizado para: **{text}**")
 
     @app_commands.command(name="view", description="Vê o contexto atual do servidor")
@@ -54,4 +57,5 @@ class ContextCommands(app_commands.Group):
             "tone_preference": None,
             "interaction_summary": ""
         })
+        self.memory_manager.invalidate_profile(interaction.user.id, interaction.guild_id)
         await interaction.response.send_message("✅ Seu perfil de preferências na IA foi resetado.")
@@ -6,6 +6,8 @@ from database import Database
 import logging
 from datetime import datetime
 from config import now_brt
+from utils.command_cache import CommandCache
+from typing import Optional
 
 
 logger = logging.getLogger(__name__)
@@ -14,9 +16,18 @@ logger = logging.getLogger(__name__)
 class GamesCommands(app_commands.Group):
     """Grupo de comandos de jogos e atividades."""
     
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, cache: Optional[CommandCache] = None):
         super().__init__(name="games", description="Estatísticas de jogos e atividades")
         self.db = db
+        self.cache = cache or CommandCache()
+
+    async def _top_activities(self, guild_id: int, limit: int, days: int):
+        """Top jogos via cache (busca sempre 25 e recorta)."""
+        activities = await self.cache.get_or_load(
+            guild_id, "games_top", {"days": days},
+            lambda: self.db.get_top_activities(guild_id, 25, days)
+        )
+        return activities[:limit]
     
     def format_duration(self, seconds: int) -> str:
         """Formata segundos em string legível."""
@@ -50,11 +61,7 @@ class GamesCommands(app_commands.Group):
             days = max(1, min(days, 365))
             
             # Busca atividades
-            activities = await self.db.get_top_activities(
-                interaction.guild.id,
-                limit,
-                days
-            )
+            activities = await self._top_activities(interaction.guild.id, limit, days)
             
             if not activities:
                 await interaction.followup.send(
@@ -190,9 +197,10 @@ class GamesCommands(app_commands.Group):
                 return
             
             # Busca atividades do ano
-            activities = await self.db.get_yearly_activities(
-                interaction.guild.id,
-                year
+            guild_id = interaction.guild.id
+            activities = await self.cache.get_or_load(
+                guild_id, "games_yearly", {"year": year},
+                lambda: self.db.get_yearly_activities(guild_id, year)
             )
             
             if not activities:
@@ -280,11 +288,7 @@ class GamesCommands(app_commands.Group):
         
         try:
             # Busca top atividades de todos os tempos (último ano)
-            activities = await self.db.get_top_activities(
-                interaction.guild.id,
-                limit=5,
-                days=365
-            )
+            activities = await self._top_activities(interaction.guild.id, limit=5, days=365)
             
             if not activities:
                 await interaction.followup.send(
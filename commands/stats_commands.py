@@ -4,6 +4,7 @@ import discord
 from discord import app_commands
 from database import Database
 from utils.embed_builder import StatsEmbedBuilder
+from utils.command_cache import CommandCache
 from typing import Optional, Any
 import logging
 from config import now_brt
@@ -16,10 +17,15 @@ class StatsCommands(app_commands.Group):
     """Grupo de comandos de estatísticas."""
     
     
-    def __init__(self, db: Database, leaderboard_updater: Any = None):
+    def __init__(self, db: Database, leaderboard_updater: Any = None, user_stats: Any = None,
+                 cache: Optional[CommandCache] = None):
         super().__init__(name="stats", description="Comandos de estatísticas do servidor")
         self.db = db
         self.leaderboard_updater = leaderboard_updater
+        # UserStatsService (cache de /stats me); sem ele consulta o banco direto
+        self.user_stats = user_stats or db
+        # Rankings buscam sempre o limite máximo; o comando recorta o que pediu
+        self.cache = cache or CommandCache()
         self.embed_builder = StatsEmbedBuilder()
     
     @app_commands.command(name="setup_leaderboard", description="Configura um leaderboard persistente neste canal")
@@ -78,7 +84,11 @@ class StatsCommands(app_commands.Group):
         await interaction.response.defer()
         
         try:
-            stats = await self.db.get_server_stats(interaction.guild.id, days)
+            guild_id = interaction.guild.id
+            stats = await self.cache.get_or_load(
+                guild_id, "stats_server", {"days": days},
+                lambda: self.db.get_server_stats(guild_id, days)
+            )
             embed = self.embed_builder.build_server_stats(stats, interaction.guild.name)
             await interaction.followup.send(embed=embed)
             
@@ -103,7 +113,7 @@ class StatsCommands(app_commands.Group):
                 days = (now - start_of_year).days + 1
 
             
-            stats = await self.db.get_user_stats(
+            stats = await self.user_stats.get_user_stats(
                 interaction.user.id, 
                 interaction.guild.id, 
                 days
@@ -140,7 +150,7 @@ class StatsCommands(app_commands.Group):
                 days = (now - start_of_year).days + 1
 
 
-            stats = await self.db.get_user_stats(user.id, interaction.guild.id, days)
+            stats = await self.user_stats.get_user_stats(user.id, interaction.guild.id, days)
             embed = self.embed_builder.build_user_stats(
                 stats, 
                 user.name,
@@ -169,11 +179,12 @@ class StatsCommands(app_commands.Group):
             # Limita entre 1 e 25
             limit = max(1, min(limit, 25))
             
-            top_users = await self.db.get_top_users_by_messages(
-                interaction.guild.id, 
-                limit, 
-                days
+            guild_id = interaction.guild.id
+            top_users = await self.cache.get_or_load(
+                guild_id, "stats_top", {"days": days},
+                lambda: self.db.get_top_users_by_messages(guild_id, 25, days)
             )
+            top_users = top_users[:limit]
             embed = self.embed_builder.build_top_users(top_users, days)
             await interaction.followup.send(embed=embed)
             
@@ -198,11 +209,12 @@ class StatsCommands(app_commands.Group):
             # Limita entre 1 e 25
             limit = max(1, min(limit, 25))
             
-            top_channels = await self.db.get_top_channels(
-                interaction.guild.id, 
-                limit, 
-                days
+            guild_id = interaction.guild.id
+            top_channels = await self.cache.get_or_load(
+                guild_id, "stats_channels", {"days": days},
+                lambda: self.db.get_top_channels(guild_id, 25, days)
             )
+            top_channels = top_channels[:limit]
             embed = self.embed_builder.build_top_channels(top_channels, days)
             await interaction.followup.send(embed=embed)
             
@@ -232,7 +244,12 @@ class StatsCommands(app_commands.Group):
                 days = (now - start_of_year).days + 1
 
             
-            leaderboard = await self.db.get_leaderboard(limit, days, interaction.guild.id)
+            guild_id = interaction.guild.id
+            leaderboard = await self.cache.get_or_load(
+                guild_id, "stats_leaderboard", {"days": days},
+                lambda: self.db.get_leaderboard(25, days, guild_id)
+            )
+            leaderboard = leaderboard[:limit]
             embed = self.embed_builder.build_leaderboard(leaderboard)
             await interaction.followup.send(embed=embed)
             
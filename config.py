@@ -23,6 +23,43 @@ GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
 GEMINI_CHAT_API_KEY: str = os.getenv("GEMINI_CHAT_API_KEY", "") or GEMINI_API_KEY
 GEMINI_CHAT_MODEL: str = os.getenv("GEMINI_CHAT_MODEL", "gemini-2.5-flash")
 GEMINI_MODERATION_MODEL: str = os.getenv("GEMINI_MODERATION_MODEL", "gemini-2.5-flash")
+GEMINI_EMBEDDING_MODEL: str = os.getenv("GEMINI_EMBEDDING_MODEL", "models/text-embedding-004")
+
+# Pool de chaves do gateway de LLM: cada chave tem seu próprio cliente e limites.
+# GEMINI_API_KEYS aceita chaves extras separadas por vírgula.
+GEMINI_API_KEYS: list[str] = list(dict.fromkeys(
+    key for key in [
+        GEMINI_API_KEY,
+        GEMINI_CHAT_API_KEY,
+        *(x.strip() for x in os.getenv("GEMINI_API_KEYS", "").split(",")),
+    ] if key
+))
+# "gemini" (API real) ou "fake" (backend local determinístico, sem rede)
+LLM_BACKEND: str = os.getenv("LLM_BACKEND", "gemini").lower()
+# Limites por chave e modelo: (requisições/min, tokens/min)
+GEMINI_DEFAULT_LIMITS: tuple[int, int] = (
+    int(os.getenv("GEMINI_RPM", "15")),
+    int(os.getenv("GEMINI_TPM", "1000000")),
+)
+GEMINI_MODEL_LIMITS: dict[str, tuple[int, int]] = {
+    GEMINI_EMBEDDING_MODEL: (
+        int(os.getenv("GEMINI_EMBED_RPM", "1500")),
+        int(os.getenv("GEMINI_EMBED_TPM", "1000000")),
+    ),
+}
+
+# Respostas do chat chegam em streaming e a mensagem é editada progressivamente
+GEMINI_CHAT_STREAMING: bool = os.getenv("GEMINI_CHAT_STREAMING", "true").lower() not in ("0", "false", "no")
+CHAT_STREAM_EDIT_INTERVAL: float = float(os.getenv("CHAT_STREAM_EDIT_INTERVAL", "1.0"))  # segundos entre edições
+
+# Cache semântico de respostas: pergunta quase idêntica no mesmo servidor reutiliza a resposta
+CHAT_ANSWER_CACHE: bool = os.getenv("CHAT_ANSWER_CACHE", "false").lower() in ("1", "true", "yes")
+CHAT_ANSWER_CACHE_THRESHOLD: float = float(os.getenv("CHAT_ANSWER_CACHE_THRESHOLD", "0.95"))  # similaridade mínima
+CHAT_ANSWER_CACHE_TTL: int = int(os.getenv("CHAT_ANSWER_CACHE_TTL", "1800"))  # segundos
+
+# Orçamento (tokens estimados) do prompt de conversa: contexto, histórico e mensagem.
+# Quando não cabe tudo, entram primeiro as partes mais relevantes/recentes
+CHAT_PROMPT_TOKEN_BUDGET: int = int(os.getenv("CHAT_PROMPT_TOKEN_BUDGET", "3000"))
 
 # Banco de dados
 DATABASE_URL: str = os.getenv("DATABASE_URL", "")
@@ -52,6 +89,35 @@ DEFAULT_DYNAMIC_ROLES_CONFIG: dict[str, int] = {}
 INTERVALO_ANALISE: int = 60          # segundos entre processamentos de lote
 TAMANHO_LOTE_MINIMO: int = 10        # mínimo de mensagens por lote
 MODERATION_CONFIDENCE_THRESHOLD: float = 0.80  # confiança mínima para deletar
+MODERATION_MAX_BUFFER: int = 2000    # mensagens aguardando moderação (as mais antigas saem)
+MODERATION_MAX_DELAY: int = 900      # segundos; mensagens mais velhas não voltam ao buffer
+
+# ── Particionamento e retenção ─────────────────────────────────────────────────
+# Tabelas de eventos são particionadas por mês. A retenção é em meses completos;
+# 0 mantém o histórico para sempre (interaction_points alimenta o total de pontos).
+PARTITION_MONTHS_AHEAD: int = int(os.getenv("PARTITION_MONTHS_AHEAD", "2"))
+PARTITION_RETENTION_MONTHS: dict[str, int] = {
+    "messages": int(os.getenv("RETENTION_MESSAGES_MONTHS", "24")),
+    "voice_activity": int(os.getenv("RETENTION_VOICE_MONTHS", "24")),
+    "user_activities": int(os.getenv("RETENTION_ACTIVITIES_MONTHS", "24")),
+    "interaction_points": int(os.getenv("RETENTION_POINTS_MONTHS", "0")),
+}
+# "archive" move a partição expirada para o schema archive; "drop" a remove.
+RETENTION_ACTION: str = os.getenv("RETENTION_ACTION", "archive")
+
+# ── Memórias do bot ────────────────────────────────────────────────────────────
+# Similaridade (cosseno) a partir da qual um fato novo é mesclado ao já salvo
+MEMORY_DEDUP_THRESHOLD: float = float(os.getenv("MEMORY_DEDUP_THRESHOLD", "0.92"))
+# Compactação diária: agrupa memórias antigas parecidas e resume cada grupo
+MEMORY_COMPACTION_THRESHOLD: float = float(os.getenv("MEMORY_COMPACTION_THRESHOLD", "0.85"))
+MEMORY_COMPACTION_MIN_AGE_DAYS: int = int(os.getenv("MEMORY_COMPACTION_MIN_AGE_DAYS", "30"))
+MEMORY_MAX_PER_USER: int = int(os.getenv("MEMORY_MAX_PER_USER", "50"))
+MEMORY_MAX_PER_GUILD: int = int(os.getenv("MEMORY_MAX_PER_GUILD", "2000"))
+# Índice das memórias: "full" (vector), "half" (halfvec, 2x menor) ou "binary"
+# (bit, 32x menor); os quantizados reordenam os candidatos em precisão total
+MEMORY_VECTOR_STORAGE: str = os.getenv("MEMORY_VECTOR_STORAGE", "full").lower()
+# Candidatos examinados pelo HNSW na busca das memórias globais do servidor (hnsw.ef_search)
+MEMORY_SEARCH_CANDIDATES: int = int(os.getenv("MEMORY_SEARCH_CANDIDATES", "200"))
 
 # ── 3. Timezone ────────────────────────────────────────────────────────────────
 BRT = ZoneInfo("America/Sao_Paulo")
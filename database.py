@@ -1,15 +1,198 @@
 # database.py - Módulo de Gerenciamento do Banco de Dados PostgreSQL
 
+import asyncio
 import asyncpg
 import os
-from datetime import datetime, timedelta
+import struct
+from datetime import date, datetime, timedelta, timezone
 from typing import Optional, List, Dict, Any, Union
 import json
 import logging
 
+from config import (
+    MEMORY_DEDUP_THRESHOLD, MEMORY_MAX_PER_GUILD, MEMORY_MAX_PER_USER, MEMORY_SEARCH_CANDIDATES,
+    MEMORY_VECTOR_STORAGE,
+    PARTITION_MONTHS_AHEAD, PARTITION_RETENTION_MONTHS, RETENTION_ACTION,
+)
+
 logger = logging.getLogger(__name__)
 
 
+# Tabelas de eventos particionadas por mês (RANGE na coluna de tempo).
+# pk: chave primária original (a PK particionada passa a ser (pk, column)).
+# rollup: tabela agregada que precisa cobrir o mês antes de aplicar retenção.
+PARTITIONED_TABLES: Dict[str, Dict[str, Any]] = {
+    "messages": {
+        "column": "created_at",
+        "pk": "message_id",
+        "foreign_keys": [
+            "FOREIGN KEY (user_id) REFERENCES users(user_id)",
+            "FOREIGN KEY (channel_id) REFERENCES channels(channel_id)",
+        ],
+        "rollup": "daily_message_rollup",
+    },
+    "voice_activity": {
+        "column": "joined_at",
+        "pk": "id",
+        "foreign_keys": [
+            "FOREIGN KEY (user_id) REFERENCES users(user_id)",
+            "FOREIGN KEY (channel_id) REFERENCES channels(channel_id)",
+        ],
+        "rollup": "daily_user_stats",
+    },
+    "user_activities": {
+        "column": "started_at",
+        "pk": "id",
+        "foreign_keys": ["FOREIGN KEY (user_id) REFERENCES users(user_id)"],
+        "rollup": None,
+    },
+    "interaction_points": {
+        "column": "created_at",
+        # id só existe no layout antigo (uma linha por evento); ver _compact_interaction_points
+        "pk": "id",
+        "foreign_keys": ["FOREIGN KEY (user_id) REFERENCES users(user_id)"],
+        "rollup": "daily_user_stats",
+    },
+}
+
+
+# Tipos de interação gravados como SMALLINT em interaction_points.
+# Os códigos são fixos; tipos novos recebem o próximo código livre em interaction_types.
+INTERACTION_TYPES: Dict[str, int] = {
+    "message": 1,
+    "message_short": 2,
+    "message_long": 3,
+    "reaction_given": 4,
+    "reaction_received": 5,
+    "minute_tick": 6,
+    "penalty": 7,
+    "voice": 8,
+    "voice_base": 9,
+    "voice_crowd_bonus": 10,
+    "streaming_bonus": 11,
+}
+
+
+def _month_start(dt: datetime) -> datetime:
+    """Retorna o primeiro instante do mês de `dt`."""
+    return datetime(dt.year, dt.month, 1)
+
+
+def _add_months(dt: datetime, months: int) -> datetime:
+    """Soma (ou subtrai) meses a um início de mês."""
+    index = dt.year * 12 + (dt.month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(table: str, month: datetime) -> str:
+    """Nome da partição mensal: messages_p202501."""
+    return f"{table}_p{month.year:04d}{month.month:02d}"
+
+
+def _parse_partition_month(table: str, name: str) -> Optional[datetime]:
+    """Extrai o mês de uma partição criada por _partition_name (None se não for)."""
+    prefix = f"{table}_p"
+    suffix = name[len(prefix):]
+    if not name.startswith(prefix) or len(suffix) != 6 or not suffix.isdigit():
+        return None
+    year, month = int(suffix[:4]), int(suffix[4:])
+    if not 1 <= month <= 12:
+        return None
+    return datetime(year, month, 1)
+
+
+def _expired_partitions(table: str, partition_names: List[str], now: datetime,
+                        retention_months: int) -> List[str]:
+    """Partições cujo mês terminou antes da janela de retenção (0 = nunca expira)."""
+    if retention_months <= 0:
+        return []
+    cutoff = _add_months(_month_start(now), -retention_months)
+    expired = []
+    for name in partition_names:
+        month = _parse_partition_month(table, name)
+        if month is not None and _add_months(month, 1) <= cutoff:
+            expired.append(name)
+    return sorted(expired)
+
+
+def _rollup_days(cutoff: datetime, covered_until: Optional[date]) -> Optional[tuple]:
+    """Dias inteiros [início, fim) de uma janela iniciada em `cutoff` já cobertos pelo rollup."""
+    if covered_until is None:
+        return None
+    first = cutoff.date()
+    if cutoff.time() != datetime.min.time():
+        first += timedelta(days=1)
+    if covered_until <= first:
+        return None
+    return first, covered_until
+
+
+def _parse_version(version: Optional[str]) -> tuple:
+    """'0.8.0' -> (0, 8, 0); ignora sufixos não numéricos."""
+    parts = []
+    for piece in (version or "").split("."):
+        digits = "".join(ch for ch in piece if ch.isdigit())
+        if not digits:
+            break
+        parts.append(int(digits))
+    return tuple(parts)
+
+
+# Dimensão dos embeddings (text-embedding-004)
+EMBEDDING_DIM = 768
+
+# Índices HNSW por modo de armazenamento (MEMORY_VECTOR_STORAGE). Os quantizados
+# indexam uma expressão sobre a coluna vector: a precisão total continua na tabela
+# para o re-rank, e as linhas existentes entram no índice sem reescrita.
+_MEMORY_VECTOR_INDEXES = {
+    "full": ("idx_bot_memories_embedding", "(embedding vector_cosine_ops)"),
+    "half": ("idx_bot_memories_embedding_half", f"((embedding::halfvec({EMBEDDING_DIM})) halfvec_cosine_ops)"),
+    "binary": ("idx_bot_memories_embedding_bin", f"((binary_quantize(embedding)::bit({EMBEDDING_DIM})) bit_hamming_ops)"),
+}
+# Ordenação que casa com cada índice ($1 = embedding da consulta)
+_MEMORY_VECTOR_ORDER = {
+    "full": "embedding <=> $1::vector",
+    "half": f"embedding::halfvec({EMBEDDING_DIM}) <=> $1::vector::halfvec({EMBEDDING_DIM})",
+    "binary": f"binary_quantize(embedding)::bit({EMBEDDING_DIM}) <~> binary_quantize($1::vector)",
+}
+
+
+def _encode_vector(values: List[float]) -> bytes:
+    """Formato binário do pgvector: dim (int16), reservado (int16), float4 big-endian."""
+    return struct.pack(f">HH{len(values)}f", len(values), 0, *values)
+
+
+def _decode_vector(data: bytes) -> List[float]:
+    dim, _ = struct.unpack_from(">HH", data)
+    return list(struct.unpack_from(f">{dim}f", data, 4))
+
+
+def _encode_halfvec(values: List[float]) -> bytes:
+    return struct.pack(f">HH{len(values)}e", len(values), 0, *values)
+
+
+def _decode_halfvec(data: bytes) -> List[float]:
+    dim, _ = struct.unpack_from(">HH", data)
+    return list(struct.unpack_from(f">{dim}e", data, 4))
+
+
+def _pack_embedding_blob(values: List[float]) -> bytes:
+    """float32 little-endian para embedding_blob (lido com numpy.frombuffer '<f4')."""
+    return struct.pack(f"<{len(values)}f", *values)
+
+
+_VECTOR_CODECS = {
+    "vector": (_encode_vector, _decode_vector),
+    "halfvec": (_encode_halfvec, _decode_halfvec),
+}
+
+
+def _snowflake_time(snowflake: int) -> datetime:
+    """Converte um ID do Discord no instante de criação (UTC naive)."""
+    ms = (snowflake >> 22) + 1420070400000
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).replace(tzinfo=None)
+
+
 class Database:
     """Gerenciador de banco de dados PostgreSQL para estatísticas do bot."""
     
@@ -23,6 +206,11 @@ class Database:
         self.database_url = database_url
         self.pool: Optional[asyncpg.Pool] = None
         self.has_vector = True
+        # Versão do pgvector (detectada no initialize_schema); define a estratégia de busca
+        self.vector_version: tuple = ()
+        self.vector_storage = "full"  # Modo efetivo do índice de bot_memories
+        # Cache nome -> código de interaction_types (carregado no initialize_schema)
+        self.interaction_type_ids: Dict[str, int] = dict(INTERACTION_TYPES)
     
     async def connect(self):
         """Cria o connection pool e inicializa o schema."""
@@ -32,14 +220,31 @@ class Database:
                 min_size=2,
                 max_size=10,
                 command_timeout=60,
-                statement_cache_size=0  # Desabilita prepared statements para compatibilidade com pgbouncer
+                statement_cache_size=0,  # Desabilita prepared statements para compatibilidade com pgbouncer
+                init=self._init_connection,
             )
             logger.info("✅ Conectado ao banco de dados PostgreSQL")
             await self.initialize_schema()
+            # Conexões abertas antes do CREATE EXTENSION não têm os codecs do pgvector
+            await self.pool.expire_connections()
         except Exception as e:
             logger.error(f"❌ Erro ao conectar ao banco de dados: {e}")
             raise
     
+    async def _init_connection(self, conn):
+        """Registra codecs binários para vector/halfvec: embeddings vão como float4, não como texto."""
+        rows = await conn.fetch("""
+            SELECT t.typname, n.nspname
+            FROM pg_type t JOIN pg_namespace n ON n.oid = t.typnamespace
+            WHERE t.typname = ANY($1::text[])
+        """, list(_VECTOR_CODECS))
+        for row in rows:
+            encoder, decoder = _VECTOR_CODECS[row['typname']]
+            await conn.set_type_codec(
+                row['typname'], schema=row['nspname'],
+                encoder=encoder, decoder=decoder, format='binary',
+            )
+
     async def disconnect(self):
         """Fecha o connection pool."""
         if self.pool:
@@ -79,25 +284,26 @@ class Database:
                 )
             """)
             
-            # Tabela de mensagens
+            # Tabela de mensagens (particionada por mês em created_at)
             await conn.execute("""
                 CREATE TABLE IF NOT EXISTS messages (
-                    message_id BIGINT PRIMARY KEY,
+                    message_id BIGINT NOT NULL,
                     user_id BIGINT NOT NULL REFERENCES users(user_id),
                     channel_id BIGINT NOT NULL REFERENCES channels(channel_id),
                     guild_id BIGINT NOT NULL,
                     content_length INTEGER,
                     has_attachments BOOLEAN DEFAULT FALSE,
                     has_embeds BOOLEAN DEFAULT FALSE,
-                    created_at TIMESTAMP DEFAULT NOW(),
-                    was_moderated BOOLEAN DEFAULT FALSE
-                )
+                    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                    was_moderated BOOLEAN DEFAULT FALSE,
+                    PRIMARY KEY (message_id, created_at)
+                ) PARTITION BY RANGE (created_at)
             """)
             
-            # Tabela de atividade de voz
+            # Tabela de atividade de voz (particionada por mês em joined_at)
             await conn.execute("""
                 CREATE TABLE IF NOT EXISTS voice_activity (
-                    id SERIAL PRIMARY KEY,
+                    id SERIAL,
                     user_id BIGINT NOT NULL REFERENCES users(user_id),
                     channel_id BIGINT NOT NULL REFERENCES channels(channel_id),
                     guild_id BIGINT NOT NULL,
@@ -105,8 +311,9 @@ class Database:
                     left_at TIMESTAMP,
                     duration_seconds INTEGER,
                     was_muted BOOLEAN DEFAULT FALSE,
-                    was_deafened BOOLEAN DEFAULT FALSE
-                )
+                    was_deafened BOOLEAN DEFAULT FALSE,
+                    PRIMARY KEY (id, joined_at)
+                ) PARTITION BY RANGE (joined_at)
             """)
             
             # Tabela de estatísticas diárias agregadas
@@ -125,6 +332,22 @@ class Database:
                 )
             """)
             
+            # Rollup diário de mensagens por (guild, dia, canal, usuário).
+            # Guarda pares e não só totais para que COUNT(DISTINCT) continue exato.
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS daily_message_rollup (
+                    guild_id BIGINT NOT NULL,
+                    date DATE NOT NULL,
+                    channel_id BIGINT NOT NULL,
+                    user_id BIGINT NOT NULL,
+                    messages INTEGER NOT NULL,
+                    moderated INTEGER NOT NULL,
+                    PRIMARY KEY (guild_id, date, channel_id, user_id)
+                )
+            """)
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_message_rollup_date ON daily_message_rollup(date)")
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_message_rollup_user ON daily_message_rollup(guild_id, user_id, date)")
+            
             # Tabela de datas de entrada de membros
             await conn.execute("""
                 CREATE TABLE IF NOT EXISTS member_join_dates (
@@ -158,6 +381,8 @@ class Database:
                     ignored_voice_channels BIGINT[] DEFAULT '{}',
                     announcement_channel_id BIGINT,
                     dynamic_roles_config JSONB DEFAULT '{}',
+                    spam_max_messages INTEGER,
+                    spam_time_window REAL,
                     updated_at TIMESTAMP DEFAULT NOW()
                 )
             """)
@@ -168,6 +393,8 @@ class Database:
                 "ignored_voice_channels BIGINT[] DEFAULT '{}'",
                 "announcement_channel_id BIGINT",
                 "dynamic_roles_config JSONB DEFAULT '{}'",
+                "spam_max_messages INTEGER",
+                "spam_time_window REAL",
             ]:
                 col_name = col_def.split()[0]
                 try:
@@ -213,31 +440,71 @@ class Database:
                 )
             """)
             
-            # Tabela de atividades de usuários (jogos/presença)
+            # Tabela de atividades de usuários (jogos/presença, particionada por mês em started_at)
             await conn.execute("""
                 CREATE TABLE IF NOT EXISTS user_activities (
-                    id SERIAL PRIMARY KEY,
+                    id SERIAL,
                     user_id BIGINT NOT NULL REFERENCES users(user_id),
                     guild_id BIGINT NOT NULL,
                     activity_name TEXT NOT NULL,
                     activity_type TEXT,
                     started_at TIMESTAMP NOT NULL,
                     ended_at TIMESTAMP,
-                    duration_seconds INTEGER
-                )
+                    duration_seconds INTEGER,
+                    PRIMARY KEY (id, started_at)
+                ) PARTITION BY RANGE (started_at)
             """)
 
             
-            # Tabela de pontos de interação
+            # Enum dos tipos de interação (interaction_points guarda só o código)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS interaction_types (
+                    type_id SMALLINT PRIMARY KEY,
+                    name TEXT NOT NULL UNIQUE
+                )
+            """)
+            await conn.execute("""
+                INSERT INTO interaction_types (type_id, name)
+                SELECT * FROM unnest($1::smallint[], $2::text[])
+                ON CONFLICT DO NOTHING
+            """, list(INTERACTION_TYPES.values()), list(INTERACTION_TYPES.keys()))
+
+            # Tabela de pontos de interação (particionada por mês em created_at).
+            # Cada linha é um bucket (guild, usuário, tipo, hora): created_at é o início
+            # da hora e event_count quantas concessões foram somadas em points.
             await conn.execute("""
                 CREATE TABLE IF NOT EXISTS interaction_points (
-                    id SERIAL PRIMARY KEY,
                     user_id BIGINT NOT NULL REFERENCES users(user_id),
+                    guild_id BIGINT,
+                    type_id SMALLINT NOT NULL REFERENCES interaction_types(type_id),
+                    created_at TIMESTAMP NOT NULL DEFAULT date_trunc('hour', NOW()),
                     points INTEGER NOT NULL,
-                    interaction_type TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT NOW()
-                )
+                    event_count INTEGER NOT NULL DEFAULT 1
+                ) PARTITION BY RANGE (created_at)
             """)
+
+            # guild_id foi adicionado depois da criação original da tabela
+            try:
+                await conn.execute("ALTER TABLE interaction_points ADD COLUMN IF NOT EXISTS guild_id BIGINT")
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao tentar adicionar coluna guild_id em interaction_points: {e}")
+
+            # Converte heaps antigos em tabelas particionadas e garante as partições do período
+            for table in PARTITIONED_TABLES:
+                try:
+                    await self._migrate_to_partitioned(conn, table)
+                    await self._ensure_partitions(conn, table)
+                except Exception as e:
+                    logger.error(f"❌ Erro ao particionar tabela {table}: {e}")
+
+            # Compacta o histórico de pontos (uma linha por evento) em buckets por hora
+            try:
+                await self._compact_interaction_points(conn)
+            except Exception as e:
+                logger.error(f"❌ Erro ao compactar interaction_points: {e}")
+
+            rows = await conn.fetch("SELECT type_id, name FROM interaction_types")
+            self.interaction_type_ids = {row['name']: row['type_id'] for row in rows}
             
             # Tabela de configuração do leaderboard persistente
             await conn.execute("""
@@ -261,13 +528,32 @@ class Database:
                 )
             """)
             
-            # Índices para melhor performance
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_user ON messages(user_id)")
+            # Índices de uma coluna substituídos pelos compostos/BRIN abaixo
+            await conn.execute("""
+                DROP INDEX IF EXISTS idx_messages_user, idx_messages_created, idx_messages_guild,
+                    idx_voice_guild, idx_activities_user, idx_activities_guild,
+                    idx_activities_started, idx_interaction_points_user
+            """)
+
+            # Índices para melhor performance.
+            # Consultas filtram por guild/usuário + janela de tempo; as colunas de tempo
+            # crescem junto com a inserção, então BRIN cobre varreduras só por período.
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_guild_created ON messages(guild_id, created_at)")
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_user_guild_created ON messages(user_id, guild_id, created_at)")
             await conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_channel ON messages(channel_id)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_created ON messages(created_at)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_guild ON messages(guild_id)")
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_created_brin ON messages USING brin(created_at)")
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_messages_moderated
+                ON messages(guild_id, created_at) WHERE was_moderated = TRUE
+            """)
             await conn.execute("CREATE INDEX IF NOT EXISTS idx_voice_user ON voice_activity(user_id)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_voice_guild ON voice_activity(guild_id)")
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_voice_guild_joined ON voice_activity(guild_id, joined_at)")
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_voice_joined_brin ON voice_activity USING brin(joined_at)")
+            # Sessões abertas (update_voice_leave / get_open_voice_sessions)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_voice_open
+                ON voice_activity(user_id, channel_id) WHERE left_at IS NULL
+            """)
             await conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_stats_guild_date ON daily_stats(guild_id, date)")
             
             # Índices para novas tabelas
@@ -275,11 +561,37 @@ class Database:
             await conn.execute("CREATE INDEX IF NOT EXISTS idx_auto_role_guild ON auto_role_config(guild_id)")
             await conn.execute("CREATE INDEX IF NOT EXISTS idx_giveaways_guild ON giveaways(guild_id)")
             await conn.execute("CREATE INDEX IF NOT EXISTS idx_giveaways_ended ON giveaways(ended, ends_at)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_activities_user ON user_activities(user_id)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_activities_guild ON user_activities(guild_id)")
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_activities_guild_started ON user_activities(guild_id, started_at)")
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_activities_user_guild_started ON user_activities(user_id, guild_id, started_at)")
             await conn.execute("CREATE INDEX IF NOT EXISTS idx_activities_name ON user_activities(activity_name)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_activities_started ON user_activities(started_at)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_interaction_points_user ON interaction_points(user_id)")
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_activities_started_brin ON user_activities USING brin(started_at)")
+            # Atividades abertas (end_activity)
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_activities_open ON user_activities(id) WHERE ended_at IS NULL")
+            # Rankings por guild/período leem só o índice (index-only scan)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_interaction_points_guild_created
+                ON interaction_points(guild_id, created_at) INCLUDE (user_id, points)
+            """)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_interaction_points_user_created
+                ON interaction_points(user_id, created_at) INCLUDE (guild_id, points)
+            """)
+            try:
+                # embed_requests não é criada por initialize_schema
+                await conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_embed_requests_pending
+                    ON embed_requests(created_at) WHERE status = 'pending'
+                """)
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao criar índice de embed_requests pendentes: {e}")
+            try:
+                # Chave do upsert de buckets (inclui created_at, exigido pelo particionamento)
+                await conn.execute("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_interaction_points_bucket
+                    ON interaction_points(guild_id, user_id, type_id, created_at)
+                """)
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao criar índice de buckets em interaction_points: {e}")
 
             
             # ==================== ADVANCED CONTEXT SYSTEM SCHEMAS ====================
@@ -287,8 +599,10 @@ class Database:
             # Habilitar extensão pgvector (se disponível no ambiente)
             try:
                 await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
-                logger.info("✅ Extensão 'vector' habilitada/verificada.")
                 self.has_vector = True
+                version = await conn.fetchval("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+                self.vector_version = _parse_version(version)
+                logger.info(f"✅ Extensão 'vector' habilitada/verificada (v{version}).")
             except Exception as e:
                 logger.warning(f"⚠️ Não foi possível habilitar a extensão 'vector'. Semantic search pode falhar: {e}")
                 self.has_vector = False
@@ -340,14 +654,16 @@ class Database:
                             created_at TIMESTAMP DEFAULT NOW()
                         )
                     """)
-                    # Índice HNSW para busca vetorial rápida (se a tabela foi criada com vector)
-                    await conn.execute("""
-                       CREATE INDEX IF NOT EXISTS idx_bot_memories_embedding 
-                       ON bot_memories USING hnsw (embedding vector_cosine_ops)
-                    """)
                 except Exception as e:
                     logger.warning(f"⚠️ Erro ao criar tabela bot_memories com vector. Criando sem vector: {e}")
                     self.has_vector = False
+
+            if self.has_vector:
+                # Índice HNSW para busca vetorial rápida (se a tabela foi criada com vector)
+                try:
+                    await self._sync_memory_vector_index(conn)
+                except Exception as e:
+                    logger.warning(f"⚠️ Erro ao criar índice vetorial de bot_memories: {e}")
             
             if not self.has_vector:
                 # Fallback sem vector
@@ -361,6 +677,31 @@ class Database:
                         created_at TIMESTAMP DEFAULT NOW()
                     )
                 """)
+                # Embeddings como float32 compactos para o índice local (utils/vector_index.py)
+                try:
+                    await conn.execute("ALTER TABLE bot_memories ADD COLUMN IF NOT EXISTS embedding_blob BYTEA")
+                except Exception as e:
+                    logger.warning(f"⚠️ Erro ao adicionar embedding_blob em bot_memories: {e}")
+
+            # Migração: contagem de reforços e última atualização (deduplicação/compactação)
+            try:
+                await conn.execute("ALTER TABLE bot_memories ADD COLUMN IF NOT EXISTS hits INTEGER DEFAULT 1")
+                await conn.execute("ALTER TABLE bot_memories ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT NOW()")
+                await conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_bot_memories_owner
+                    ON bot_memories(guild_id, user_id, updated_at DESC)
+                """)
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao migrar bot_memories (hits/updated_at): {e}")
+
+            # Cache persistente de embeddings (chave = hash do modelo + texto normalizado)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    content_hash TEXT PRIMARY KEY,
+                    embedding REAL[] NOT NULL,
+                    created_at TIMESTAMP DEFAULT NOW()
+                )
+            """)
 
             # ==================== SECURITY: ENABLE RLS ====================
             # Enable Row Level Security on internal tables to prevent public access via PostgREST
@@ -370,12 +711,205 @@ class Database:
                     ALTER TABLE IF EXISTS server_contexts ENABLE ROW LEVEL SECURITY;
                     ALTER TABLE IF EXISTS user_bot_profiles ENABLE ROW LEVEL SECURITY;
                     ALTER TABLE IF EXISTS bot_memories ENABLE ROW LEVEL SECURITY;
+                    ALTER TABLE IF EXISTS embedding_cache ENABLE ROW LEVEL SECURITY;
                 """)
             except Exception as e:
                 logger.warning(f"⚠️ Erro ao habilitar RLS nas tabelas: {e}")
 
             logger.info("✅ Schema do banco de dados inicializado")
-    
+
+    # ==================== PARTICIONAMENTO E RETENÇÃO ====================
+
+    async def _migrate_to_partitioned(self, conn, table: str):
+        """Converte uma tabela comum (heap) existente na versão particionada por mês."""
+        relkind = await conn.fetchval("SELECT relkind::text FROM pg_class WHERE oid = to_regclass($1)", table)
+        if relkind != 'r':
+            return  # Já particionada ('p') ou inexistente
+
+        spec = PARTITIONED_TABLES[table]
+        column, pk = spec["column"], spec["pk"]
+        legacy = f"{table}_legacy"
+        logger.info(f"🔧 Migrando {table} para particionamento mensal por {column}...")
+
+        async with conn.transaction():
+            await conn.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+            # Libera o nome da PK para a nova tabela
+            pkey = await conn.fetchval("""
+                SELECT conname FROM pg_constraint
+                WHERE conrelid = to_regclass($1) AND contype = 'p'
+            """, legacy)
+            if pkey:
+                await conn.execute(f"ALTER TABLE {legacy} RENAME CONSTRAINT {pkey} TO {legacy}_pkey")
+            await conn.execute(f"UPDATE {legacy} SET {column} = NOW() WHERE {column} IS NULL")
+
+            await conn.execute(f"""
+                CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS)
+                PARTITION BY RANGE ({column})
+            """)
+            await conn.execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL")
+            await conn.execute(f"ALTER TABLE {table} ADD PRIMARY KEY ({pk}, {column})")
+            for fk in spec["foreign_keys"]:
+                await conn.execute(f"ALTER TABLE {table} ADD {fk}")
+
+            oldest = await conn.fetchval(f"SELECT MIN({column}) FROM {legacy}")
+            await self._ensure_partitions(conn, table, start=oldest)
+            await conn.execute(f"INSERT INTO {table} SELECT * FROM {legacy}")
+
+            # A sequence SERIAL pertence à tabela antiga; transfere antes do DROP
+            seq = await conn.fetchval("SELECT pg_get_serial_sequence($1, $2)", legacy, pk)
+            if seq:
+                await conn.execute(f"ALTER SEQUENCE {seq} OWNED BY {table}.{pk}")
+            await conn.execute(f"DROP TABLE {legacy}")
+
+        logger.info(f"✅ Tabela {table} migrada para particionamento mensal")
+
+    async def _compact_interaction_points(self, conn):
+        """Converte interaction_points do layout antigo (id + interaction_type TEXT) em buckets por hora."""
+        legacy = await conn.fetchval("""
+            SELECT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'interaction_points' AND column_name = 'interaction_type'
+            )
+        """)
+        if not legacy:
+            return
+
+        logger.info("🔧 Compactando interaction_points em buckets por hora...")
+        async with conn.transaction():
+            await conn.execute("LOCK TABLE interaction_points IN EXCLUSIVE MODE")
+
+            # Tipos que só existem no histórico ganham um código novo
+            await conn.execute("""
+                INSERT INTO interaction_types (type_id, name)
+                SELECT (SELECT COALESCE(MAX(type_id), 0) FROM interaction_types)
+                       + ROW_NUMBER() OVER (ORDER BY name), name
+                FROM (SELECT DISTINCT interaction_type AS name FROM interaction_points) t
+                WHERE name NOT IN (SELECT name FROM interaction_types)
+            """)
+
+            await conn.execute("""
+                CREATE TEMP TABLE interaction_points_compacted ON COMMIT DROP AS
+                SELECT ip.user_id, ip.guild_id, t.type_id,
+                       date_trunc('hour', ip.created_at) AS created_at,
+                       SUM(ip.points)::int AS points, COUNT(*)::int AS event_count
+                FROM interaction_points ip
+                JOIN interaction_types t ON t.name = ip.interaction_type
+                GROUP BY 1, 2, 3, 4
+            """)
+            before = await conn.fetchval("SELECT COUNT(*) FROM interaction_points")
+
+            await conn.execute("TRUNCATE interaction_points")
+            await conn.execute("ALTER TABLE interaction_points DROP CONSTRAINT IF EXISTS interaction_points_pkey")
+            await conn.execute("""
+                ALTER TABLE interaction_points
+                    DROP COLUMN id,
+                    DROP COLUMN interaction_type,
+                    ADD COLUMN type_id SMALLINT NOT NULL REFERENCES interaction_types(type_id),
+                    ADD COLUMN event_count INTEGER NOT NULL DEFAULT 1,
+                    ALTER COLUMN created_at SET DEFAULT date_trunc('hour', NOW())
+            """)
+            await conn.execute("""
+                INSERT INTO interaction_points (user_id, guild_id, type_id, created_at, points, event_count)
+                SELECT user_id, guild_id, type_id, created_at, points, event_count
+                FROM interaction_points_compacted
+            """)
+            after = await conn.fetchval("SELECT COUNT(*) FROM interaction_points")
+
+        logger.info(f"✅ interaction_points compactada: {before} linhas -> {after} buckets")
+
+    async def _ensure_partitions(self, conn, table: str, start: Optional[datetime] = None):
+        """Cria as partições mensais de `start` (padrão: mês atual) até PARTITION_MONTHS_AHEAD à frente."""
+        now = datetime.now()
+        month = _month_start(min(start, now) if start else now)
+        last = _add_months(_month_start(now), PARTITION_MONTHS_AHEAD)
+        column = PARTITIONED_TABLES[table]["column"]
+        existing = set(await self._list_partitions(conn, table))
+        default = f"{table}_default"
+
+        while month <= last:
+            upper = _add_months(month, 1)
+            name = _partition_name(table, month)
+            if name in existing:
+                month = upper
+                continue
+            try:
+                # Savepoint: uma falha aqui não aborta a transação de quem chamou
+                async with conn.transaction():
+                    # Linhas do mês já gravadas na default impedem o CREATE: desanexa a
+                    # default, cria a partição, move as linhas e anexa a default de volta
+                    stranded = default in existing and await conn.fetchval(
+                        f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {column} >= $1 AND {column} < $2)",
+                        month, upper,
+                    )
+                    if stranded:
+                        await conn.execute(f"ALTER TABLE {table} DETACH PARTITION {default}")
+                    await conn.execute(f"""
+                        CREATE TABLE IF NOT EXISTS {name}
+                        PARTITION OF {table}
+                        FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')
+                    """)
+                    if stranded:
+                        moved = await conn.execute(f"""
+                            WITH moved AS (
+                                DELETE FROM {default} WHERE {column} >= $1 AND {column} < $2 RETURNING *
+                            )
+                            INSERT INTO {table} SELECT * FROM moved
+                        """, month, upper)
+                        await conn.execute(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT")
+                        logger.info(f"📦 {moved.split()[-1]} linhas movidas de {default} para {name}")
+            except Exception as e:
+                logger.warning(f"⚠️ Não foi possível criar partição {name}: {e}")
+            month = upper
+
+        # Partição default recebe o que estiver fora das faixas mensais
+        if default not in existing:
+            await conn.execute(f"CREATE TABLE IF NOT EXISTS {default} PARTITION OF {table} DEFAULT")
+
+    async def _list_partitions(self, conn, table: str) -> List[str]:
+        """Lista os nomes das partições anexadas a uma tabela."""
+        rows = await conn.fetch("""
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass($1)
+        """, table)
+        return [row['relname'] for row in rows]
+
+    async def _rollup_covers(self, conn, table: str, until: datetime) -> bool:
+        """Verifica se o rollup da tabela já cobre o período anterior a `until`."""
+        rollup = PARTITIONED_TABLES[table]["rollup"]
+        if not rollup:
+            return True
+        last_date = await conn.fetchval(f"SELECT MAX(date) FROM {rollup}")
+        return last_date is not None and last_date >= until.date()
+
+    async def maintain_partitions(self):
+        """Cria partições futuras e aplica a política de retenção das tabelas particionadas."""
+        now = datetime.now()
+        async with self.pool.acquire() as conn:
+            for table in PARTITIONED_TABLES:
+                try:
+                    await self._ensure_partitions(conn, table)
+
+                    retention = PARTITION_RETENTION_MONTHS.get(table, 0)
+                    names = await self._list_partitions(conn, table)
+                    for name in _expired_partitions(table, names, now, retention):
+                        upper = _add_months(_parse_partition_month(table, name), 1)
+                        if not await self._rollup_covers(conn, table, upper):
+                            logger.warning(f"⚠️ Rollup de {table} não cobre {name}. Retenção adiada.")
+                            continue
+
+                        await conn.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                        if RETENTION_ACTION == "drop":
+                            await conn.execute(f"DROP TABLE {name}")
+                            logger.info(f"🗑️ Partição {name} removida (retenção de {retention} meses)")
+                        else:
+                            await conn.execute("CREATE SCHEMA IF NOT EXISTS archive")
+                            await conn.execute(f"ALTER TABLE {name} SET SCHEMA archive")
+                            logger.info(f"📦 Partição {name} arquivada (retenção de {retention} meses)")
+                except Exception as e:
+                    logger.error(f"❌ Erro na manutenção de partições de {table}: {e}")
+
     # ==================== INSERÇÃO DE DADOS ====================
     
     async def upsert_user(self, user_id: int, username: str, discriminator: str = None, is_bot: bool = False):
@@ -393,12 +927,56 @@ class Database:
             """, user_id, username, discriminator, is_bot)
             
     async def add_interaction_point(self, user_id: int, points: int, interaction_type: str, guild_id: int):
-        """Adiciona pontos de interação para um usuário."""
+        """Adiciona pontos de interação ao bucket da hora atual do usuário."""
         async with self.pool.acquire() as conn:
+            type_id = self.interaction_type_ids.get(interaction_type)
+            if type_id is None:
+                type_id = await self._register_interaction_type(conn, interaction_type)
             await conn.execute("""
-                INSERT INTO interaction_points (user_id, points, interaction_type, guild_id)
-                VALUES ($1, $2, $3, $4)
-            """, user_id, points, interaction_type, guild_id)
+                INSERT INTO interaction_points (user_id, guild_id, type_id, created_at, points)
+                VALUES ($1, $2, $3, date_trunc('hour', NOW()), $4)
+                ON CONFLICT (guild_id, user_id, type_id, created_at)
+                DO UPDATE SET
+                    points = interaction_points.points + EXCLUDED.points,
+                    event_count = interaction_points.event_count + 1
+            """, user_id, guild_id, type_id, points)
+
+    async def add_interaction_points_batch(
+        self, entries: List[tuple], interaction_type: str
+    ) -> None:
+        """
+        Soma pontos de vários usuários de uma vez, em um único INSERT.
+        entries: (user_id, guild_id, pontos); pares repetidos são agregados antes
+        do upsert (ON CONFLICT não pode tocar a mesma linha duas vezes).
+        """
+        if not entries:
+            return
+        user_ids, guild_ids, points = (list(column) for column in zip(*entries))
+        async with self.pool.acquire() as conn:
+            type_id = self.interaction_type_ids.get(interaction_type)
+            if type_id is None:
+                type_id = await self._register_interaction_type(conn, interaction_type)
+            await conn.execute("""
+                INSERT INTO interaction_points (user_id, guild_id, type_id, created_at, points, event_count)
+                SELECT user_id, guild_id, $4, date_trunc('hour', NOW()), SUM(points), COUNT(*)
+                FROM unnest($1::bigint[], $2::bigint[], $3::int[]) AS e(user_id, guild_id, points)
+                GROUP BY user_id, guild_id
+                ON CONFLICT (guild_id, user_id, type_id, created_at)
+                DO UPDATE SET
+                    points = interaction_points.points + EXCLUDED.points,
+                    event_count = interaction_points.event_count + EXCLUDED.event_count
+            """, user_ids, guild_ids, points, type_id)
+
+    async def _register_interaction_type(self, conn, name: str) -> int:
+        """Obtém (ou cria) o código de um tipo de interação fora de INTERACTION_TYPES."""
+        type_id = await conn.fetchval("""
+            INSERT INTO interaction_types (type_id, name)
+            SELECT COALESCE(MAX(type_id), 0) + 1, $1 FROM interaction_types
+            ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+            RETURNING type_id
+        """, name)
+        self.interaction_type_ids[name] = type_id
+        return type_id
     
     async def upsert_channel(self, channel_id: int, channel_name: str, channel_type: str, guild_id: int):
         """Insere ou atualiza um canal."""
@@ -416,24 +994,45 @@ class Database:
                             guild_id: int, content_length: int, has_attachments: bool = False,
                             has_embeds: bool = False, was_moderated: bool = False):
         """Registra uma nova mensagem."""
+        # created_at vem do snowflake: a mesma mensagem sempre cai na mesma partição,
+        # o que mantém o ON CONFLICT da PK (message_id, created_at) deduplicando
+        created_at = _snowflake_time(message_id)
         async with self.pool.acquire() as conn:
             await conn.execute("""
                 INSERT INTO messages (message_id, user_id, channel_id, guild_id, 
-                                     content_length, has_attachments, has_embeds, was_moderated)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-                ON CONFLICT (message_id) DO NOTHING
+                                     content_length, has_attachments, has_embeds, was_moderated,
+                                     created_at)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+                ON CONFLICT (message_id, created_at) DO NOTHING
             """, message_id, user_id, channel_id, guild_id, content_length, 
-               has_attachments, has_embeds, was_moderated)
+               has_attachments, has_embeds, was_moderated, created_at)
 
     async def update_message_moderation_status(self, message_id: int, was_moderated: bool):
         """Atualiza o status de moderação de uma mensagem."""
         async with self.pool.acquire() as conn:
+            # Limite inferior pelo snowflake permite partition pruning
             await conn.execute("""
                 UPDATE messages
                 SET was_moderated = $1
-                WHERE message_id = $2
-            """, was_moderated, message_id)
+                WHERE message_id = $2 AND created_at >= $3
+            """, was_moderated, message_id, _snowflake_time(message_id))
     
+    async def mark_messages_moderated(self, message_ids: List[int]) -> None:
+        """Marca várias mensagens como moderadas em um único UPDATE."""
+        if not message_ids:
+            return
+        created = [_snowflake_time(message_id) for message_id in message_ids]
+        async with self.pool.acquire() as conn:
+            # O limite inferior por mensagem casa a linha; o mínimo permite partition pruning
+            await conn.execute("""
+                UPDATE messages
+                SET was_moderated = TRUE
+                FROM unnest($1::bigint[], $2::timestamp[]) AS m(message_id, created_at)
+                WHERE messages.message_id = m.message_id
+                  AND messages.created_at >= m.created_at
+                  AND messages.created_at >= $3
+            """, message_ids, created, min(created))
+
     async def insert_voice_join(self, user_id: int, channel_id: int, guild_id: int):
         """Registra entrada em canal de voz."""
         async with self.pool.acquire() as conn:
@@ -464,6 +1063,107 @@ class Database:
             """)
             return [dict(row) for row in rows]
 
+    async def open_voice_session(self, user_id: int, channel_id: int, guild_id: int) -> Dict[str, Any]:
+        """Abre uma sessão de voz e devolve a chave primária (id, joined_at)."""
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow("""
+                INSERT INTO voice_activity (user_id, channel_id, guild_id, joined_at)
+                VALUES ($1, $2, $3, NOW())
+                RETURNING id, joined_at
+            """, user_id, channel_id, guild_id)
+            return dict(row)
+
+    async def close_voice_session(self, session_id: int, joined_at: datetime):
+        """Fecha uma sessão de voz pela chave primária (joined_at também poda as partições)."""
+        async with self.pool.acquire() as conn:
+            await conn.execute("""
+                UPDATE voice_activity
+                SET left_at = NOW(),
+                    duration_seconds = EXTRACT(EPOCH FROM (NOW() - joined_at))::INTEGER
+                WHERE id = $1 AND joined_at = $2 AND left_at IS NULL
+            """, session_id, joined_at)
+
+    async def move_voice_session(self, session_id: int, joined_at: datetime,
+                                 user_id: int, channel_id: int, guild_id: int) -> Dict[str, Any]:
+        """Fecha a sessão atual e abre a do novo canal em um único comando."""
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow("""
+                WITH closed AS (
+                    UPDATE voice_activity
+                    SET left_at = NOW(),
+                        duration_seconds = EXTRACT(EPOCH FROM (NOW() - joined_at))::INTEGER
+                    WHERE id = $1 AND joined_at = $2 AND left_at IS NULL
+                )
+                INSERT INTO voice_activity (user_id, channel_id, guild_id, joined_at)
+                VALUES ($3, $4, $5, NOW())
+                RETURNING id, joined_at
+            """, session_id, joined_at, user_id, channel_id, guild_id)
+            return dict(row)
+
+    async def checkpoint_voice_sessions(self, session_ids: List[int], joined_ats: List[datetime]):
+        """
+        Grava em duration_seconds o tempo corrido das sessões abertas (left_at segue NULL).
+
+        Se o bot cair, reconcile_voice_sessions fecha a sessão no último checkpoint,
+        então a perda fica limitada ao intervalo entre checkpoints.
+        """
+        if not session_ids:
+            return
+        async with self.pool.acquire() as conn:
+            await conn.execute("""
+                UPDATE voice_activity
+                SET duration_seconds = EXTRACT(EPOCH FROM (NOW() - voice_activity.joined_at))::INTEGER
+                FROM unnest($1::int[], $2::timestamp[]) AS s(id, joined_at)
+                WHERE voice_activity.id = s.id
+                  AND voice_activity.joined_at = s.joined_at
+                  AND voice_activity.joined_at >= $3
+                  AND voice_activity.left_at IS NULL
+            """, session_ids, joined_ats, min(joined_ats))
+
+    async def reconcile_voice_sessions(self, members: List[tuple]) -> Dict[str, Any]:
+        """
+        Reconciliação de voz na inicialização, em uma transação.
+
+        Fecha todas as sessões que ficaram abertas (queda do bot) no último
+        checkpoint e abre uma sessão nova para cada membro que está em voz agora.
+
+        Args:
+            members: Tuplas (user_id, username, channel_id, guild_id) dos membros em voz
+
+        Returns:
+            {"closed": sessões fechadas, "opened": linhas (id, user_id, channel_id, guild_id, joined_at)}
+        """
+        user_ids = [m[0] for m in members]
+        usernames = [m[1] for m in members]
+        channel_ids = [m[2] for m in members]
+        guild_ids = [m[3] for m in members]
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                result = await conn.execute("""
+                    UPDATE voice_activity
+                    SET left_at = joined_at + make_interval(secs => COALESCE(duration_seconds, 0)),
+                        duration_seconds = COALESCE(duration_seconds, 0)
+                    WHERE left_at IS NULL
+                """)
+                rows = []
+                if members:
+                    await conn.execute("""
+                        INSERT INTO users (user_id, username)
+                        SELECT * FROM unnest($1::bigint[], $2::text[])
+                        ON CONFLICT (user_id) DO NOTHING
+                    """, user_ids, usernames)
+                    rows = await conn.fetch("""
+                        INSERT INTO voice_activity (user_id, channel_id, guild_id, joined_at)
+                        SELECT m.user_id, m.channel_id, m.guild_id, NOW()
+                        FROM unnest($1::bigint[], $2::bigint[], $3::bigint[])
+                            AS m(user_id, channel_id, guild_id)
+                        RETURNING id, user_id, channel_id, guild_id, joined_at
+                    """, user_ids, channel_ids, guild_ids)
+        return {
+            "closed": int(result.split()[-1]) if result else 0,
+            "opened": [dict(row) for row in rows],
+        }
+
     async def update_daily_member_count(self, guild_id: int, member_count: int):
         """Atualiza a contagem de membros do dia."""
         async with self.pool.acquire() as conn:
@@ -529,39 +1229,85 @@ class Database:
         """Retorna estatísticas gerais do servidor."""
         async with self.pool.acquire() as conn:
             cutoff_date = datetime.now() - timedelta(days=days)
-            
-            # Total de mensagens
-            total_messages = await conn.fetchval("""
-                SELECT COUNT(*) FROM messages 
-                WHERE guild_id = $1 AND created_at >= $2
-            """, guild_id, cutoff_date)
-            
-            # Usuários únicos ativos
-            active_users = await conn.fetchval("""
-                SELECT COUNT(DISTINCT user_id) FROM messages 
-                WHERE guild_id = $1 AND created_at >= $2
-            """, guild_id, cutoff_date)
-            
-            # Canais ativos
-            active_channels = await conn.fetchval("""
-                SELECT COUNT(DISTINCT channel_id) FROM messages 
-                WHERE guild_id = $1 AND created_at >= $2
-            """, guild_id, cutoff_date)
-            
-            # Mensagens moderadas
-            moderated_messages = await conn.fetchval("""
-                SELECT COUNT(*) FROM messages 
-                WHERE guild_id = $1 AND created_at >= $2 AND was_moderated = TRUE
-            """, guild_id, cutoff_date)
-            
+
+            # Dias inteiros já agregados saem do rollup; as pontas da janela, de messages
+            covered_until = await conn.fetchval("SELECT MAX(date) + 1 FROM daily_message_rollup")
+            rollup_days = _rollup_days(cutoff_date, covered_until)
+
+            if rollup_days is None:
+                row = await conn.fetchrow("""
+                    SELECT COUNT(*) AS total_messages,
+                           COUNT(DISTINCT user_id) AS active_users,
+                           COUNT(DISTINCT channel_id) AS active_channels,
+                           COUNT(*) FILTER (WHERE was_moderated) AS moderated_messages
+                    FROM messages
+                    WHERE guild_id = $1 AND created_at >= $2
+                """, guild_id, cutoff_date)
+            else:
+                first_day, last_day = rollup_days
+                row = await conn.fetchrow("""
+                    WITH parts AS (
+                        SELECT user_id, channel_id, 1 AS messages, was_moderated::int AS moderated
+                        FROM messages
+                        WHERE guild_id = $1 AND created_at >= $2 AND created_at < $3
+                        UNION ALL
+                        SELECT user_id, channel_id, messages, moderated
+                        FROM daily_message_rollup
+                        WHERE guild_id = $1 AND date >= $3::date AND date < $4::date
+                        UNION ALL
+                        SELECT user_id, channel_id, 1, was_moderated::int
+                        FROM messages
+                        WHERE guild_id = $1 AND created_at >= $4
+                    )
+                    SELECT COALESCE(SUM(messages), 0) AS total_messages,
+                           COUNT(DISTINCT user_id) AS active_users,
+                           COUNT(DISTINCT channel_id) AS active_channels,
+                           COALESCE(SUM(moderated), 0) AS moderated_messages
+                    FROM parts
+                """, guild_id, cutoff_date,
+                    datetime.combine(first_day, datetime.min.time()),
+                    datetime.combine(last_day, datetime.min.time()))
+
             return {
-                'total_messages': total_messages,
-                'active_users': active_users,
-                'active_channels': active_channels,
-                'moderated_messages': moderated_messages,
+                'total_messages': row['total_messages'],
+                'active_users': row['active_users'],
+                'active_channels': row['active_channels'],
+                'moderated_messages': row['moderated_messages'],
                 'period_days': days
             }
-    
+
+    async def refresh_message_rollup(self):
+        """Atualiza daily_message_rollup com os dias fechados (até ontem)."""
+        today = datetime.now().date()
+        async with self.pool.acquire() as conn:
+            last = await conn.fetchval("SELECT MAX(date) FROM daily_message_rollup")
+            if last is not None:
+                # Refaz o último dia também: moderação pode marcar mensagens depois da meia-noite
+                start = last
+            else:
+                oldest = await conn.fetchval("SELECT MIN(created_at) FROM messages")
+                if oldest is None:
+                    return
+                start = oldest.date()
+
+            # Em blocos de até 31 dias para não segurar uma transação gigante no backfill
+            while start < today:
+                end = min(start + timedelta(days=31), today)
+                async with conn.transaction():
+                    await conn.execute("""
+                        DELETE FROM daily_message_rollup WHERE date >= $1 AND date < $2
+                    """, start, end)
+                    await conn.execute("""
+                        INSERT INTO daily_message_rollup (guild_id, date, channel_id, user_id, messages, moderated)
+                        SELECT guild_id, created_at::date, channel_id, user_id,
+                               COUNT(*), COUNT(*) FILTER (WHERE was_moderated)
+                        FROM messages
+                        WHERE created_at >= $1 AND created_at < $2
+                        GROUP BY 1, 2, 3, 4
+                    """, datetime.combine(start, datetime.min.time()),
+                        datetime.combine(end, datetime.min.time()))
+                start = end
+
     async def get_top_users_by_messages(self, guild_id: int, limit: int = 10, days: int = 30) -> List[Dict[str, Any]]:
         """Retorna os usuários mais ativos por mensagens (excluindo bots)."""
         async with self.pool.acquire() as conn:
@@ -616,7 +1362,7 @@ class Database:
                 SELECT COALESCE(SUM(points), 0)
                 FROM interaction_points
                 WHERE user_id = $1 
-                  AND interaction_type = $2
+                  AND type_id = (SELECT type_id FROM interaction_types WHERE name = $2)
                   AND guild_id = $3
                   AND created_at >= ((NOW() AT TIME ZONE 'America/Sao_Paulo')::DATE AT TIME ZONE 'America/Sao_Paulo')
             """, user_id, interaction_type, guild_id)
@@ -672,62 +1418,112 @@ class Database:
 
 
     async def get_detailed_user_stats(self, user_id: int, guild_id: int, days: int = 30) -> Dict[str, Any]:
-        """Retorna estatísticas detalhadas de um usuário específico para auditoria."""
+        """Retorna estatísticas detalhadas de um usuário específico para auditoria.
+
+        As partes são independentes e rodam em paralelo, cada uma na sua conexão do pool.
+        """
+        cutoff_date = datetime.now() - timedelta(days=days)
+
+        totals, points_breakdown, activities, top_text_channels, top_voice_channels = await asyncio.gather(
+            self._user_daily_totals(user_id, guild_id, cutoff_date),
+            self._user_points_breakdown(user_id, guild_id, cutoff_date),
+            self._user_game_activities(user_id, guild_id, cutoff_date),
+            self._user_top_text_channels(user_id, guild_id, cutoff_date),
+            self._user_top_voice_channels(user_id, guild_id, cutoff_date),
+        )
+
+        game_seconds = sum(row['seconds'] for row in activities)
+        top_activities = sorted(activities, key=lambda row: row['seconds'], reverse=True)[:3]
+
+        return {
+            'total_messages': totals['messages'],
+            'voice_minutes': int(totals['voice_seconds'] // 60),
+            'game_minutes': int(game_seconds // 60),
+            'total_points': sum(points_breakdown.values()),
+            'points_breakdown': points_breakdown,
+            'top_text_channels': top_text_channels,
+            'top_voice_channels': top_voice_channels,
+            'top_activities': [
+                {'activity_name': row['activity_name'], 'minutes': row['seconds'] // 60}
+                for row in top_activities
+            ],
+            'period_days': days
+        }
+
+    async def _user_daily_totals(self, user_id: int, guild_id: int, cutoff_date: datetime) -> Dict[str, int]:
+        """Mensagens e segundos de voz do usuário (rollup daily_user_stats)."""
         async with self.pool.acquire() as conn:
-            cutoff_date = datetime.now() - timedelta(days=days)
-            
-            # 1. Total de mensagens
-            total_messages = await conn.fetchval("""
-                SELECT COALESCE(SUM(messages_count), 0) FROM daily_user_stats
-                WHERE user_id = $1 AND guild_id = $2 AND date >= $3::DATE
-            """, user_id, guild_id, cutoff_date)
-            
-            # 2. Tempo em voz (minutos)
-            voice_minutes = await conn.fetchval("""
-                SELECT COALESCE(SUM(voice_seconds), 0) / 60 
+            row = await conn.fetchrow("""
+                SELECT COALESCE(SUM(messages_count), 0) AS messages,
+                       COALESCE(SUM(voice_seconds), 0) AS voice_seconds
                 FROM daily_user_stats
                 WHERE user_id = $1 AND guild_id = $2 AND date >= $3::DATE
             """, user_id, guild_id, cutoff_date)
-            
-            # 3. Pontos Totais (Auditados)
-            # Soma pontos da tabela de pontos de interação
-            total_points = await conn.fetchval("""
-                SELECT COALESCE(SUM(points), 0)
-                FROM interaction_points
-                WHERE user_id = $1 AND created_at >= $2
-                  AND ($3::bigint IS NULL OR guild_id = $3 OR guild_id IS NULL)
-            """, user_id, cutoff_date, guild_id)
+            return {'messages': row['messages'], 'voice_seconds': row['voice_seconds']}
 
-            # 4. Detalhamento dos pontos (por tipo)
-            points_breakdown = await conn.fetch("""
-                SELECT interaction_type, COALESCE(SUM(points), 0) as points
-                FROM interaction_points
-                WHERE user_id = $1 AND created_at >= $2
-                  AND ($3::bigint IS NULL OR guild_id = $3 OR guild_id IS NULL)
-                GROUP BY interaction_type
+    async def _user_points_breakdown(self, user_id: int, guild_id: int, cutoff_date: datetime) -> Dict[str, int]:
+        """Pontos do usuário por tipo de interação (o total é a soma do detalhamento)."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT t.name AS interaction_type, COALESCE(SUM(ip.points), 0) as points
+                FROM interaction_points ip
+                JOIN interaction_types t ON t.type_id = ip.type_id
+                WHERE ip.user_id = $1 AND ip.created_at >= $2
+                  AND ($3::bigint IS NULL OR ip.guild_id = $3 OR ip.guild_id IS NULL)
+                GROUP BY t.name
             """, user_id, cutoff_date, guild_id)
+            return {row['interaction_type']: row['points'] for row in rows}
 
-            # 5. Tempo total em jogos (minutos)
-            game_minutes = await conn.fetchval("""
-                SELECT COALESCE(SUM(duration_seconds), 0) / 60
+    async def _user_game_activities(self, user_id: int, guild_id: int, cutoff_date: datetime) -> List[Dict[str, Any]]:
+        """Segundos jogados por jogo (alimenta o tempo total e os jogos favoritos)."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT activity_name, COALESCE(SUM(duration_seconds), 0) AS seconds
                 FROM user_activities
                 WHERE user_id = $1 AND guild_id = $2 AND started_at >= $3
                   AND activity_type = 'playing'
+                GROUP BY activity_name
             """, user_id, guild_id, cutoff_date)
+            return [dict(row) for row in rows]
+
+    async def _user_top_text_channels(self, user_id: int, guild_id: int, cutoff_date: datetime) -> List[Dict[str, Any]]:
+        """Canais de texto favoritos; dias inteiros saem do daily_message_rollup."""
+        async with self.pool.acquire() as conn:
+            covered_until = await conn.fetchval("SELECT MAX(date) + 1 FROM daily_message_rollup")
+            rollup_days = _rollup_days(cutoff_date, covered_until)
+            # Sem rollup utilizável, a faixa do meio fica vazia e tudo vem de messages
+            if rollup_days is None:
+                rollup_start = rollup_end = cutoff_date
+            else:
+                rollup_start, rollup_end = (datetime.combine(d, datetime.min.time()) for d in rollup_days)
 
-            # 6. Canais de Texto Favoritos
-            top_text_channels = await conn.fetch("""
-                SELECT c.channel_name, COUNT(*) as count
-                FROM messages m
-                JOIN channels c ON m.channel_id = c.channel_id
-                WHERE m.user_id = $1 AND m.guild_id = $2 AND m.created_at >= $3
+            rows = await conn.fetch("""
+                WITH parts AS (
+                    SELECT channel_id, 1 AS messages
+                    FROM messages
+                    WHERE user_id = $1 AND guild_id = $2 AND created_at >= $3 AND created_at < $4
+                    UNION ALL
+                    SELECT channel_id, messages
+                    FROM daily_message_rollup
+                    WHERE guild_id = $2 AND user_id = $1 AND date >= $4::date AND date < $5::date
+                    UNION ALL
+                    SELECT channel_id, 1
+                    FROM messages
+                    WHERE user_id = $1 AND guild_id = $2 AND created_at >= $5
+                )
+                SELECT c.channel_name, SUM(p.messages) as count
+                FROM parts p
+                JOIN channels c ON p.channel_id = c.channel_id
                 GROUP BY c.channel_name
                 ORDER BY count DESC
                 LIMIT 3
-            """, user_id, guild_id, cutoff_date)
+            """, user_id, guild_id, cutoff_date, rollup_start, rollup_end)
+            return [dict(row) for row in rows]
 
-            # 7. Canais de Voz Favoritos
-            top_voice_channels = await conn.fetch("""
+    async def _user_top_voice_channels(self, user_id: int, guild_id: int, cutoff_date: datetime) -> List[Dict[str, Any]]:
+        """Canais de voz favoritos do usuário."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
                 SELECT c.channel_name, SUM(v.duration_seconds)/60 as minutes
                 FROM voice_activity v
                 JOIN channels c ON v.channel_id = c.channel_id
@@ -736,29 +1532,7 @@ class Database:
                 ORDER BY minutes DESC
                 LIMIT 3
             """, user_id, guild_id, cutoff_date)
-
-            # 8. Atividade Favorita
-            top_activities = await conn.fetch("""
-                SELECT activity_name, SUM(duration_seconds)/60 as minutes
-                FROM user_activities
-                WHERE user_id = $1 AND guild_id = $2 AND started_at >= $3
-                  AND activity_type = 'playing'
-                GROUP BY activity_name
-                ORDER BY minutes DESC
-                LIMIT 3
-            """, user_id, guild_id, cutoff_date)
-            
-            return {
-                'total_messages': total_messages,
-                'voice_minutes': int(voice_minutes) if voice_minutes else 0,
-                'game_minutes': int(game_minutes) if game_minutes else 0,
-                'total_points': total_points,
-                'points_breakdown': {row['interaction_type']: row['points'] for row in points_breakdown},
-                'top_text_channels': [dict(row) for row in top_text_channels],
-                'top_voice_channels': [dict(row) for row in top_voice_channels],
-                'top_activities': [dict(row) for row in top_activities],
-                'period_days': days
-            }
+            return [dict(row) for row in rows]
 
     async def set_ai_moderation(self, guild_id: int, enabled: bool):
         """Ativa ou desativa a moderação por IA para um servidor."""
@@ -789,7 +1563,9 @@ class Database:
                     allowed_channels,
                     ignored_voice_channels,
                     announcement_channel_id,
-                    dynamic_roles_config
+                    dynamic_roles_config,
+                    spam_max_messages,
+                    spam_time_window
                 FROM guild_settings
                 WHERE guild_id = $1
             """, guild_id)
@@ -811,6 +1587,9 @@ class Database:
                 "ignored_voice_channels": list(row["ignored_voice_channels"] or []),
                 "announcement_channel_id": row["announcement_channel_id"],
                 "dynamic_roles_config": dict(dyn_roles),
+                # NULL = limites padrão do SpamDetector
+                "spam_max_messages": row.get("spam_max_messages"),
+                "spam_time_window": row.get("spam_time_window"),
             }
 
     async def set_allowed_channels(
@@ -837,6 +1616,18 @@ class Database:
                 DO UPDATE SET ignored_voice_channels = $2, updated_at = NOW()
             """, guild_id, channel_ids)
 
+    async def set_spam_limits(
+        self, guild_id: int, max_messages: Optional[int], time_window: Optional[float]
+    ) -> None:
+        """Persiste o limite anti-spam (mensagens por janela de segundos); None usa o padrão."""
+        async with self.pool.acquire() as conn:
+            await conn.execute("""
+                INSERT INTO guild_settings (guild_id, spam_max_messages, spam_time_window, updated_at)
+                VALUES ($1, $2, $3, NOW())
+                ON CONFLICT (guild_id)
+                DO UPDATE SET spam_max_messages = $2, spam_time_window = $3, updated_at = NOW()
+            """, guild_id, max_messages, time_window)
+
     async def set_dynamic_roles(
         self, guild_id: int, roles_config: Dict[str, int]
     ) -> None:
@@ -1518,7 +2309,8 @@ class Database:
                     EXTRACT(MONTH FROM (started_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Sao_Paulo'))::INTEGER as month
                 FROM user_activities
                 WHERE guild_id = $1 
-                  AND EXTRACT(YEAR FROM (started_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Sao_Paulo')) = $2
+                  AND started_at >= (make_date($2, 1, 1)::timestamp AT TIME ZONE 'America/Sao_Paulo' AT TIME ZONE 'UTC')
+                  AND started_at < (make_date($2 + 1, 1, 1)::timestamp AT TIME ZONE 'America/Sao_Paulo' AT TIME ZONE 'UTC')
                   AND duration_seconds IS NOT NULL
                   AND activity_type = 'playing'
                 GROUP BY activity_name, month
@@ -1729,37 +2521,157 @@ class Database:
                 DO UPDATE SET {set_clause}, updated_at = NOW()
             """, *values)
 
-    async def store_memory(self, guild_id: int, content: str, embedding: List[float] = None, user_id: int = None, keywords: List[str] = None):
-        """Armazena uma memória de longo prazo."""
+    async def store_memory(self, guild_id: int, content: str, embedding: List[float] = None, user_id: int = None,
+                           keywords: List[str] = None, dedup_threshold: float = MEMORY_DEDUP_THRESHOLD) -> bool:
+        """
+        Armazena uma memória de longo prazo, deduplicando na escrita.
+
+        Se já existe uma memória do mesmo dono (usuário ou global do servidor) com
+        similaridade >= dedup_threshold (ou, sem vetor, o mesmo texto), ela é
+        atualizada com o texto novo e ganha um reforço (hits) em vez de criar outra linha.
+        Retorna True se mesclou em uma memória existente.
+        """
+        use_vector = bool(embedding) and self.has_vector
         async with self.pool.acquire() as conn:
-            if embedding and self.has_vector:
-                # Formata embedding para string pgvector '[0.1, 0.2, ...]'
-                emb_str = str(embedding)
-                await conn.execute("""
-                    INSERT INTO bot_memories (guild_id, user_id, content, embedding, keywords)
-                    VALUES ($1, $2, $3, $4, $5)
-                """, guild_id, user_id, content, emb_str, keywords)
-            else:
-                await conn.execute("""
-                    INSERT INTO bot_memories (guild_id, user_id, content, keywords)
-                    VALUES ($1, $2, $3, $4)
-                """, guild_id, user_id, content, keywords)
+            async with conn.transaction():
+                # Serializa escritas do mesmo dono para que duas extrações simultâneas não dupliquem
+                await conn.execute(
+                    "SELECT pg_advisory_xact_lock(hashtext('bot_memories'), hashtext($1))",
+                    f"{guild_id}:{user_id}",
+                )
+                if use_vector:
+                    # Ordenar pela similaridade (e não por embedding <=> $1) evita o índice HNSW:
+                    # a busca exata nas poucas memórias do dono não perde vizinhos por causa do filtro
+                    existing = await conn.fetchrow("""
+                        SELECT id, 1 - (embedding <=> $1::vector) AS similarity
+                        FROM bot_memories
+                        WHERE guild_id = $2 AND user_id IS NOT DISTINCT FROM $3
+                          AND embedding IS NOT NULL
+                        ORDER BY similarity DESC
+                        LIMIT 1
+                    """, embedding, guild_id, user_id)
+                    if existing and existing['similarity'] < dedup_threshold:
+                        existing = None
+                else:
+                    existing = await conn.fetchrow("""
+                        SELECT id FROM bot_memories
+                        WHERE guild_id = $1 AND user_id IS NOT DISTINCT FROM $2
+                          AND lower(content) = lower($3)
+                        LIMIT 1
+                    """, guild_id, user_id, content)
+
+                if existing:
+                    if use_vector:
+                        vector_set, vector_args = "embedding = $4::vector,", [embedding]
+                    elif embedding:
+                        vector_set, vector_args = "embedding_blob = $4,", [_pack_embedding_blob(embedding)]
+                    else:
+                        vector_set, vector_args = "", []
+                    await conn.execute(f"""
+                        UPDATE bot_memories
+                        SET content = $2, keywords = COALESCE($3, keywords), {vector_set}
+                            hits = COALESCE(hits, 1) + 1, updated_at = NOW()
+                        WHERE id = $1
+                    """, existing['id'], content, keywords, *vector_args)
+                    return True
+
+                if use_vector:
+                    # Embedding vai em formato binário (codec registrado em _init_connection)
+                    await conn.execute("""
+                        INSERT INTO bot_memories (guild_id, user_id, content, embedding, keywords)
+                        VALUES ($1, $2, $3, $4, $5)
+                    """, guild_id, user_id, content, embedding, keywords)
+                elif embedding:
+                    # Sem pgvector: float32 compacto para o índice local em memória
+                    await conn.execute("""
+                        INSERT INTO bot_memories (guild_id, user_id, content, keywords, embedding_blob)
+                        VALUES ($1, $2, $3, $4, $5)
+                    """, guild_id, user_id, content, keywords, _pack_embedding_blob(embedding))
+                else:
+                    await conn.execute("""
+                        INSERT INTO bot_memories (guild_id, user_id, content, keywords)
+                        VALUES ($1, $2, $3, $4)
+                    """, guild_id, user_id, content, keywords)
+                return False
 
-    async def search_memories(self, guild_id: int, embedding: List[float] = None, user_id: int = None, limit: int = 3) -> List[Dict[str, Any]]:
-        """Busca memórias relevantes usando similaridade vetorial ou fallback recente."""
+    async def _sync_memory_vector_index(self, conn):
+        """
+        Cria o índice HNSW do modo MEMORY_VECTOR_STORAGE e remove os dos outros modos.
+        Trocar o modo migra as linhas existentes: o índice novo é construído a partir
+        da coluna vector. half/binary só são lidos por search_memories com varredura
+        iterativa (pgvector >= 0.8); abaixo disso usa "full".
+        """
+        storage = MEMORY_VECTOR_STORAGE if MEMORY_VECTOR_STORAGE in _MEMORY_VECTOR_INDEXES else "full"
+        if storage != "full" and not self.vector_iterative_scan:
+            logger.warning(
+                f"⚠️ MEMORY_VECTOR_STORAGE={storage} requer pgvector >= 0.8 (busca iterativa). "
+                "Usando precisão total."
+            )
+            storage = "full"
+        name, definition = _MEMORY_VECTOR_INDEXES[storage]
+        # Construir o HNSW de uma tabela grande pode passar do command_timeout do pool
+        await conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON bot_memories USING hnsw {definition}",
+            timeout=3600,
+        )
+        for other, _ in _MEMORY_VECTOR_INDEXES.values():
+            if other != name:
+                await conn.execute(f"DROP INDEX IF EXISTS {other}")
+        self.vector_storage = storage
+
+    @property
+    def vector_iterative_scan(self) -> bool:
+        """pgvector >= 0.8 continua varrendo o HNSW até satisfazer o filtro (hnsw.iterative_scan)."""
+        return self.vector_version >= (0, 8, 0)
+
+    async def search_memories(self, guild_id: int, embedding: List[float] = None, user_id: int = None, limit: int = 3,
+                              candidates: int = MEMORY_SEARCH_CANDIDATES) -> List[Dict[str, Any]]:
+        """
+        Busca memórias relevantes usando similaridade vetorial ou fallback recente.
+
+        A busca vetorial tem duas etapas unidas no mesmo comando:
+        - memórias do usuário: busca exata pelo índice (guild_id, user_id) — são poucas
+          (limitadas por MEMORY_MAX_PER_USER), então o resultado é exato e barato;
+        - memórias globais do servidor: HNSW com varredura iterativa (pgvector >= 0.8),
+          que examina até `candidates` vizinhos para compensar o filtro por servidor.
+          Com índice quantizado (half/binary), esses candidatos são reordenados pela
+          distância em precisão total. Sem varredura iterativa, o índice global
+          descartaria quase todos os candidatos de outros servidores, então a etapa
+          também é exata.
+        """
         async with self.pool.acquire() as conn:
             if embedding and self.has_vector:
-                emb_str = str(embedding)
-                # Busca por similaridade de cosseno (<=>)
-                # Filtra por guild_id E (user_id específico OU memória global null)
-                rows = await conn.fetch("""
-                    SELECT content, created_at, 1 - (embedding <=> $1) as similarity
-                    FROM bot_memories
-                    WHERE guild_id = $2 
-                      AND (user_id = $3 OR user_id IS NULL)
-                    ORDER BY embedding <=> $1
-                    LIMIT $4
-                """, emb_str, guild_id, user_id, limit)
+                if self.vector_iterative_scan:
+                    global_order = _MEMORY_VECTOR_ORDER[self.vector_storage]
+                else:
+                    global_order = "1 - (embedding <=> $1::vector) DESC"  # Não casa com o índice HNSW: busca exata
+                async with conn.transaction():
+                    if self.vector_iterative_scan:
+                        # relaxed_order: a ordem final é refeita no ORDER BY externo
+                        await conn.execute("SET LOCAL hnsw.iterative_scan = relaxed_order")
+                        await conn.execute(f"SET LOCAL hnsw.ef_search = {max(int(candidates), limit)}")
+                    rows = await conn.fetch(f"""
+                        SELECT content, created_at, similarity FROM (
+                            (SELECT content, created_at, 1 - (embedding <=> $1::vector) AS similarity
+                             FROM bot_memories
+                             WHERE guild_id = $2 AND user_id = $3 AND embedding IS NOT NULL
+                             ORDER BY similarity DESC
+                             LIMIT $4)
+                            UNION ALL
+                            (SELECT content, created_at, 1 - (embedding <=> $1::vector) AS similarity
+                             FROM (
+                                SELECT content, created_at, embedding
+                                FROM bot_memories
+                                WHERE guild_id = $2 AND user_id IS NULL AND embedding IS NOT NULL
+                                ORDER BY {global_order}
+                                LIMIT $5
+                             ) AS candidates
+                             ORDER BY similarity DESC
+                             LIMIT $4)
+                        ) AS found
+                        ORDER BY similarity DESC
+                        LIMIT $4
+                    """, embedding, guild_id, user_id, limit, max(int(candidates), limit))
                 return [dict(row) for row in rows]
             else:
                 # Fallback: Apenas as mais recentes
@@ -1772,3 +2684,146 @@ class Database:
                     LIMIT $3
                 """, guild_id, user_id, limit)
                 return [dict(row) for row in rows]
+
+    async def get_memory_vectors(self, guild_id: int) -> List[Dict[str, Any]]:
+        """Memórias do servidor com embedding_blob, para o índice local (sem pgvector)."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT user_id, content, created_at, embedding_blob
+                FROM bot_memories
+                WHERE guild_id = $1 AND embedding_blob IS NOT NULL
+                ORDER BY id
+            """, guild_id)
+            return [dict(row) for row in rows]
+
+    async def get_memory_compaction_candidates(self, min_memories: int, min_age_days: int) -> List[Dict[str, Any]]:
+        """Donos (guild_id, user_id) com pelo menos min_memories memórias mais antigas que min_age_days."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT guild_id, user_id, COUNT(*) AS total
+                FROM bot_memories
+                WHERE user_id IS NOT NULL
+                  AND COALESCE(updated_at, created_at) < NOW() - make_interval(days => $2)
+                GROUP BY guild_id, user_id
+                HAVING COUNT(*) >= $1
+            """, min_memories, min_age_days)
+            return [dict(row) for row in rows]
+
+    async def get_old_memories(self, guild_id: int, user_id: int, min_age_days: int) -> List[Dict[str, Any]]:
+        """Memórias de um usuário mais antigas que min_age_days (candidatas à compactação)."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT id, content, COALESCE(hits, 1) AS hits
+                FROM bot_memories
+                WHERE guild_id = $1 AND user_id = $2
+                  AND COALESCE(updated_at, created_at) < NOW() - make_interval(days => $3)
+                ORDER BY id
+            """, guild_id, user_id, min_age_days)
+            return [dict(row) for row in rows]
+
+    async def get_similar_memory_pairs(self, memory_ids: List[int], threshold: float) -> List[tuple]:
+        """Pares (id_a, id_b) entre as memórias dadas com similaridade >= threshold (requer pgvector)."""
+        if not self.has_vector or len(memory_ids) < 2:
+            return []
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT a.id AS a, b.id AS b
+                FROM bot_memories a
+                JOIN bot_memories b ON b.id > a.id AND b.id = ANY($1::int[])
+                WHERE a.id = ANY($1::int[])
+                  AND a.embedding IS NOT NULL AND b.embedding IS NOT NULL
+                  AND 1 - (a.embedding <=> b.embedding) >= $2
+            """, memory_ids, threshold)
+            return [(row['a'], row['b']) for row in rows]
+
+    async def replace_memories(self, guild_id: int, user_id: int, memory_ids: List[int], content: str,
+                               embedding: List[float] = None):
+        """Substitui um grupo de memórias por um resumo, somando os reforços (hits) do grupo."""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                hits = await conn.fetchval("""
+                    WITH removed AS (
+                        DELETE FROM bot_memories
+                        WHERE guild_id = $1 AND user_id = $2 AND id = ANY($3::int[])
+                        RETURNING COALESCE(hits, 1) AS hits
+                    )
+                    SELECT COALESCE(SUM(hits), 0) FROM removed
+                """, guild_id, user_id, memory_ids)
+                if not hits:
+                    return  # O grupo já foi removido/alterado por outra escrita
+                if embedding and self.has_vector:
+                    await conn.execute("""
+                        INSERT INTO bot_memories (guild_id, user_id, content, embedding, hits)
+                        VALUES ($1, $2, $3, $4, $5)
+                    """, guild_id, user_id, content, embedding, hits)
+                else:
+                    await conn.execute("""
+                        INSERT INTO bot_memories (guild_id, user_id, content, hits)
+                        VALUES ($1, $2, $3, $4)
+                    """, guild_id, user_id, content, hits)
+
+    async def cap_memories(self, max_per_user: int = MEMORY_MAX_PER_USER,
+                           max_per_guild: int = MEMORY_MAX_PER_GUILD) -> int:
+        """
+        Aplica os limites de memórias por usuário e por servidor, removendo as
+        menos recentemente reforçadas. Retorna quantas foram removidas.
+        """
+        async with self.pool.acquire() as conn:
+            per_user = await conn.execute("""
+                DELETE FROM bot_memories WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, ROW_NUMBER() OVER (
+                            PARTITION BY guild_id, user_id
+                            ORDER BY COALESCE(updated_at, created_at) DESC, id DESC
+                        ) AS rank
+                        FROM bot_memories
+                        WHERE user_id IS NOT NULL
+                    ) ranked
+                    WHERE rank > $1
+                )
+            """, max_per_user)
+            per_guild = await conn.execute("""
+                DELETE FROM bot_memories WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, ROW_NUMBER() OVER (
+                            PARTITION BY guild_id
+                            ORDER BY COALESCE(updated_at, created_at) DESC, id DESC
+                        ) AS rank
+                        FROM bot_memories
+                    ) ranked
+                    WHERE rank > $1
+                )
+            """, max_per_guild)
+            return int(per_user.split()[-1]) + int(per_guild.split()[-1])
+
+    async def get_cached_embeddings(self, content_hashes: List[str]) -> Dict[str, List[float]]:
+        """Busca embeddings já calculados pelos hashes de conteúdo."""
+        if not content_hashes:
+            return {}
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT content_hash, embedding
+                FROM embedding_cache
+                WHERE content_hash = ANY($1::text[])
+            """, content_hashes)
+            return {row['content_hash']: list(row['embedding']) for row in rows}
+
+    async def store_cached_embeddings(self, embeddings: Dict[str, List[float]]):
+        """Grava embeddings novos no cache persistente (ignora hashes já existentes)."""
+        if not embeddings:
+            return
+        async with self.pool.acquire() as conn:
+            await conn.executemany("""
+                INSERT INTO embedding_cache (content_hash, embedding)
+                VALUES ($1, $2)
+                ON CONFLICT (content_hash) DO NOTHING
+            """, list(embeddings.items()))
+
+    async def prune_embedding_cache(self, max_age_days: int = 90) -> int:
+        """Remove embeddings antigos do cache persistente. Retorna quantos foram removidos."""
+        async with self.pool.acquire() as conn:
+            result = await conn.execute("""
+                DELETE FROM embedding_cache
+                WHERE created_at < NOW() - make_interval(days => $1)
+            """, max_age_days)
+            return int(result.split()[-1])
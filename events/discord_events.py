@@ -7,17 +7,38 @@ O módulo expõe `register_events(client, ctx)` que registra todos os handlers.
 
 import re
 import logging
+import contextlib
 
 import discord
 
-from config import DEFAULT_ALLOWED_CHANNELS
+from config import CHAT_STREAM_EDIT_INTERVAL, DEFAULT_ALLOWED_CHANNELS, GEMINI_CHAT_STREAMING
+from utils.llm_gateway import estimate_tokens
+from utils.prompt_assembler import PromptAssembler
+from utils.reply_streamer import StreamingReply
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_INSTRUCTION = "Você é o BMIA, um bot assistente."
+GUILD_INSTRUCTION = """
+        Você é o Bot Oficial do servidor {guild_name}.
+        Sua identidade é BMIA (Bot de Monitoramento e Inteligência Artificial).
+
+        {context_block}
+
+        INSTRUÇÕES GERAIS:
+        1. Responda como um membro participante do servidor, não como uma IA distante.
+        2. Use o contexto acima para personalizar sua resposta.
+        3. Não use respostas muito longas e procure manter um tom coloquial.
+        4. Se houver memórias relevantes, use-as se fizer sentido.
+        """
+
+# Ordena contexto (perfis, memórias) e histórico por relevância dentro do orçamento de tokens
+_prompt_assembler = PromptAssembler()
+
 
 def resolve_mentions_in_text(text: str, guild: discord.Guild | None) -> str:
     """Substitui <@id> pelo display_name do membro na guild."""
-    if not text or not guild:
+    if not text or not guild or "<@" not in text:
         return text
 
     def replace(match: re.Match) -> str:
@@ -28,6 +49,115 @@ def resolve_mentions_in_text(text: str, guild: discord.Guild | None) -> str:
     return re.sub(r"<@!?(\d+)>", replace, text)
 
 
+async def _generate_reply(ctx, client, message, resolved_content: str, on_first_post) -> tuple[str, bool]:
+    """
+    Monta histórico e contexto, gera a resposta com o ChatHandler e a posta.
+    Retorna (texto, completa): completa é False para respostas de erro ou
+    interrompidas no meio do streaming (não devem ir para o cache de respostas).
+    """
+    formatted_history = None
+    if ctx.recent_messages:
+        formatted_history = ctx.recent_messages.get_history(
+            message.channel.id, message.id, limit=10
+        )
+
+    if formatted_history is None:
+        # Fallback (ex.: após restart): busca via REST e semeia o buffer
+        history_msgs = [
+            msg async for msg in message.channel.history(
+                limit=10, before=message
+            )
+        ]
+        history_msgs.reverse()
+
+        for h_msg in history_msgs:
+            h_msg.content = resolve_mentions_in_text(
+                h_msg.content, message.guild
+            )
+
+        formatted_history = ctx.chat_handler.format_history(
+            history_msgs, client.user
+        )
+        if ctx.recent_messages:
+            ctx.recent_messages.seed(
+                message.channel.id,
+                [
+                    (
+                        h_msg.id,
+                        "model" if h_msg.author == client.user else "user",
+                        h_msg.content,
+                    )
+                    for h_msg in history_msgs
+                ],
+            )
+
+    prompt = _prompt_assembler.fit_prompt(resolved_content)
+    system_instruction = DEFAULT_INSTRUCTION
+    context_parts = []
+    if ctx.memory_manager and message.guild:
+        context_parts = await ctx.memory_manager.get_context_parts(
+            message.guild,
+            message.author,
+            resolved_content,
+            mentions=message.mentions,
+        )
+        system_instruction = GUILD_INSTRUCTION
+
+    # Contexto e histórico disputam o mesmo orçamento; a instrução fixa e a mensagem já o consomem
+    formatted_history, context_block = _prompt_assembler.assemble(
+        formatted_history,
+        context_parts,
+        reserved=estimate_tokens(system_instruction, prompt),
+    )
+    if system_instruction is GUILD_INSTRUCTION:
+        system_instruction = system_instruction.format(
+            guild_name=message.guild.name, context_block=context_block
+        )
+
+    outcome = {"complete": True}
+    if GEMINI_CHAT_STREAMING:
+        # Posta a primeira frase assim que chega e edita conforme o modelo escreve
+        reply = StreamingReply(message, edit_interval=CHAT_STREAM_EDIT_INTERVAL)
+        response_text = await reply.send(
+            ctx.chat_handler.stream_response(
+                prompt,
+                history=formatted_history,
+                system_instruction=system_instruction,
+                outcome=outcome,
+            ),
+            on_first_post=on_first_post,
+        )
+        if ctx.recent_messages:
+            # O on_message registrou só a primeira frase: o histórico guarda o texto final
+            for posted, text in reply.posted:
+                ctx.recent_messages.update(
+                    message.channel.id, posted.id, resolve_mentions_in_text(text, message.guild)
+                )
+    else:
+        response_text = await ctx.chat_handler.generate_response(
+            prompt,
+            history=formatted_history,
+            system_instruction=system_instruction,
+        )
+
+        await _reply_chunked(message, response_text)
+
+    return response_text, outcome["complete"] and not ctx.chat_handler.is_fallback(response_text)
+
+
+async def _reply_chunked(message, text: str) -> None:
+    """Responde em partes de até 2000 caracteres (limite do Discord)."""
+    if len(text) > 2000:
+        chunks = [
+            text[i:i + 2000]
+            for i in range(0, len(text), 2000)
+        ]
+        for chunk in chunks:
+            await message.reply(chunk)
+    else:
+        await message.reply(text)
+
+
 def register_events(client: discord.Client, ctx: "BotContext") -> None:  # type: ignore[name-defined]
     """
     Registra todos os event handlers no client.
@@ -80,83 +210,74 @@ def register_events(client: discord.Client, ctx: "BotContext") -> None:  # type:
     # ── Mensagens ──────────────────────────────────────────────────────────────
     @client.event
     async def on_message(message: discord.Message) -> None:
+        # Histórico recente do canal (inclui as respostas do próprio bot)
+        if ctx.recent_messages:
+            ctx.recent_messages.record(
+                message.channel.id,
+                message.id,
+                "model" if message.author == client.user else "user",
+                resolve_mentions_in_text(message.content, message.guild),
+            )
+
         if message.author.bot:
             return
 
-        if ctx.spam_detector and ctx.spam_detector.is_spam(message.author.id):
+        mentions_bot = bool(
+            client.user and client.user.mentioned_in(message) and not message.mention_everyone
+        )
+
+        # Flood e cópias entre contas param aqui: não geram pontos, estatísticas nem moderação.
+        # Perguntas ao bot só contam para o flood (vários membros podem perguntar o mesmo)
+        if ctx.spam_detector and ctx.spam_detector.is_spam(
+            message.author.id,
+            guild_id=message.guild.id if message.guild else None,
+            content=None if mentions_bot else message.content,
+        ):
             return
 
         # Resposta por menção ao bot
-        if client.user and client.user.mentioned_in(message) and not message.mention_everyone:
+        if mentions_bot:
             if ctx.chat_handler:
-                async with message.channel.typing():
+                # O indicador de digitação termina assim que a primeira parte da resposta é postada
+                async with contextlib.AsyncExitStack() as typing_stack:
+                    await typing_stack.enter_async_context(message.channel.typing())
                     try:
                         resolved_content = resolve_mentions_in_text(
                             message.content, message.guild
                         )
 
-                        history_msgs = [
-                            msg async for msg in message.channel.history(
-                                limit=10, before=message
-                            )
-                        ]
-                        history_msgs.reverse()
-
-                        for h_msg in history_msgs:
-                            h_msg.content = resolve_mentions_in_text(
-                                h_msg.content, message.guild
-                            )
-
-                        formatted_history = ctx.chat_handler.format_history(
-                            history_msgs, client.user
-                        )
-
-                        system_instruction = "Você é o BMIA, um bot assistente."
+                        cached_answer = None
                         if ctx.memory_manager and message.guild:
-                            context_block = await ctx.memory_manager.get_relevant_context(
-                                message.guild,
-                                message.author,
-                                resolved_content,
-                                mentions=message.mentions,
+                            cached_answer = await ctx.memory_manager.get_cached_answer(
+                                message.guild.id, resolved_content, mentions=message.mentions
                             )
-                            system_instruction = f"""
-                            Você é o Bot Oficial do servidor {message.guild.name}.
-                            Sua identidade é BMIA (Bot de Monitoramento e Inteligência Artificial).
-
-                            {context_block}
-
-                            INSTRUÇÕES GERAIS:
-                            1. Responda como um membro participante do servidor, não como uma IA distante.
-                            2. Use o contexto acima para personalizar sua resposta.
-                            3. Não use respostas muito longas e procure manter um tom coloquial.
-                            4. Se houver memórias relevantes, use-as se fizer sentido.
-                            """
-
-                        response_text = await ctx.chat_handler.generate_response(
-                            resolved_content,
-                            history=formatted_history,
-                            system_instruction=system_instruction,
-                        )
 
-                        if ctx.memory_manager and message.guild:
-                            client.loop.create_task(
-                                ctx.memory_manager.process_message_for_memory(
+                        if cached_answer:
+                            # Pergunta quase idêntica respondida há pouco: sem contexto nem LLM.
+                            # A resposta não é sobre este membro: não vai para a extração de memória.
+                            await _reply_chunked(message, cached_answer)
+                        else:
+                            response_text, complete = await _generate_reply(
+                                ctx, client, message, resolved_content,
+                                on_first_post=typing_stack.aclose,
+                            )
+                            if complete and ctx.memory_manager and message.guild:
+                                await ctx.memory_manager.cache_answer(
                                     message.guild.id,
-                                    message.author.id,
                                     resolved_content,
                                     response_text,
+                                    asker=message.author,
+                                    mentions=message.mentions,
                                 )
-                            )
 
-                        if len(response_text) > 2000:
-                            chunks = [
-                                response_text[i:i + 2000]
-                                for i in range(0, len(response_text), 2000)
-                            ]
-                            for chunk in chunks:
-                                await message.reply(chunk)
-                        else:
-                            await message.reply(response_text)
+                        if not cached_answer and ctx.memory_manager and message.guild:
+                            # Extração de memória em lote (tasks.background_tasks.process_memory_batches)
+                            ctx.memory_manager.queue_turn(
+                                message.guild.id,
+                                message.author.id,
+                                resolved_content,
+                                response_text,
+                            )
 
                     except Exception as exc:
                         logger.error("Erro no ChatHandler: %s", exc)
@@ -170,9 +291,10 @@ def register_events(client: discord.Client, ctx: "BotContext") -> None:  # type:
 
             if len(message.content) <= 10:
                 interaction_type = "message_short"
-                if message.guild and ctx.db:
-                    daily_points = await ctx.db.get_daily_points(
-                        message.author.id, "message_short", message.guild.id
+                if message.guild and ctx.daily_counters:
+                    # Contador em memória (semeado do banco uma vez por dia)
+                    daily_points = await ctx.daily_counters.get(
+                        message.guild.id, message.author.id, "message_short"
                     )
                     if daily_points >= 30:
                         points = 0
@@ -205,8 +327,10 @@ def register_events(client: discord.Client, ctx: "BotContext") -> None:  # type:
                     message.author.discriminator,
                 )
 
-        # Buffer de moderação
-        ctx.buffer_mensagens.append(message)
+        # Buffer de moderação: cópias quase idênticas de uma mensagem já no buffer
+        # ficam no grupo dela (RaidDetector) e recebem o mesmo veredito
+        if not ctx.raid_detector or ctx.raid_detector.observe(message):
+            ctx.buffer_mensagens.append(message)
         logger.debug(
             "Buffer de moderação: %d mensagens", len(ctx.buffer_mensagens)
         )
@@ -215,6 +339,16 @@ def register_events(client: discord.Client, ctx: "BotContext") -> None:  # type:
         if ctx.stats_collector:
             await ctx.stats_collector.on_message(message)
 
+    @client.event
+    async def on_raw_message_delete(payload: discord.RawMessageDeleteEvent) -> None:
+        if ctx.recent_messages:
+            ctx.recent_messages.discard(payload.channel_id, [payload.message_id])
+
+    @client.event
+    async def on_raw_bulk_message_delete(payload: discord.RawBulkMessageDeleteEvent) -> None:
+        if ctx.recent_messages:
+            ctx.recent_messages.discard(payload.channel_id, payload.message_ids)
+
     # ── Reações ────────────────────────────────────────────────────────────────
     @client.event
     async def on_raw_reaction_add(payload: discord.RawReactionActionEvent) -> None:
@@ -298,12 +432,19 @@ class BotContext:
         "activity_tracker",
         "embed_sender",
         "points_manager",
+        "daily_counters",
+        "voice_sessions",
         "spam_detector",
+        "raid_detector",
         "event_monitor",
         "leaderboard_updater",
         "chat_handler",
         "memory_manager",
         "stats_analyzer",
+        "user_stats",
+        "command_cache",
+        "recent_messages",
+        "llm_gateway",
         "telegram",
         "buffer_mensagens",
         "allowed_channels",
@@ -319,12 +460,19 @@ class BotContext:
         self.activity_tracker = None
         self.embed_sender = None
         self.points_manager = None
+        self.daily_counters = None
+        self.voice_sessions = None
         self.spam_detector = None
+        self.raid_detector = None
         self.event_monitor = None
         self.leaderboard_updater = None
         self.chat_handler = None
         self.memory_manager = None
         self.stats_analyzer = None
+        self.user_stats = None
+        self.command_cache = None
+        self.recent_messages = None
+        self.llm_gateway = None
         self.telegram = None
         self.buffer_mensagens: list = []
         self.allowed_channels: list[int] = list(DEFAULT_ALLOWED_CHANNELS)
@@ -15,13 +15,14 @@ import logging
 import traceback
 
 import discord
-import google.generativeai as genai
 
 from config import (
     DISCORD_TOKEN,
-    GEMINI_API_KEY,
+    GEMINI_API_KEYS,
+    GEMINI_DEFAULT_LIMITS,
+    GEMINI_MODEL_LIMITS,
+    LLM_BACKEND,
     DATABASE_URL,
-    GEMINI_CHAT_API_KEY,
     GEMINI_CHAT_MODEL,
     DEFAULT_ALLOWED_CHANNELS,
     DEFAULT_IGNORED_VOICE_CHANNELS,
@@ -48,7 +49,15 @@ from utils.giveaway_manager import GiveawayManager
 from utils.activity_tracker import ActivityTracker
 from utils.embed_sender import EmbedSender
 from utils.points_manager import PointsManager
+from utils.user_stats_service import UserStatsService
+from utils.command_cache import CommandCache
+from utils.daily_counters import DailyCounterStore
+from utils.voice_sessions import VoiceSessionRegistry
+from utils.message_buffer import RecentMessageBuffer
+from utils.llm_gateway import GeminiBackend, LLMGateway
+from utils.fake_llm_backend import FakeGeminiBackend
 from utils.spam_detector import SpamDetector
+from utils.raid_detector import RaidDetector
 from utils.event_monitor import EventMonitor
 from utils.leaderboard_updater import LeaderboardUpdater
 from utils.chat_handler import ChatHandler
@@ -68,8 +77,6 @@ except ImportError:
 setup_logging()
 logger = logging.getLogger(__name__)
 
-genai.configure(api_key=GEMINI_API_KEY)
-
 # ── Cliente Discord ────────────────────────────────────────────────────────────
 class MyClient(discord.Client):
     def __init__(self, *args, **kwargs):
@@ -82,6 +89,17 @@ client = MyClient(intents=create_intents())
 # ── Contexto global do bot (substitui variáveis globais soltas) ────────────────
 ctx = BotContext()
 ctx.telegram = TelegramNotifier()
+# Gateway de LLM: um cliente por chave, limites por chave/modelo e filas de prioridade
+if LLM_BACKEND == "fake":
+    logger.warning("⚠️ LLM_BACKEND=fake: respostas de IA simuladas localmente.")
+    llm_backends = [FakeGeminiBackend(seed=i) for i in range(max(1, len(GEMINI_API_KEYS)))]
+else:
+    llm_backends = [GeminiBackend(key) for key in GEMINI_API_KEYS]
+ctx.llm_gateway = LLMGateway(
+    llm_backends,
+    limits=GEMINI_MODEL_LIMITS,
+    default_limits=GEMINI_DEFAULT_LIMITS,
+)
 
 # Registra todos os event handlers (exceto on_ready, que fica abaixo)
 register_events(client, ctx)
@@ -110,21 +128,32 @@ async def on_ready() -> None:
         ctx.activity_tracker = ActivityTracker(ctx.db)
         ctx.embed_sender = EmbedSender(ctx.db)
         ctx.points_manager = PointsManager(ctx.db, ctx.ignored_voice_channels)
+        ctx.user_stats = UserStatsService(ctx.db)
+        ctx.points_manager.user_stats = ctx.user_stats
+        ctx.command_cache = CommandCache()
+        ctx.points_manager.command_cache = ctx.command_cache
+        ctx.daily_counters = DailyCounterStore(ctx.db)
+        ctx.points_manager.daily_counters = ctx.daily_counters
+        ctx.stats_collector.command_cache = ctx.command_cache
+        ctx.voice_sessions = VoiceSessionRegistry(ctx.db)
+        ctx.stats_collector.voice_sessions = ctx.voice_sessions
+        ctx.points_manager.session_registry = ctx.voice_sessions
+        ctx.activity_tracker.command_cache = ctx.command_cache
         ctx.spam_detector = SpamDetector()
+        ctx.raid_detector = RaidDetector()
+        ctx.recent_messages = RecentMessageBuffer()
         ctx.event_monitor = EventMonitor(ctx.db)
         ctx.leaderboard_updater = LeaderboardUpdater(client, ctx.db)
-        ctx.chat_handler = ChatHandler(
-            api_key=GEMINI_CHAT_API_KEY or GEMINI_API_KEY,
-            model_name=GEMINI_CHAT_MODEL,
-        )
+        ctx.chat_handler = ChatHandler(ctx.llm_gateway, model_name=GEMINI_CHAT_MODEL)
 
         if MemoryManager:
-            ctx.memory_manager = MemoryManager(ctx.db, ctx.chat_handler)
+            ctx.memory_manager = MemoryManager(ctx.db, ctx.chat_handler, ctx.llm_gateway)
         else:
             logger.warning("MemoryManager não disponível.")
 
         if StatsAnalyzer:
             ctx.stats_analyzer = StatsAnalyzer(ctx.db)
+            ctx.stats_analyzer.memory_manager = ctx.memory_manager
         else:
             logger.warning("StatsAnalyzer não disponível.")
 
@@ -138,6 +167,14 @@ async def on_ready() -> None:
                     ctx.ignored_voice_channels = guild_config["ignored_voice_channels"]
                 if guild_config.get("dynamic_roles_config"):
                     ctx.dynamic_roles_config = guild_config["dynamic_roles_config"]
+                ctx.spam_detector.set_guild_limits(
+                    guild.id,
+                    guild_config.get("spam_max_messages"),
+                    guild_config.get("spam_time_window"),
+                )
+                ctx.raid_detector.set_guild_enabled(
+                    guild.id, guild_config.get("ai_moderation_enabled") is not False
+                )
 
         # Fallback para defaults se banco não tiver configuração
         if not ctx.allowed_channels:
@@ -148,11 +185,11 @@ async def on_ready() -> None:
             ctx.dynamic_roles_config = dict(DEFAULT_DYNAMIC_ROLES_CONFIG)
 
         # Registra slash commands
-        client.tree.add_command(StatsCommands(ctx.db, ctx.leaderboard_updater))
+        client.tree.add_command(StatsCommands(ctx.db, ctx.leaderboard_updater, ctx.user_stats, ctx.command_cache))
         client.tree.add_command(RoleCommands(ctx.db, ctx.role_manager))
         client.tree.add_command(GiveawayCommands(ctx.db, ctx.giveaway_manager))
         client.tree.add_command(ModerationCommands(ctx.db))
-        client.tree.add_command(GamesCommands(ctx.db))
+        client.tree.add_command(GamesCommands(ctx.db, ctx.command_cache))
         client.tree.add_command(InfoCommands())
         client.tree.add_command(ConfigCommands(ctx.db, ctx))
         if ctx.memory_manager:
@@ -180,7 +217,7 @@ async def on_ready() -> None:
                     count += 1
             logger.info("✅ %d canais sincronizados em %s", count, guild.name)
 
-        await ctx.points_manager.recover_sessions()
+        await ctx.points_manager.recover_sessions(client.guilds)
 
         logger.info("📊 Sistema de estatísticas ativado!")
         logger.info("🏅 Sistema de cargos automáticos ativado!")
@@ -198,16 +235,24 @@ async def on_ready() -> None:
 
     # Inicia tasks em background
     loop = client.loop
-    loop.create_task(processador_em_lote(ctx.buffer_mensagens, ctx.db, ctx.points_manager, ctx.telegram))
+    loop.create_task(processador_em_lote(
+        ctx.buffer_mensagens, ctx.db, ctx.points_manager, ctx.telegram, ctx.llm_gateway,
+        raid_detector=ctx.raid_detector,
+    ))
     loop.create_task(bg.collect_server_stats(client, ctx.db))
+    loop.create_task(bg.maintain_partitions(client, ctx.db))
     loop.create_task(bg.check_roles_periodically(client, ctx.role_manager, ctx.dynamic_roles_config))
     loop.create_task(bg.check_expired_giveaways(client, ctx.db, ctx.giveaway_manager))
     loop.create_task(bg.check_embed_queue(client, ctx.db, ctx.embed_sender))
     loop.create_task(bg.check_monthly_podium(client, ctx.db, ctx.allowed_channels))
     loop.create_task(bg.check_context_stats(client, ctx.stats_analyzer))
+    loop.create_task(bg.process_memory_batches(client, ctx.memory_manager))
+    loop.create_task(bg.compact_bot_memories(client, ctx.memory_manager))
     loop.create_task(bg.send_daily_summary(client, ctx.db, ctx.telegram, ctx.giveaway_manager))
     loop.create_task(bg.weekly_games_report(client, ctx.db, ctx.telegram))
     loop.create_task(bg.check_voice_points_periodically(client, ctx.points_manager))
+    loop.create_task(bg.checkpoint_voice_sessions(client, ctx.voice_sessions))
+    loop.create_task(bg.report_llm_metrics(client, ctx.llm_gateway))
     if ctx.leaderboard_updater:
         loop.create_task(ctx.leaderboard_updater.start_loop())
 
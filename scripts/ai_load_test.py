@@ -0,0 +1,246 @@
+# scripts/ai_load_test.py — Teste de carga offline dos caminhos de IA
+"""
+Dispara milhares de mensagens sintéticas pela moderação em lote e pelo fluxo
+de menção (contexto + embeddings + resposta em streaming + extração de memória em lote)
+usando o LLMGateway com o FakeGeminiBackend: nada sai para a rede.
+
+Uso (na raiz do projeto):
+    python -m scripts.ai_load_test --messages 5000 --mentions 500 --keys 2 --rpm 600
+
+Relata vazão, profundidade de fila do gateway e latências (p50/p95/p99) para
+ajustar tamanho de lote, concorrência e limites antes de ir para produção.
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import struct
+import time
+from types import SimpleNamespace
+
+from tasks.moderation import analisar_lote_com_ia
+from utils.chat_handler import ChatHandler
+from utils.fake_llm_backend import FakeGeminiBackend, lognormal_latency
+from utils.llm_gateway import LLMGateway
+from utils.memory_manager import MemoryManager
+
+WORDS = (
+    "bora", "jogar", "hoje", "partida", "ranked", "clutch", "gg", "valeu", "noite",
+    "servidor", "evento", "sexta", "discord", "time", "mapa", "build", "patch", "lol",
+)
+
+
+class InMemoryDB:
+    """Superfície mínima do Database usada pelo MemoryManager, em memória."""
+
+    has_vector = False
+
+    def __init__(self):
+        self.embeddings = {}
+        self.memories = []
+        self.profiles = {}
+
+    async def get_server_context(self, guild_id):
+        return {"theme": "Games", "tone": "Zoeiro"}
+
+    async def get_user_bot_profile(self, user_id, guild_id):
+        return dict(self.profiles.get((user_id, guild_id), {}))
+
+    async def update_user_bot_profile(self, user_id, guild_id, updates):
+        self.profiles.setdefault((user_id, guild_id), {}).update(updates)
+
+    async def search_memories(self, guild_id, embedding=None, user_id=None, limit=3):
+        return [m for m in self.memories if m["guild_id"] == guild_id][-limit:]
+
+    async def store_memory(self, guild_id, content, embedding=None, user_id=None, keywords=None):
+        self.memories.append({"guild_id": guild_id, "user_id": user_id, "content": content, "embedding": embedding})
+        return False
+
+    async def get_memory_vectors(self, guild_id):
+        # Com numpy instalado, o MemoryManager busca pelo índice local (como sem pgvector)
+        return [
+            {"user_id": m["user_id"], "content": m["content"], "created_at": None,
+             "embedding_blob": struct.pack(f"<{len(m['embedding'])}f", *m["embedding"])}
+            for m in self.memories if m["guild_id"] == guild_id and m["embedding"]
+        ]
+
+    async def get_cached_embeddings(self, content_hashes):
+        return {h: self.embeddings[h] for h in content_hashes if h in self.embeddings}
+
+    async def store_cached_embeddings(self, embeddings):
+        self.embeddings.update(embeddings)
+
+
+def percentiles(samples):
+    if not samples:
+        return "n/a"
+    ordered = sorted(samples)
+
+    def pick(pct):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] * 1000
+    return f"p50={pick(0.50):.0f}ms p95={pick(0.95):.0f}ms p99={pick(0.99):.0f}ms max={ordered[-1] * 1000:.0f}ms"
+
+
+def synthetic_text(rng, flag_rate):
+    text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 14)))
+    if rng.random() < flag_rate:
+        text += " [ofensivo]"
+    if rng.random() < 0.05:
+        text = "lembre que " + text
+    return text
+
+
+async def run_moderation(args, gateway, rng, stats):
+    messages = [SimpleNamespace(content=synthetic_text(rng, args.flag_rate)) for _ in range(args.messages)]
+    queue = asyncio.Queue()
+    for i in range(0, len(messages), args.batch_size):
+        queue.put_nowait(messages[i:i + args.batch_size])
+
+    async def worker():
+        while not queue.empty():
+            batch = queue.get_nowait()
+            started = time.monotonic()
+            verdicts = await analisar_lote_com_ia(batch, gateway)
+            if verdicts is None:
+                stats["requeued"] += 1
+                queue.put_nowait(batch)  # Como o processador: o lote volta ao buffer
+                await asyncio.sleep(0.05)
+                continue
+            stats["batch_latency"].append(time.monotonic() - started)
+            stats["moderated"] += len(batch)
+            stats["flagged"] += verdicts.count("SIM")
+
+    await asyncio.gather(*(worker() for _ in range(args.moderation_workers)))
+
+
+async def run_mentions(args, gateway, rng, stats):
+    db = InMemoryDB()
+    chat = ChatHandler(gateway)
+    memory = MemoryManager(db, chat, gateway)
+    guild = SimpleNamespace(id=1, name="Load Test")
+    semaphore = asyncio.Semaphore(args.mention_workers)
+
+    async def mention(i):
+        async with semaphore:
+            user = SimpleNamespace(id=rng.randint(1, args.users), display_name=f"user{i}", bot=False)
+            content = synthetic_text(rng, 0.0)
+            started = time.monotonic()
+
+            context = await memory.get_relevant_context(guild, user, content)
+            stats["context_latency"].append(time.monotonic() - started)
+
+            first, parts = None, []
+            async for chunk in chat.stream_response(content, history=[], system_instruction=context):
+                if first is None:
+                    first = time.monotonic() - started
+                parts.append(chunk)
+            stats["first_chunk"].append(first or 0.0)
+            stats["reply_latency"].append(time.monotonic() - started)
+            stats["replies"] += 1
+
+            memory.queue_turn(guild.id, user.id, content, "".join(parts))
+
+    async def flush_memories(done):
+        # Como tasks.background_tasks.process_memory_batches, com intervalo curto
+        while not done.is_set():
+            await asyncio.sleep(args.memory_interval)
+            await memory.flush_memory_batch()
+
+    done = asyncio.Event()
+    flusher = asyncio.ensure_future(flush_memories(done))
+    tasks = []
+    for i in range(args.mentions):
+        tasks.append(asyncio.ensure_future(mention(i)))
+        if args.mention_rate > 0:
+            await asyncio.sleep(rng.expovariate(args.mention_rate))
+    await asyncio.gather(*tasks)
+    done.set()
+    await flusher
+    await memory.flush_memory_batch()
+    stats["memories"] = len(db.memories)
+
+
+async def sample_queue_depth(gateway, stats, stop):
+    while not stop.is_set():
+        depth = sum(lane["queued"] for lane in gateway.snapshot().values())
+        stats["queue_depth"].append(depth)
+        await asyncio.sleep(0.1)
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    backends = [
+        FakeGeminiBackend(
+            seed=args.seed + i,
+            latency=lognormal_latency(args.latency_median, args.latency_p95),
+            error_rate=args.error_rate,
+            exhausted_rate=args.exhausted_rate,
+            rpm_quota=args.server_rpm,
+        )
+        for i in range(args.keys)
+    ]
+    gateway = LLMGateway(backends, default_limits=(args.rpm, args.tpm), cooldown=args.cooldown)
+
+    stats = {
+        "batch_latency": [], "moderated": 0, "flagged": 0, "requeued": 0,
+        "context_latency": [], "first_chunk": [], "reply_latency": [], "replies": 0,
+        "queue_depth": [], "memories": 0,
+    }
+    stop = asyncio.Event()
+    sampler = asyncio.ensure_future(sample_queue_depth(gateway, stats, stop))
+
+    started = time.monotonic()
+    await asyncio.gather(
+        run_moderation(args, gateway, rng, stats),
+        run_mentions(args, gateway, rng, stats),
+    )
+    elapsed = time.monotonic() - started
+    stop.set()
+    await sampler
+
+    depth = stats["queue_depth"] or [0]
+    print(f"\n=== Teste de carga de IA ({elapsed:.1f}s, {args.keys} chave(s), {args.rpm} rpm/chave) ===")
+    print(f"Moderação: {stats['moderated']} msgs ({stats['moderated'] / elapsed:.1f}/s), "
+          f"{stats['flagged']} removidas, {stats['requeued']} lotes devolvidos ao buffer")
+    print(f"  lote:          {percentiles(stats['batch_latency'])}")
+    print(f"Menções: {stats['replies']} respostas ({stats['replies'] / elapsed:.1f}/s), "
+          f"{stats['memories']} memórias salvas")
+    print(f"  contexto:      {percentiles(stats['context_latency'])}")
+    print(f"  1º chunk:      {percentiles(stats['first_chunk'])}")
+    print(f"  resposta:      {percentiles(stats['reply_latency'])}")
+    print(f"Fila do gateway: média={sum(depth) / len(depth):.1f} máx={max(depth)}")
+    for lane, lane_stats in gateway.snapshot().items():
+        print(f"  {lane:<11} {lane_stats}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga offline dos caminhos de IA")
+    parser.add_argument("--messages", type=int, default=2000, help="mensagens para a moderação")
+    parser.add_argument("--batch-size", type=int, default=10, help="mensagens por lote de moderação")
+    parser.add_argument("--moderation-workers", type=int, default=2, help="lotes analisados em paralelo")
+    parser.add_argument("--flag-rate", type=float, default=0.03, help="fração de mensagens ofensivas")
+    parser.add_argument("--mentions", type=int, default=300, help="menções ao bot")
+    parser.add_argument("--mention-workers", type=int, default=20, help="menções atendidas em paralelo")
+    parser.add_argument("--mention-rate", type=float, default=0.0, help="chegadas/s (0 = todas de uma vez)")
+    parser.add_argument("--memory-interval", type=float, default=1.0, help="intervalo da extração de memória em lote (s)")
+    parser.add_argument("--users", type=int, default=200, help="usuários distintos nas menções")
+    parser.add_argument("--keys", type=int, default=2, help="chaves de API simuladas")
+    parser.add_argument("--rpm", type=int, default=600, help="limite do gateway: requisições/min por chave")
+    parser.add_argument("--tpm", type=int, default=4_000_000, help="limite do gateway: tokens/min por chave")
+    parser.add_argument("--server-rpm", type=int, default=None, help="cota simulada do servidor por chave")
+    parser.add_argument("--cooldown", type=float, default=5.0, help="resfriamento após ResourceExhausted (s)")
+    parser.add_argument("--latency-median", type=float, default=0.4, help="mediana da latência simulada (s)")
+    parser.add_argument("--latency-p95", type=float, default=1.5, help="p95 da latência simulada (s)")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="fração de erros 500 injetados")
+    parser.add_argument("--exhausted-rate", type=float, default=0.02, help="fração de ResourceExhausted injetados")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verbose", action="store_true", help="mostra os logs dos erros injetados")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    cli_args = parse_args()
+    if not cli_args.verbose:
+        logging.disable(logging.CRITICAL)
+    asyncio.run(main(cli_args))
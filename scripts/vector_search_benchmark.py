@@ -0,0 +1,174 @@
+# scripts/vector_search_benchmark.py — Recall e latência da busca de memórias
+"""
+Popula bot_memories com embeddings sintéticos (vários servidores, tópicos
+agrupados, parte das memórias globais) e compara Database.search_memories
+com a busca exata, medindo recall@k e latência. Também mede a consulta
+antiga (HNSW global + filtro por servidor) como referência.
+
+Uso (na raiz do projeto):
+    python -m scripts.vector_search_benchmark --database-url postgresql://... \\
+        --guilds 20 --per-guild 1000 --queries 200 --candidates 40,100,200,400
+
+Requer pgvector. ATENÇÃO: use um banco descartável — o schema do bot é criado
+nele e as memórias sintéticas (guild_id negativos) são apagadas ao final.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+from database import _MEMORY_VECTOR_INDEXES, Database
+
+# Geração no próprio banco: 768 floats por linha em Python seria o gargalo.
+# (CREATE TABLE AS não aceita parâmetros; o número de tópicos entra formatado)
+TOPICS_SQL = """
+    CREATE TEMP TABLE bench_topics AS
+    SELECT t, array(SELECT random() - 0.5 + t * 0 FROM generate_series(1, 768)) AS center
+    FROM generate_series(1, {topics}) t
+"""
+
+SEED_SQL = """
+    INSERT INTO bot_memories (guild_id, user_id, content, embedding)
+    SELECT -g, CASE WHEN random() < $3 THEN NULL ELSE 1 + floor(random() * $4)::int END,
+           'bench ' || g || ' ' || i,
+           (SELECT array_agg(c + (random() - 0.5) * $5) FROM unnest(bench_topics.center) c)::vector
+    FROM generate_series(1, $1::int) g
+    CROSS JOIN generate_series(1, $2::int) i
+    JOIN bench_topics ON bench_topics.t = 1 + (g * 7919 + i * 104729) % $6
+"""
+
+BULK_TIMEOUT = 3600  # segundos; o pool do Database usa 60
+
+QUERY_SQL = """
+    SELECT -(1 + floor(random() * $2)::int) AS guild_id, 1 + floor(random() * $3)::int AS user_id,
+           (SELECT array_agg(c + (random() - 0.5) * $4) FROM unnest(bench_topics.center) c)::vector AS embedding
+    FROM (SELECT q, 1 + floor(random() * $5)::int AS t FROM generate_series(1, $1::int) q) picked
+    JOIN bench_topics USING (t)
+"""
+
+EXACT_SQL = """
+    SELECT content, 1 - (embedding <=> $1::vector) AS similarity
+    FROM bot_memories
+    WHERE guild_id = $2 AND (user_id = $3 OR user_id IS NULL)
+    ORDER BY similarity DESC
+    LIMIT $4
+"""
+
+# Consulta anterior: um único HNSW global, com o filtro aplicado depois
+LEGACY_SQL = """
+    SELECT content, 1 - (embedding <=> $1::vector) AS similarity
+    FROM bot_memories
+    WHERE guild_id = $2 AND (user_id = $3 OR user_id IS NULL)
+    ORDER BY embedding <=> $1::vector
+    LIMIT $4
+"""
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] * 1000
+
+
+async def seed(db, args):
+    async with db.pool.acquire() as conn:
+        await conn.execute("DELETE FROM bot_memories WHERE guild_id < 0")
+        started = time.monotonic()
+        await conn.execute("DROP TABLE IF EXISTS bench_topics")
+        await conn.execute(TOPICS_SQL.format(topics=int(args.topics)))
+        # Carga em massa: inserir sem o HNSW e reconstruí-lo depois é bem mais rápido
+        for index, _ in _MEMORY_VECTOR_INDEXES.values():
+            await conn.execute(f"DROP INDEX IF EXISTS {index}")
+        await conn.execute(
+            SEED_SQL, args.guilds, args.per_guild, args.global_rate, args.users, args.noise, args.topics,
+            timeout=BULK_TIMEOUT,
+        )
+        await conn.execute("SET maintenance_work_mem = '512MB'")
+        await db._sync_memory_vector_index(conn)  # Índice do MEMORY_VECTOR_STORAGE atual
+        await conn.execute("ANALYZE bot_memories")
+        print(f"{args.guilds * args.per_guild} memórias sintéticas inseridas e indexadas "
+              f"em {time.monotonic() - started:.1f}s")
+
+        rows = await conn.fetch(QUERY_SQL, args.queries, args.guilds, args.users, args.noise, args.topics)
+        await conn.execute("DROP TABLE bench_topics")
+    return [(row["guild_id"], row["user_id"], row["embedding"]) for row in rows]
+
+
+async def measure(name, run, queries, exact, k):
+    latencies, recalls = [], []
+    for (guild_id, user_id, embedding), truth in zip(queries, exact):
+        started = time.monotonic()
+        found = await run(guild_id, user_id, embedding)
+        latencies.append(time.monotonic() - started)
+        if truth:
+            recalls.append(len({r["content"] for r in found} & truth) / len(truth))
+    recall = sum(recalls) / len(recalls) if recalls else 0.0
+    print(f"  {name:<28} recall@{k}={recall:.3f}  p50={percentile(latencies, 0.5):.1f}ms "
+          f"p95={percentile(latencies, 0.95):.1f}ms")
+
+
+async def main(args):
+    db = Database(args.database_url)
+    await db.connect()
+    try:
+        if not db.has_vector:
+            print("pgvector indisponível: nada a medir.")
+            return
+        queries = await seed(db, args)
+        k = args.k
+
+        async def fetch(sql, embedding, guild_id, user_id):
+            async with db.pool.acquire() as conn:
+                return await conn.fetch(sql, embedding, guild_id, user_id, k)
+
+        exact = [
+            {r["content"] for r in await fetch(EXACT_SQL, embedding, guild_id, user_id)}
+            for guild_id, user_id, embedding in queries
+        ]
+
+        version = ".".join(map(str, db.vector_version))
+        iterative = "com" if db.vector_iterative_scan else "sem"
+        print(f"\n=== Busca de memórias: {len(queries)} consultas, pgvector {version} ({iterative} varredura iterativa, "
+              f"índice {db.vector_storage}) ===")
+        await measure("exata (referência)",
+                      lambda g, u, e: fetch(EXACT_SQL, e, g, u), queries, exact, k)
+        await measure("antiga (HNSW global)",
+                      lambda g, u, e: fetch(LEGACY_SQL, e, g, u), queries, exact, k)
+        for candidates in args.candidates:
+            await measure(f"search_memories ({candidates} cand.)",
+                          lambda g, u, e: db.search_memories(g, e, u, limit=k, candidates=candidates),
+                          queries, exact, k)
+            if not db.vector_iterative_scan:
+                break  # Sem varredura iterativa o número de candidatos não muda nada
+    finally:
+        if not args.keep:
+            async with db.pool.acquire() as conn:
+                await conn.execute("DELETE FROM bot_memories WHERE guild_id < 0")
+        await db.disconnect()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Recall e latência da busca vetorial de memórias")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", ""),
+                        help="banco descartável com pgvector (ou BENCH_DATABASE_URL)")
+    parser.add_argument("--guilds", type=int, default=20, help="servidores sintéticos")
+    parser.add_argument("--per-guild", type=int, default=1000, help="memórias por servidor")
+    parser.add_argument("--users", type=int, default=50, help="usuários distintos por servidor")
+    parser.add_argument("--global-rate", type=float, default=0.2, help="fração de memórias globais (sem usuário)")
+    parser.add_argument("--topics", type=int, default=64, help="tópicos (centros dos agrupamentos)")
+    parser.add_argument("--noise", type=float, default=0.6, help="ruído em torno de cada tópico")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3, help="memórias por busca (como no contexto do chat)")
+    parser.add_argument("--candidates", type=lambda v: [int(x) for x in v.split(",")], default=[40, 100, 200, 400],
+                        help="valores de hnsw.ef_search a comparar, separados por vírgula")
+    parser.add_argument("--keep", action="store_true", help="não apaga as memórias sintéticas ao final")
+    args = parser.parse_args(argv)
+    if not args.database_url:
+        parser.error("informe --database-url ou BENCH_DATABASE_URL")
+    return args
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    asyncio.run(main(parse_args()))
@@ -4,6 +4,7 @@ import discord
 from database import Database
 import logging
 from typing import Optional
+from utils.command_cache import MESSAGE_COMMANDS
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +25,10 @@ class StatsCollector:
         self.user_cache = {} 
         self.channel_cache = {}
         self.CACHE_TTL = 3600  # 1 hora em segundos
+        # CommandCache dos slash commands (opcional), invalidado a cada mensagem
+        self.command_cache = None
+        # VoiceSessionRegistry (opcional): sessões de voz pela chave primária
+        self.voice_sessions = None
 
     def _should_update(self, item_id: int, cache_dict: dict) -> bool:
         """Verifica se um item deve ser atualizado baseado no cache/TTL."""
@@ -94,6 +99,8 @@ class StatsCollector:
                 has_embeds=len(message.embeds) > 0,
                 was_moderated=was_moderated
             )
+            if self.command_cache:
+                self.command_cache.invalidate(message.guild.id, MESSAGE_COMMANDS)
             
             logger.debug(f"📊 Estatísticas coletadas: mensagem de {message.author.name}")
             
@@ -145,32 +152,31 @@ class StatsCollector:
                         guild_id=after.channel.guild.id
                     )
                 
-                await self.db.insert_voice_join(
-                    user_id=member.id,
-                    channel_id=after.channel.id,
-                    guild_id=after.channel.guild.id
-                )
+                if self.voice_sessions:
+                    await self.voice_sessions.join(after.channel.guild.id, member.id, after.channel.id)
+                else:
+                    await self.db.insert_voice_join(
+                        user_id=member.id,
+                        channel_id=after.channel.id,
+                        guild_id=after.channel.guild.id
+                    )
                 
                 logger.debug(f"🎤 {member.name} entrou no canal de voz {after.channel.name}")
             
             # Usuário saiu de um canal de voz
             elif before.channel is not None and after.channel is None:
-                await self.db.update_voice_leave(
-                    user_id=member.id,
-                    channel_id=before.channel.id
-                )
+                if self.voice_sessions:
+                    await self.voice_sessions.leave(before.channel.guild.id, member.id, before.channel.id)
+                else:
+                    await self.db.update_voice_leave(
+                        user_id=member.id,
+                        channel_id=before.channel.id
+                    )
                 
                 logger.debug(f"🎤 {member.name} saiu do canal de voz {before.channel.name}")
             
             # Usuário mudou de canal (sai de um e entra em outro)
             elif before.channel is not None and after.channel is not None and before.channel.id != after.channel.id:
-                # Registra saída do canal anterior
-                await self.db.update_voice_leave(
-                    user_id=member.id,
-                    channel_id=before.channel.id
-                )
-                
-                # Registra entrada no novo canal
                 if self._should_update(after.channel.id, self.channel_cache):
                     await self.db.upsert_channel(
                         channel_id=after.channel.id,
@@ -179,11 +185,24 @@ class StatsCollector:
                         guild_id=after.channel.guild.id
                     )
                 
-                await self.db.insert_voice_join(
-                    user_id=member.id,
-                    channel_id=after.channel.id,
-                    guild_id=after.channel.guild.id
-                )
+                if self.voice_sessions:
+                    # Fecha a sessão anterior e abre a nova em um único comando
+                    await self.voice_sessions.move(
+                        after.channel.guild.id, member.id, before.channel.id, after.channel.id
+                    )
+                else:
+                    # Registra saída do canal anterior
+                    await self.db.update_voice_leave(
+                        user_id=member.id,
+                        channel_id=before.channel.id
+                    )
+                    
+                    # Registra entrada no novo canal
+                    await self.db.insert_voice_join(
+                        user_id=member.id,
+                        channel_id=after.channel.id,
+                        guild_id=after.channel.guild.id
+                    )
                 
                 logger.debug(f"🎤 {member.name} mudou de {before.channel.name} para {after.channel.name}")
                 
@@ -198,13 +217,8 @@ class StatsCollector:
             message_id: ID da mensagem que foi moderada
         """
         try:
-            async with self.db.pool.acquire() as conn:
-                await conn.execute("""
-                    UPDATE messages 
-                    SET was_moderated = TRUE 
-                    WHERE message_id = $1
-                """, message_id)
-                
+            await self.db.update_message_moderation_status(message_id, True)
+
             logger.debug(f"🚫 Mensagem {message_id} marcada como moderada")
             
         except Exception as e:
@@ -18,7 +18,7 @@ logger = logging.getLogger(__name__)
 
 # ── Estatísticas do Servidor ───────────────────────────────────────────────────
 async def collect_server_stats(client: discord.Client, db) -> None:
-    """Coleta a contagem de membros de cada guild a cada 1 hora."""
+    """Coleta a contagem de membros e atualiza o rollup de mensagens a cada 1 hora."""
     await client.wait_until_ready()
     while not client.is_closed():
         try:
@@ -29,11 +29,44 @@ async def collect_server_stats(client: discord.Client, db) -> None:
                         "📊 Estatísticas atualizadas para %s: %d membros",
                         guild.name, guild.member_count,
                     )
+                await db.refresh_message_rollup()
         except Exception as exc:
             logger.error("❌ Erro ao coletar estatísticas do servidor: %s", exc)
         await asyncio.sleep(3600)
 
 
+# ── Manutenção de Partições ────────────────────────────────────────────────────
+async def maintain_partitions(client: discord.Client, db) -> None:
+    """Cria partições mensais futuras, aplica a retenção e limpa o cache de embeddings a cada 24 horas."""
+    await client.wait_until_ready()
+    while not client.is_closed():
+        try:
+            if db:
+                await db.maintain_partitions()
+                logger.info("🗂️ Manutenção de partições concluída")
+                removed = await db.prune_embedding_cache()
+                if removed:
+                    logger.info("🧹 %d embeddings antigos removidos do cache", removed)
+        except Exception as exc:
+            logger.error("❌ Erro na manutenção de partições: %s", exc)
+        await asyncio.sleep(86400)
+
+
+# ── Métricas do Gateway de LLM ─────────────────────────────────────────────────
+async def report_llm_metrics(client: discord.Client, gateway) -> None:
+    """Registra no log as métricas de cada fila do gateway a cada 15 minutos."""
+    await client.wait_until_ready()
+    while not client.is_closed():
+        await asyncio.sleep(900)
+        try:
+            if gateway:
+                for lane, stats in gateway.snapshot().items():
+                    if stats["submitted"]:
+                        logger.info("🤖 LLM[%s]: %s", lane, stats)
+        except Exception as exc:
+            logger.error("❌ Erro ao coletar métricas do gateway de LLM: %s", exc)
+
+
 # ── Verificação de Cargos ──────────────────────────────────────────────────────
 async def check_roles_periodically(
     client: discord.Client,
@@ -302,6 +335,33 @@ async def check_context_stats(client: discord.Client, stats_analyzer) -> None:
         await asyncio.sleep(21600)
 
 
+# ── Memória do Bot ────────────────────────────────────────────────────────────
+async def process_memory_batches(client: discord.Client, memory_manager, interval: int = 120) -> None:
+    """Envia os turnos de conversa acumulados para extração de memória em lote a cada 2 minutos."""
+    await client.wait_until_ready()
+    while not client.is_closed():
+        await asyncio.sleep(interval)
+        try:
+            if memory_manager:
+                await memory_manager.flush_memory_batch()
+        except Exception as exc:
+            logger.error("❌ Erro na extração de memória em lote: %s", exc)
+
+
+async def compact_bot_memories(client: discord.Client, memory_manager) -> None:
+    """Compacta memórias antigas parecidas e aplica os limites por usuário/servidor a cada 24 horas."""
+    await client.wait_until_ready()
+    while not client.is_closed():
+        try:
+            if memory_manager:
+                removed = await memory_manager.compact_memories()
+                if removed:
+                    logger.info("🧠 %d memórias compactadas/removidas", removed)
+        except Exception as exc:
+            logger.error("❌ Erro na compactação de memórias: %s", exc)
+        await asyncio.sleep(86400)
+
+
 # ── Pontos de Voz ─────────────────────────────────────────────────────────────
 async def check_voice_points_periodically(
     client: discord.Client, points_manager
@@ -315,3 +375,15 @@ async def check_voice_points_periodically(
         except Exception as exc:
             logger.error("❌ Erro no loop de pontos periódicos: %s", exc)
         await asyncio.sleep(60)
+
+
+async def checkpoint_voice_sessions(client: discord.Client, voice_sessions, interval: int = 300) -> None:
+    """Grava o tempo corrido das sessões de voz abertas a cada 5 minutos (limita a perda numa queda)."""
+    await client.wait_until_ready()
+    while not client.is_closed():
+        await asyncio.sleep(interval)
+        try:
+            if voice_sessions:
+                await voice_sessions.checkpoint()
+        except Exception as exc:
+            logger.error("❌ Erro no checkpoint das sessões de voz: %s", exc)
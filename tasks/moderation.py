@@ -2,7 +2,9 @@
 """
 Toda a lógica de moderação com Gemini foi extraída do main.py para cá.
 Melhorias em relação à versão original:
- - Prompt solicita JSON estruturado (mais robusto que split(","))
+ - Saída estruturada (response_schema): o modelo devolve só as mensagens
+   sinalizadas, com id, confiança e motivo
+ - Mensagens compactadas (uma linha, texto longo cortado) para caber mais por chamada
  - Parsing com fallback regex → safe default (assume NÃO)
  - Threshold de confiança (0.8) para evitar falsos positivos
  - Log de auditoria com motivo da decisão
@@ -12,59 +14,88 @@ import json
 import re
 import logging
 import traceback
+from datetime import timedelta
 
-import google.generativeai as genai
 from google.api_core.exceptions import ResourceExhausted
 import discord
 
 from config import (
-    GEMINI_API_KEY,
     GEMINI_MODERATION_MODEL,
     MODERATION_CONFIDENCE_THRESHOLD,
+    MODERATION_MAX_BUFFER,
+    MODERATION_MAX_DELAY,
     INTERVALO_ANALISE,
     TAMANHO_LOTE_MINIMO,
 )
+from utils.llm_gateway import Lane, LLMDeadlineExceeded
 
 logger = logging.getLogger(__name__)
 
-# Inicializa o modelo de moderação
-genai.configure(api_key=GEMINI_API_KEY)
-_moderation_model = genai.GenerativeModel(model_name=GEMINI_MODERATION_MODEL)
-
 # ---------------------------------------------------------------------------
 # Prompt e Parsing
 # ---------------------------------------------------------------------------
 
-_MODERATION_PROMPT_TEMPLATE = """\
+_MODERATION_INSTRUCTION = """\
 Você é um moderador de um chat de jogos em português brasileiro.
-Analise as mensagens abaixo e determine se cada uma contém conteúdo proibido.
+Cada mensagem vem em uma linha no formato id|texto.
 
-CRITÉRIOS PARA "SIM" (remover):
+Sinalize apenas mensagens com:
 - Discurso de ódio (racismo, homofobia, etc.)
 - Assédio ou ameaças diretas a usuários
 - Conteúdo NSFW explícito (pornografia, violência extrema)
 
-CRITÉRIOS PARA "NÃO" (manter):
-- Palavrões leves em contexto casual ou de jogo
-- Gírias, sarcasmo, humor, ironia
-- Críticas a jogos ou personagens
-- Em QUALQUER caso de dúvida, responda NÃO
-
-Responda EXCLUSIVAMENTE com JSON válido no formato abaixo, sem markdown, sem texto extra:
-{{"resultados": [{{"id": 1, "veredito": "SIM", "confianca": 0.95, "motivo": "..."}}]}}
-
-Use "SIM" ou "NÃO" como veredito. Confiança entre 0.0 e 1.0.
+Não sinalize palavrões leves em contexto casual ou de jogo, gírias, sarcasmo,
+humor, ironia nem críticas a jogos ou personagens. Em QUALQUER dúvida, não sinalize.
 
-MENSAGENS:
-{messages}
+Em "sinalizadas", liste só as mensagens sinalizadas: id, confianca (0.0 a 1.0)
+e motivo em poucas palavras. Se nenhuma for proibida, a lista fica vazia.
 """
 
+# Saída estruturada: o modelo só pode responder JSON neste formato
+_MODERATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "sinalizadas": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "confianca": {"type": "number"},
+                    "motivo": {"type": "string"},
+                },
+                "required": ["id", "confianca"],
+            },
+        },
+    },
+    "required": ["sinalizadas"],
+}
+_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": _MODERATION_SCHEMA,
+    "temperature": 0,
+}
+
+# Mensagens longas mantêm começo e fim (ofensas costumam estar nas pontas)
+_MAX_CHARS_POR_MENSAGEM = 400
+_REPETICAO = re.compile(r"(.)\1{4,}")
+_ESPACOS = re.compile(r"\s+")
+
+
+def _compactar(texto: str) -> str:
+    """Uma linha por mensagem: espaços e letras repetidas ("kkkkkkkk") encolhidos, texto longo cortado no meio."""
+    texto = _ESPACOS.sub(" ", _REPETICAO.sub(r"\1\1\1\1", texto or "")).strip()
+    if len(texto) <= _MAX_CHARS_POR_MENSAGEM:
+        return texto
+    cabeca = _MAX_CHARS_POR_MENSAGEM * 2 // 3
+    return f"{texto[:cabeca]} […] {texto[-(_MAX_CHARS_POR_MENSAGEM - cabeca):]}"
+
 
 def _build_prompt(messages: list[discord.Message]) -> str:
     lines = "\n".join(
-        f'{i}: "{msg.content}"' for i, msg in enumerate(messages, 1)
+        f"{i}|{_compactar(msg.content)}" for i, msg in enumerate(messages, 1)
     )
-    return _MODERATION_PROMPT_TEMPLATE.format(messages=lines)
+    return f"MENSAGENS:\n{lines}"
 
 
 def _parse_json_response(
@@ -72,6 +103,8 @@ def _parse_json_response(
 ) -> list[dict]:
     """
     Tenta fazer o parse do JSON retornado pelo Gemini.
+    Aceita o formato da saída estruturada ({"sinalizadas": [...]}, só as SIM)
+    e o formato antigo ({"resultados": [...]} com veredito por mensagem).
     Em caso de falha, usa regex como fallback.
     Se tudo falhar, retorna safe defaults (NÃO para todas).
     """
@@ -81,6 +114,12 @@ def _parse_json_response(
     # Tentativa 1: JSON puro
     try:
         data = json.loads(cleaned)
+        if "sinalizadas" in data:
+            return [
+                {**item, "veredito": "SIM"}
+                for item in data["sinalizadas"]
+                if isinstance(item, dict) and "id" in item
+            ]
         return data.get("resultados", [])
     except json.JSONDecodeError:
         logger.debug("Parse JSON falhou, tentando regex fallback.")
@@ -131,10 +170,12 @@ def _should_moderate(result: dict) -> bool:
 
 async def analisar_lote_com_ia(
     lista_de_mensagens: list[discord.Message],
-) -> list[str]:
+    gateway,
+) -> list[str] | None:
     """
-    Analisa um lote de mensagens com Gemini.
-    Retorna lista de "SIM" / "NÃO" na mesma ordem das mensagens recebidas.
+    Analisa um lote de mensagens com Gemini (fila de moderação do gateway).
+    Retorna lista de "SIM" / "NÃO" na mesma ordem das mensagens recebidas,
+    ou None se a cota não permitiu analisar o lote (o chamador o devolve ao buffer).
     """
     if not lista_de_mensagens:
         return []
@@ -143,7 +184,11 @@ async def analisar_lote_com_ia(
 
     try:
         prompt = _build_prompt(lista_de_mensagens)
-        response = await _moderation_model.generate_content_async(prompt)
+        response = await gateway.generate(
+            Lane.MODERATION, GEMINI_MODERATION_MODEL, prompt,
+            system_instruction=_MODERATION_INSTRUCTION,
+            generation_config=_GENERATION_CONFIG,
+        )
         raw_text = response.text.strip()
         logger.debug("Resposta bruta da IA: %.300s", raw_text)
 
@@ -169,12 +214,12 @@ async def analisar_lote_com_ia(
 
         return vereditos
 
-    except ResourceExhausted:
+    except (ResourceExhausted, LLMDeadlineExceeded):
         logger.warning(
-            "⚠️ Cota da API Gemini excedida. Ignorando lote de %d mensagens.",
+            "⚠️ Cota da API Gemini excedida. Lote de %d mensagens volta para o buffer.",
             len(lista_de_mensagens),
         )
-        return ["NÃO"] * len(lista_de_mensagens)
+        return None
     except Exception:
         logger.error("Erro inesperado na análise em lote:")
         traceback.print_exc()
@@ -185,21 +230,171 @@ async def analisar_lote_com_ia(
 # Loop do processador em lote
 # ---------------------------------------------------------------------------
 
+def _expandir_grupos(raid_detector, resultados: list[tuple]) -> list[tuple]:
+    """Aplica o veredito de cada representante às cópias absorvidas pelo RaidDetector."""
+    expandidos = []
+    for msg, veredito in resultados:
+        expandidos.append((msg, veredito))
+        expandidos.extend((copia, veredito) for copia in raid_detector.take_members(msg))
+        raid_detector.resolve(msg, veredito == "SIM")
+    return expandidos
+
+
+def _devolver_ao_buffer(buffer_mensagens: list, mensagens: list, raid_detector=None) -> None:
+    """
+    Devolve um lote não analisado (sem cota/prazo) para a frente do buffer.
+
+    Mensagens mais velhas que MODERATION_MAX_DELAY não voltam (moderar horas
+    depois não ajuda ninguém) e o buffer nunca passa de MODERATION_MAX_BUFFER:
+    numa falha prolongada as mais antigas são descartadas. Um descarte que era
+    representante de grupo do RaidDetector libera as cópias do grupo.
+    """
+    limite = discord.utils.utcnow() - timedelta(seconds=MODERATION_MAX_DELAY)
+    descartadas = [msg for msg in mensagens if msg.created_at < limite]
+    buffer_mensagens[:0] = [msg for msg in mensagens if msg.created_at >= limite]
+    excesso = len(buffer_mensagens) - MODERATION_MAX_BUFFER
+    if excesso > 0:
+        descartadas.extend(buffer_mensagens[:excesso])
+        del buffer_mensagens[:excesso]
+    if not descartadas:
+        return
+    if raid_detector:
+        for msg in descartadas:
+            raid_detector.discard(msg)
+    logger.warning(
+        "⚠️ Moderação atrasada: %d mensagens descartadas sem análise (buffer: %d)",
+        len(descartadas), len(buffer_mensagens),
+    )
+
+
+def _pontos_da_mensagem(msg: discord.Message) -> int:
+    """Pontos que a mensagem rendeu (e que a remoção retira)."""
+    pontos = 2 if len(msg.content) >= 10 else 1
+    if msg.reference:
+        pontos += 1
+    return pontos
+
+
+async def _apagar_uma(msg: discord.Message) -> bool:
+    try:
+        await msg.delete()
+        return True
+    except discord.NotFound:
+        return False  # Já apagada pelo autor
+
+
+async def _apagar_no_canal(channel, mensagens: list[discord.Message]) -> list[discord.Message]:
+    """
+    Uma chamada de bulk delete por canal (até 100 mensagens cada).
+    Retorna só as mensagens que o bot de fato apagou: as que o autor já
+    removeu não geram aviso, marcação nem penalidade.
+    """
+    if len(mensagens) == 1:
+        return mensagens if await _apagar_uma(mensagens[0]) else []
+    apagadas = []
+    for i in range(0, len(mensagens), 100):
+        parte = mensagens[i:i + 100]
+        try:
+            await channel.delete_messages(parte)
+            apagadas.extend(parte)
+        except discord.NotFound:
+            # Alguma já não existe: apaga uma a uma para saber quais eram
+            apagadas.extend([msg for msg in parte if await _apagar_uma(msg)])
+    return apagadas
+
+
+async def _aplicar_vereditos(resultados: list[tuple], db, points_manager, telegram) -> None:
+    """
+    Remove as mensagens com veredito SIM: apaga em lote por canal com um só
+    aviso por canal, grava o status e as penalidades em uma escrita cada.
+    Mensagens limpas não geram escrita (was_moderated já é FALSE por padrão).
+    """
+    por_canal: dict[int, list[discord.Message]] = {}
+    for msg, veredito in resultados:
+        if veredito == "SIM":
+            por_canal.setdefault(msg.channel.id, []).append(msg)
+    if not por_canal:
+        return
+
+    apagadas: list[discord.Message] = []
+    for mensagens in por_canal.values():
+        channel = mensagens[0].channel
+        try:
+            mensagens = await _apagar_no_canal(channel, mensagens)
+        except discord.Forbidden:
+            logger.warning(
+                "Sem permissão para deletar mensagens em %s",
+                getattr(channel, "name", "canal desconhecido"),
+            )
+            continue
+        except Exception as exc:
+            logger.error("Erro ao apagar mensagens moderadas: %s", exc)
+            continue
+        if not mensagens:
+            continue
+        apagadas.extend(mensagens)
+
+        autores = list(dict.fromkeys(msg.author.mention for msg in mensagens))
+        if len(mensagens) == 1:
+            aviso = f"⚠️ Mensagem de {autores[0]} removida por conter linguagem inadequada."
+        else:
+            aviso = (
+                f"⚠️ {len(mensagens)} mensagens de {', '.join(autores)} removidas por "
+                "conter linguagem inadequada."
+            )
+        try:
+            await channel.send(aviso, delete_after=10)
+            if telegram and mensagens[0].guild:
+                await telegram.log_messages_deleted(
+                    mensagens[0].guild, channel, mensagens, reason="Moderação por IA"
+                )
+        except Exception as exc:
+            logger.error("Erro ao avisar sobre mensagens moderadas: %s", exc)
+
+    if not apagadas:
+        return
+
+    try:
+        if db:
+            await db.mark_messages_moderated([msg.id for msg in apagadas])
+    except Exception as exc:
+        logger.error("Erro ao gravar status de moderação: %s", exc)
+
+    # Remove pontos dos autores
+    if points_manager:
+        await points_manager.remove_points_batch(
+            [(msg.author.id, msg.guild.id, _pontos_da_mensagem(msg)) for msg in apagadas if msg.guild],
+            "moderation_deletion",
+        )
+
+
 async def processador_em_lote(
     buffer_mensagens: list[discord.Message],
     db,
     points_manager,
     telegram,
+    gateway,
+    raid_detector=None,
 ) -> None:
     """
     Corrotina contínua que drena o buffer global de mensagens e aplica moderação.
     Deve ser iniciada como task com client.loop.create_task().
+    Com `raid_detector`, cada grupo de mensagens quase idênticas é analisado uma
+    vez (pelo representante que está no buffer) e o veredito vale para o grupo todo.
     """
     import asyncio
 
     while True:
         await asyncio.sleep(INTERVALO_ANALISE)
 
+        # Cópias que chegaram depois de o grupo ser marcado como SIM
+        if raid_detector:
+            copias = [(msg, "SIM") for msg in raid_detector.drain_flagged()]
+            if copias:
+                await _aplicar_vereditos(copias, db, points_manager, telegram)
+            # Absorvidas por grupos descartados sem veredito: analisadas uma a uma
+            buffer_mensagens.extend(raid_detector.drain_released())
+
         if not buffer_mensagens:
             continue
 
@@ -218,6 +413,8 @@ async def processador_em_lote(
                 gid = msg.guild.id
                 if gid not in guild_status_cache:
                     guild_status_cache[gid] = await db.is_ai_moderation_enabled(gid)
+                    if raid_detector:
+                        raid_detector.set_guild_enabled(gid, guild_status_cache[gid])
                 if guild_status_cache[gid]:
                     mensagens_filtradas.append(msg)
         else:
@@ -226,52 +423,13 @@ async def processador_em_lote(
         if not mensagens_filtradas:
             continue
 
-        vereditos = await analisar_lote_com_ia(mensagens_filtradas)
-
-        for msg, veredito in zip(mensagens_filtradas, vereditos):
-            if veredito == "SIM":
-                try:
-                    await msg.delete()
-                    await msg.channel.send(
-                        f"⚠️ Mensagem de {msg.author.mention} removida por "
-                        "conter linguagem inadequada.",
-                        delete_after=10,
-                    )
-                    if db:
-                        await db.update_message_moderation_status(msg.id, True)
-
-                    # Notifica Telegram
-                    if telegram:
-                        await telegram.log_message_deleted(
-                            guild=msg.guild,
-                            channel=msg.channel,
-                            author=msg.author,
-                            content=msg.content,
-                            reason="Moderação por IA",
-                        )
-
-                    # Remove pontos do usuário
-                    if points_manager:
-                        points_to_remove = 1
-                        if len(msg.content) >= 10:
-                            points_to_remove = 2
-                        if msg.reference:
-                            points_to_remove += 1
-                        if msg.guild:
-                            await points_manager.remove_points(
-                                msg.author.id,
-                                points_to_remove,
-                                msg.guild.id,
-                                "moderation_deletion",
-                            )
-
-                except discord.Forbidden:
-                    logger.warning(
-                        "Sem permissão para deletar mensagem em %s",
-                        msg.channel.name if msg.channel else "canal desconhecido",
-                    )
-                except Exception as exc:
-                    logger.error("Erro ao processar mensagem moderada: %s", exc)
-            else:
-                if db:
-                    await db.update_message_moderation_status(msg.id, False)
+        vereditos = await analisar_lote_com_ia(mensagens_filtradas, gateway)
+        if vereditos is None:
+            # Sem cota agora: o lote é reanalisado no próximo ciclo
+            _devolver_ao_buffer(buffer_mensagens, mensagens_filtradas, raid_detector)
+            continue
+
+        resultados = list(zip(mensagens_filtradas, vereditos))
+        if raid_detector:
+            resultados = _expandir_grupos(raid_detector, resultados)
+        await _aplicar_vereditos(resultados, db, points_manager, telegram)
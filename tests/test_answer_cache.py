@@ -0,0 +1,80 @@
+# tests/test_answer_cache.py — Testes do cache semântico de respostas
+"""
+Testa o SemanticAnswerCache (limiar de similaridade, TTL, invalidação) e o
+uso pelo MemoryManager: só perguntas autocontidas e impessoais entram no
+cache (valem para qualquer membro do servidor) e escritas de contexto/memória
+descartam as respostas do servidor.
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from utils.answer_cache import SemanticAnswerCache
+from utils.memory_manager import MemoryManager
+
+
+class TestSemanticAnswerCache:
+
+    def test_hit_above_threshold_only(self):
+        cache = SemanticAnswerCache(threshold=0.95)
+        cache.store(1, [1.0, 0.0], "O evento é sexta às 20h.")
+
+        assert cache.lookup(1, [10.0, 1.0]) == "O evento é sexta às 20h."  # cos ≈ 0.995
+        assert cache.lookup(1, [1.0, 1.0]) is None  # cos ≈ 0.707
+        assert cache.lookup(2, [1.0, 0.0]) is None  # outro servidor
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    def test_entries_expire_and_invalidate(self):
+        cache = SemanticAnswerCache(ttl=60)
+        with patch("utils.answer_cache.time.monotonic", return_value=1000.0):
+            cache.store(1, [1.0, 0.0], "resposta")
+            cache.store(2, [1.0, 0.0], "resposta")
+        with patch("utils.answer_cache.time.monotonic", return_value=1061.0):
+            assert cache.lookup(1, [1.0, 0.0]) is None
+
+        cache.invalidate(2)
+        assert cache.lookup(2, [1.0, 0.0]) is None
+
+
+def _asker(user_id, name):
+    return MagicMock(id=user_id, display_name=name, bot=False)
+
+
+class TestMemoryManagerAnswers:
+
+    @pytest.fixture
+    def manager(self):
+        db = MagicMock()
+        mm = MemoryManager(db, chat_handler=None)
+        mm.answers = SemanticAnswerCache()
+        mm._generate_embedding = AsyncMock(return_value=[0.3, 0.4])
+        return mm
+
+    @pytest.mark.asyncio
+    async def test_reuses_self_contained_answers(self, manager):
+        question = "como funcionam os pontos do servidor?"
+        await manager.cache_answer(1, question, "Você ganha pontos por mensagem e voz.", asker=_asker(10, "Ana"))
+        # Outro membro fazendo a mesma pergunta recebe a resposta do cache
+        assert await manager.get_cached_answer(1, question) == "Você ganha pontos por mensagem e voz."
+
+        manager.invalidate_server_context(1)
+        assert await manager.get_cached_answer(1, question) is None
+
+    @pytest.mark.asyncio
+    async def test_skips_personal_and_contextual_questions(self, manager):
+        friend = MagicMock(bot=False)
+        await manager.cache_answer(1, "qual meu jogo favorito?", "É Valorant!")
+        await manager.cache_answer(1, "eu tenho quantos pontos hoje?", "Você tem 40.")
+        await manager.cache_answer(1, "o que você acha desse cara?", "Gente boa.", mentions=[friend])
+        await manager.cache_answer(1, "e depois?", "Depois tem torneio.")
+
+        assert manager.answers._entries == {}
+        manager._generate_embedding.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_skips_answers_addressed_to_the_asker(self, manager):
+        # Apelido preferido vem do perfil em cache, não do display_name
+        manager._profiles[(1, 10)] = (float("inf"), {"nickname_preference": "Zé"})
+        await manager.cache_answer(1, "qual o evento de sexta?", "Zé, o evento é sexta!", asker=_asker(10, "José"))
+        await manager.cache_answer(1, "qual o evento de sábado?", "José, é torneio!", asker=_asker(10, "José"))
+
+        assert manager.answers._entries == {}
@@ -0,0 +1,166 @@
+# tests/test_bot_memories.py — Deduplicação e compactação de bot_memories
+"""
+Confere no PostgreSQL (com pgvector) que store_memory mescla fatos quase
+iguais em vez de duplicar, que replace_memories soma os reforços do grupo e
+que cap_memories respeita os limites por usuário e por servidor. Confere
+também que search_memories só devolve memórias do usuário e globais do servidor
+e que os índices quantizados (half/binary) são criados e lidos pela busca
+(pgvector >= 0.8; abaixo disso o modo volta a "full").
+
+Só roda com TEST_DATABASE_URL definido. ATENÇÃO: o schema public desse
+banco é apagado e recriado — use um banco descartável.
+"""
+import asyncio
+import math
+import os
+
+import pytest
+from unittest.mock import patch
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL não definido"
+)
+
+
+def _vector(*weights):
+    """Vetor unitário de 768 dimensões com os pesos dados nas primeiras posições."""
+    vector = list(weights) + [0.0] * (768 - len(weights))
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector]
+
+
+async def _run():
+    import asyncpg
+    from database import Database
+
+    conn = await asyncpg.connect(TEST_DATABASE_URL)
+    try:
+        await conn.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+    finally:
+        await conn.close()
+
+    db = Database(TEST_DATABASE_URL)
+    await db.connect()
+    try:
+        if not db.has_vector:
+            pytest.skip("pgvector indisponível")
+        results = {}
+
+        # Quase idêntico ao fato salvo: mescla; ortogonal: insere; outro dono: insere
+        results["first"] = await db.store_memory(1, "Gosta de Valorant", _vector(1.0, 0.0), 10)
+        results["near"] = await db.store_memory(1, "Gosta muito de Valorant", _vector(1.0, 0.05), 10)
+        results["other_fact"] = await db.store_memory(1, "Mora em Recife", _vector(0.0, 1.0), 10)
+        results["other_user"] = await db.store_memory(1, "Gosta de Valorant", _vector(1.0, 0.0), 20)
+        async with db.pool.acquire() as conn:
+            results["rows"] = [dict(r) for r in await conn.fetch(
+                "SELECT user_id, content, hits FROM bot_memories ORDER BY id"
+            )]
+
+        ids = [m["id"] for m in await db.get_old_memories(1, 10, min_age_days=0)]
+        results["pairs"] = await db.get_similar_memory_pairs(ids, 0.5)
+        await db.replace_memories(1, 10, ids, "Gosta de Valorant e mora em Recife", _vector(1.0, 1.0))
+        results["replaced"] = [dict(r) for r in await db.get_old_memories(1, 10, min_age_days=0)]
+
+        # Busca: memórias do usuário + globais do servidor, nunca de outro usuário/servidor
+        await db.store_memory(1, "Evento na sexta", _vector(0.9, 0.9, 0.1), None)
+        await db.store_memory(3, "Outro servidor", _vector(1.0, 1.0), 10)
+        found = await db.search_memories(1, _vector(1.0, 1.0), 10, limit=5)
+        results["search"] = [row["content"] for row in found]
+
+        for i in range(8):
+            await db.store_memory(2, f"fato {i}", _vector(*([0.0] * i + [1.0])), 30 + i % 2)
+        results["capped"] = await db.cap_memories(max_per_user=3, max_per_guild=5)
+        async with db.pool.acquire() as conn:
+            results["guild2"] = [dict(r) for r in await conn.fetch(
+                "SELECT user_id, content FROM bot_memories WHERE guild_id = 2 ORDER BY id"
+            )]
+        return results
+    finally:
+        await db.disconnect()
+
+
+def test_dedup_compaction_and_caps():
+    results = asyncio.run(_run())
+
+    assert results["first"] is False and results["near"] is True
+    assert results["other_fact"] is False and results["other_user"] is False
+    assert results["rows"] == [
+        {"user_id": 10, "content": "Gosta muito de Valorant", "hits": 2},
+        {"user_id": 10, "content": "Mora em Recife", "hits": 1},
+        {"user_id": 20, "content": "Gosta de Valorant", "hits": 1},
+    ]
+    assert results["pairs"] == []  # vetores ortogonais não formam grupo
+
+    assert results["replaced"] == [
+        {"id": results["replaced"][0]["id"], "content": "Gosta de Valorant e mora em Recife", "hits": 3}
+    ]
+
+    assert results["search"] == ["Gosta de Valorant e mora em Recife", "Evento na sexta"]
+
+    # 4 memórias por usuário em guild 2: cada um perde 1 (limite 3), depois o servidor fica com 5
+    assert results["capped"] == 3
+    assert [r["content"] for r in results["guild2"]] == ["fato 3", "fato 4", "fato 5", "fato 6", "fato 7"]
+
+
+async def _run_quantized(storage):
+    import asyncpg
+    import database
+    from database import Database
+
+    conn = await asyncpg.connect(TEST_DATABASE_URL)
+    try:
+        await conn.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+    finally:
+        await conn.close()
+
+    db = Database(TEST_DATABASE_URL)
+    with patch.object(database, "MEMORY_VECTOR_STORAGE", storage):
+        await db.connect()
+    try:
+        if not db.has_vector:
+            pytest.skip("pgvector indisponível")
+        for i in range(40):
+            await db.store_memory(1, f"global {i}", _vector(*([0.0] * (i % 20) + [1.0, 0.2 * i])), None)
+        await db.store_memory(1, "Evento na sexta", _vector(0.9, 0.9, 0.1), None)
+        await db.store_memory(2, "Outro servidor", _vector(1.0, 1.0), None)
+        found = await db.search_memories(1, _vector(1.0, 1.0), 10, limit=2)
+
+        async with db.pool.acquire() as conn:
+            indexes = {r["indexname"] for r in await conn.fetch(
+                "SELECT indexname FROM pg_indexes WHERE tablename = 'bot_memories'"
+            )}
+            async with conn.transaction():
+                # Poucas linhas: força o planner a mostrar se a ordenação casa com o índice
+                await conn.execute("SET LOCAL enable_seqscan = off")
+                plan = "\n".join(r[0] for r in await conn.fetch(
+                    f"EXPLAIN SELECT id FROM bot_memories ORDER BY "
+                    f"{database._MEMORY_VECTOR_ORDER[db.vector_storage]} LIMIT 5",
+                    _vector(1.0, 1.0),
+                ))
+        return {
+            "iterative": db.vector_iterative_scan,
+            "storage": db.vector_storage,
+            "indexes": indexes,
+            "plan": plan,
+            "search": [row["content"] for row in found],
+        }
+    finally:
+        await db.disconnect()
+
+
+@pytest.mark.parametrize("storage", ["half", "binary"])
+def test_quantized_index_is_built_and_read(storage):
+    import database
+
+    results = asyncio.run(_run_quantized(storage))
+    effective = storage if results["iterative"] else "full"
+    name = database._MEMORY_VECTOR_INDEXES[effective][0]
+
+    assert results["storage"] == effective
+    assert name in results["indexes"]
+    assert not {n for n, _ in database._MEMORY_VECTOR_INDEXES.values()} - {name} & results["indexes"]
+    assert name in results["plan"]
+    assert results["search"][0] == "Evento na sexta"
+    assert "Outro servidor" not in results["search"]
@@ -0,0 +1,94 @@
+# tests/test_command_cache.py — Testes do cache dos slash commands
+"""
+Testa TTL, normalização de parâmetros, single-flight e invalidação do CommandCache.
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+
+
+def _clock(value):
+    return patch("utils.command_cache.time.monotonic", return_value=value)
+
+
+class TestCommandCache:
+
+    @pytest.mark.asyncio
+    async def test_hit_within_ttl_and_param_order_ignored(self):
+        from utils.command_cache import CommandCache
+        cache = CommandCache(ttls={"cmd": 60})
+        loader = AsyncMock(return_value=[1, 2, 3])
+        with _clock(100.0):
+            await cache.get_or_load(1, "cmd", {"days": 30, "year": 2025}, loader)
+        with _clock(150.0):
+            result = await cache.get_or_load(1, "cmd", {"year": 2025, "days": 30}, loader)
+        assert result == [1, 2, 3]
+        assert loader.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_expired_entry_reloads(self):
+        from utils.command_cache import CommandCache
+        cache = CommandCache(ttls={"cmd": 60})
+        loader = AsyncMock(return_value="x")
+        with _clock(100.0):
+            await cache.get_or_load(1, "cmd", {}, loader)
+        with _clock(161.0):
+            await cache.get_or_load(1, "cmd", {}, loader)
+        assert loader.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_load(self):
+        """Single-flight: chamadas simultâneas iguais fazem uma consulta só."""
+        from utils.command_cache import CommandCache
+        cache = CommandCache(ttls={"cmd": 60})
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "dados"
+
+        results = await asyncio.gather(*[cache.get_or_load(1, "cmd", {"days": 7}, loader) for _ in range(10)])
+        assert results == ["dados"] * 10
+        assert calls == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_load_is_not_cached(self):
+        from utils.command_cache import CommandCache
+        cache = CommandCache(ttls={"cmd": 60})
+        loader = AsyncMock(side_effect=[RuntimeError("db"), "ok"])
+        with pytest.raises(RuntimeError):
+            await cache.get_or_load(1, "cmd", {}, loader)
+        assert await cache.get_or_load(1, "cmd", {}, loader) == "ok"
+
+    @pytest.mark.asyncio
+    async def test_invalidate_respects_min_age_and_command_filter(self):
+        from utils.command_cache import CommandCache
+        cache = CommandCache(ttls={"a": 600, "b": 600}, min_age=15)
+        loader = AsyncMock(return_value="v")
+        with _clock(100.0):
+            await cache.get_or_load(1, "a", {}, loader)
+            await cache.get_or_load(1, "b", {}, loader)
+            await cache.get_or_load(2, "a", {}, loader)
+        with _clock(105.0):
+            # Rajada: entrada recente sobrevive à invalidação da ingestão
+            cache.invalidate(1, ("a",))
+            await cache.get_or_load(1, "a", {}, loader)
+        assert loader.await_count == 3
+        with _clock(120.0):
+            cache.invalidate(1, ("a",))
+            await cache.get_or_load(1, "a", {}, loader)  # recarrega
+            await cache.get_or_load(1, "b", {}, loader)  # outro comando, mantido
+            await cache.get_or_load(2, "a", {}, loader)  # outra guild, mantida
+        assert loader.await_count == 4
+
+    @pytest.mark.asyncio
+    async def test_forced_invalidation_drops_everything(self):
+        from utils.command_cache import CommandCache
+        cache = CommandCache(ttls={"a": 600}, min_age=15)
+        loader = AsyncMock(return_value="v")
+        await cache.get_or_load(1, "a", {}, loader)
+        cache.invalidate(1, force=True)
+        await cache.get_or_load(1, "a", {}, loader)
+        assert loader.await_count == 2
@@ -0,0 +1,81 @@
+# tests/test_daily_counters.py — Testes do DailyCounterStore
+"""
+Testa os contadores diários em memória: semeadura única do banco (mesmo com
+chamadas simultâneas), incremento pelos pontos gravados e descarte na
+virada do dia BRT.
+"""
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from config import BRT
+from utils.daily_counters import DailyCounterStore
+from utils.points_manager import PointsManager
+
+
+@pytest.fixture
+def db():
+    db = MagicMock()
+
+    async def daily_points(user_id, interaction_type, guild_id):
+        await asyncio.sleep(0.01)
+        return 28
+
+    db.get_daily_points = AsyncMock(side_effect=daily_points)
+    return db
+
+
+class TestDailyCounterStore:
+
+    @pytest.mark.asyncio
+    async def test_seeds_once_then_counts_in_memory(self, db):
+        counters = DailyCounterStore(db)
+        first = await asyncio.gather(*(counters.get(1, 10, "message_short") for _ in range(5)))
+        assert first == [28] * 5
+
+        counters.add(1, 10, "message_short", 1)
+        counters.add(1, 10, "message_short", 1)
+        counters.add(1, 20, "message_short", 1)  # Não semeado: fica para o banco
+        assert await counters.get(1, 10, "message_short") == 30
+        db.get_daily_points.assert_awaited_once_with(10, "message_short", 1)
+
+    @pytest.mark.asyncio
+    async def test_add_during_seed_is_not_lost(self, db):
+        counters = DailyCounterStore(db)
+        seeding = asyncio.ensure_future(counters.get(1, 10, "message_short"))
+        await asyncio.sleep(0)  # Semente em andamento
+        counters.add(1, 10, "message_short", 1)
+        counters.add(1, 10, "message_short", 1)
+
+        assert await seeding == 30
+        assert await counters.get(1, 10, "message_short") == 30
+        assert counters._pending == {}
+
+    @pytest.mark.asyncio
+    async def test_resets_at_brt_midnight(self, db):
+        counters = DailyCounterStore(db)
+        with patch("utils.daily_counters.now_brt", return_value=datetime(2026, 3, 1, 23, 59, tzinfo=BRT)):
+            await counters.get(1, 10, "message_short")
+            counters.add(1, 10, "message_short", 2)
+            assert await counters.get(1, 10, "message_short") == 30
+
+        db.get_daily_points = AsyncMock(return_value=0)
+        with patch("utils.daily_counters.now_brt", return_value=datetime(2026, 3, 2, 0, 0, tzinfo=BRT)):
+            assert await counters.get(1, 10, "message_short") == 0
+        assert len(counters._counts) == 1
+
+    @pytest.mark.asyncio
+    async def test_points_manager_keeps_counters_in_step(self, db):
+        db.upsert_user = AsyncMock()
+        db.add_interaction_point = AsyncMock()
+        db.get_user_current_total_points = AsyncMock(return_value=100)
+        db.update_daily_user_stats = AsyncMock()
+        manager = PointsManager(db)
+        manager.daily_counters = DailyCounterStore(db)
+
+        await manager.daily_counters.get(1, 10, "message_short")
+        await manager.add_points(10, 1, "message_short", 1)
+
+        assert await manager.daily_counters.get(1, 10, "message_short") == 29
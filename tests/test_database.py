@@ -35,11 +35,12 @@ def mock_pool():
 @pytest_asyncio.fixture
 async def db_with_mock(mock_pool):
     """Instancia Database injetando o mock de pool."""
-    from database import Database
+    from database import Database, INTERACTION_TYPES
     pool, conn = mock_pool
     db = Database.__new__(Database)
     db.pool = pool
     db.database_url = "postgresql://mock"
+    db.interaction_type_ids = dict(INTERACTION_TYPES)
     return db, conn
 
 
@@ -179,3 +180,135 @@ class TestSetDynamicRoles:
         db, conn = db_with_mock
         await db.set_dynamic_roles(guild_id=50, roles_config={})
         conn.execute.assert_called_once()
+
+
+# ── Testes dos helpers de particionamento ─────────────────────────────────────
+
+class TestPartitionHelpers:
+
+    def test_add_months_crosses_year(self):
+        """_add_months deve atravessar a virada de ano nos dois sentidos."""
+        from datetime import datetime
+        from database import _add_months
+        assert _add_months(datetime(2025, 11, 1), 3) == datetime(2026, 2, 1)
+        assert _add_months(datetime(2025, 1, 1), -1) == datetime(2024, 12, 1)
+
+    def test_partition_name_roundtrip(self):
+        """O nome gerado deve ser parseado de volta para o mesmo mês."""
+        from datetime import datetime
+        from database import _partition_name, _parse_partition_month
+        name = _partition_name("messages", datetime(2025, 3, 1))
+        assert name == "messages_p202503"
+        assert _parse_partition_month("messages", name) == datetime(2025, 3, 1)
+
+    def test_parse_ignores_foreign_partitions(self):
+        """Partições default ou de outra tabela não têm mês."""
+        from database import _parse_partition_month
+        assert _parse_partition_month("messages", "messages_default") is None
+        assert _parse_partition_month("messages", "voice_activity_p202501") is None
+        assert _parse_partition_month("messages", "messages_p202513") is None
+
+    def test_expired_partitions_respects_retention(self):
+        """Apenas meses inteiramente fora da janela de retenção expiram."""
+        from datetime import datetime
+        from database import _expired_partitions
+        names = ["messages_p202401", "messages_p202402", "messages_p202403", "messages_default"]
+        expired = _expired_partitions("messages", names, datetime(2025, 3, 15), retention_months=12)
+        assert expired == ["messages_p202401", "messages_p202402"]
+
+    def test_zero_retention_never_expires(self):
+        """Retenção 0 mantém todas as partições."""
+        from datetime import datetime
+        from database import _expired_partitions
+        assert _expired_partitions("interaction_points", ["interaction_points_p201901"],
+                                   datetime(2025, 1, 1), retention_months=0) == []
+
+    def test_snowflake_time(self):
+        """IDs do Discord devem ser convertidos no instante de criação em UTC."""
+        from datetime import datetime
+        from database import _snowflake_time
+        # Exemplo da documentação do Discord: 175928847299117063 → 2016-04-30 11:18:25.796 UTC
+        assert _snowflake_time(175928847299117063) == datetime(2016, 4, 30, 11, 18, 25, 796000)
+
+
+class TestInsertMessage:
+
+    @pytest.mark.asyncio
+    async def test_created_at_comes_from_snowflake(self, db_with_mock):
+        """insert_message deve gravar created_at derivado do ID (chave de partição estável)."""
+        from database import _snowflake_time
+        db, conn = db_with_mock
+        await db.insert_message(175928847299117063, 1, 2, 3, 10)
+        args = conn.execute.call_args[0]
+        assert "ON CONFLICT (message_id, created_at)" in args[0]
+        assert args[-1] == _snowflake_time(175928847299117063)
+
+
+class TestAddInteractionPoint:
+
+    @pytest.mark.asyncio
+    async def test_upserts_hourly_bucket(self, db_with_mock):
+        """Pontos devem somar no bucket (guild, usuário, tipo, hora) com o código do tipo."""
+        from database import INTERACTION_TYPES
+        db, conn = db_with_mock
+        await db.add_interaction_point(1, 3, "minute_tick", 100)
+        args = conn.execute.call_args[0]
+        assert "ON CONFLICT (guild_id, user_id, type_id, created_at)" in args[0]
+        assert "date_trunc('hour'" in args[0]
+        assert args[1:] == (1, 100, INTERACTION_TYPES["minute_tick"], 3)
+        conn.fetchval.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_unknown_type_is_registered_once(self, db_with_mock):
+        """Tipos fora do enum recebem um código novo, que fica em cache."""
+        db, conn = db_with_mock
+        conn.fetchval = AsyncMock(return_value=42)
+        await db.add_interaction_point(1, 1, "novo_tipo", 100)
+        await db.add_interaction_point(1, 1, "novo_tipo", 100)
+        assert conn.fetchval.await_count == 1
+        assert db.interaction_type_ids["novo_tipo"] == 42
+        assert conn.execute.call_args[0][3] == 42
+
+
+class TestRollupDays:
+
+    def test_partial_first_day_is_skipped(self):
+        """Janela que começa no meio do dia só usa o rollup a partir do dia seguinte."""
+        from datetime import date, datetime
+        from database import _rollup_days
+        assert _rollup_days(datetime(2025, 3, 1, 15, 30), date(2025, 3, 10)) == (date(2025, 3, 2), date(2025, 3, 10))
+
+    def test_midnight_cutoff_uses_whole_first_day(self):
+        from datetime import date, datetime
+        from database import _rollup_days
+        assert _rollup_days(datetime(2025, 3, 1), date(2025, 3, 10)) == (date(2025, 3, 1), date(2025, 3, 10))
+
+    def test_no_coverage_falls_back_to_raw(self):
+        """Sem rollup (ou cobrindo só dias anteriores à janela) a consulta vai direto em messages."""
+        from datetime import date, datetime
+        from database import _rollup_days
+        assert _rollup_days(datetime(2025, 3, 1, 15, 30), None) is None
+        assert _rollup_days(datetime(2025, 3, 1, 15, 30), date(2025, 3, 2)) is None
+
+
+class TestVectorCodecs:
+
+    def test_vector_roundtrip_matches_pgvector_layout(self):
+        """Cabeçalho dim/reservado em int16 seguido de float4 big-endian."""
+        from database import _decode_vector, _encode_vector
+        data = _encode_vector([1.0, -0.5])
+        assert data == b"\x00\x02\x00\x00" + bytes.fromhex("3f800000bf000000")
+        assert _decode_vector(data) == [1.0, -0.5]
+
+    def test_halfvec_roundtrip_loses_only_precision(self):
+        from database import _decode_halfvec, _encode_halfvec
+        data = _encode_halfvec([0.1, 2.0])
+        assert len(data) == 4 + 2 * 2
+        decoded = _decode_halfvec(data)
+        assert decoded[1] == 2.0 and abs(decoded[0] - 0.1) < 1e-3
+
+    def test_parse_version(self):
+        from database import _parse_version
+        assert _parse_version("0.8.0") == (0, 8, 0)
+        assert _parse_version("0.7.4-dev") == (0, 7, 4)
+        assert _parse_version(None) == ()
@@ -0,0 +1,90 @@
+# tests/test_embedding_cache.py — Testes do cache/batcher de embeddings
+"""
+Testa o EmbeddingCache com gateway e banco mockados: acerto no LRU, leitura
+do cache persistente e agrupamento de pedidos simultâneos em uma só chamada.
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from utils.embedding_cache import EmbeddingCache
+
+
+async def _fake_embed(lane, model, texts, task_type):
+    """Devolve um vetor por texto, como o gateway em lote."""
+    return [[float(len(text))] for text in texts]
+
+
+def _gateway(side_effect=_fake_embed):
+    gateway = MagicMock()
+    gateway.embed = AsyncMock(side_effect=side_effect)
+    return gateway
+
+
+@pytest.fixture
+def db():
+    db = MagicMock()
+    db.get_cached_embeddings = AsyncMock(return_value={})
+    db.store_cached_embeddings = AsyncMock()
+    return db
+
+
+class TestEmbeddingCache:
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_batch(self, db):
+        """Pedidos simultâneos (inclusive repetidos) viram uma chamada à API."""
+        gateway = _gateway()
+        cache = EmbeddingCache(db, "models/test", gateway, batch_window=0.01)
+        results = await asyncio.gather(
+            cache.embed("oi"), cache.embed("  oi "), cache.embed("tudo bem?")
+        )
+
+        assert results == [[2.0], [2.0], [9.0]]
+        gateway.embed.assert_awaited_once()
+        assert gateway.embed.call_args.args[2] == ["oi", "tudo bem?"]
+        db.store_cached_embeddings.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_lru_hit_skips_api_and_db(self, db):
+        gateway = _gateway()
+        cache = EmbeddingCache(db, "models/test", gateway, batch_window=0)
+        await cache.embed("bom dia")
+        await cache.embed("bom dia")
+
+        gateway.embed.assert_awaited_once()
+        db.get_cached_embeddings.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_persistent_hit_skips_api(self, db):
+        gateway = _gateway()
+        cache = EmbeddingCache(db, "models/test", gateway, batch_window=0)
+        key = cache.key_for("boa noite")
+        db.get_cached_embeddings = AsyncMock(return_value={key: [0.5]})
+        assert await cache.embed("boa noite") == [0.5]
+
+        gateway.embed.assert_not_awaited()
+        db.store_cached_embeddings.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_api_error_returns_none_and_is_not_cached(self, db):
+        gateway = _gateway(side_effect=RuntimeError("quota"))
+        cache = EmbeddingCache(db, "models/test", gateway, batch_window=0)
+        assert await cache.embed("erro") is None
+        gateway.embed.side_effect = _fake_embed
+        assert await cache.embed("erro") == [4.0]
+
+    @pytest.mark.asyncio
+    async def test_lru_evicts_oldest(self, db):
+        cache = EmbeddingCache(db, "models/test", _gateway(), max_entries=2, batch_window=0)
+        for text in ("a", "bb", "ccc"):
+            await cache.embed(text)
+
+        assert cache.key_for("a") not in cache._lru
+        assert len(cache._lru) == 2
+
+    @pytest.mark.asyncio
+    async def test_blank_text_returns_none(self, db):
+        cache = EmbeddingCache(db, "models/test", _gateway())
+        assert await cache.embed("   ") is None
+        db.get_cached_embeddings.assert_not_awaited()
@@ -0,0 +1,88 @@
+# tests/test_fake_llm_backend.py — Testes do backend falso e do teste de carga
+"""
+Garante que o FakeGeminiBackend é determinístico e compatível com os
+caminhos reais (moderação em lote, chat em streaming) via LLMGateway.
+"""
+import pytest
+from types import SimpleNamespace
+from google.api_core.exceptions import ResourceExhausted
+
+from scripts import ai_load_test
+from tasks.moderation import analisar_lote_com_ia
+from utils.chat_handler import ChatHandler
+from utils.fake_llm_backend import FakeGeminiBackend, lognormal_latency
+from utils.llm_gateway import LLMGateway
+
+
+class TestFakeGeminiBackend:
+
+    @pytest.mark.asyncio
+    async def test_moderation_verdicts_through_real_parser(self):
+        gateway = LLMGateway([FakeGeminiBackend()])
+        batch = [SimpleNamespace(content=text) for text in ("gg bora", "lixo [ofensivo]", "valeu")]
+
+        assert await analisar_lote_com_ia(batch, gateway) == ["NÃO", "SIM", "NÃO"]
+
+    @pytest.mark.asyncio
+    async def test_chat_stream_is_consumed_by_chat_handler(self):
+        chat = ChatHandler(LLMGateway([FakeGeminiBackend(stream_chunks=3)]))
+        chunks = [c async for c in chat.stream_response("oi", history=[])]
+
+        assert len(chunks) == 3
+        assert "".join(chunks).startswith("Resposta simulada")
+
+    @pytest.mark.asyncio
+    async def test_injected_failures_are_deterministic(self):
+        async def outcomes(seed):
+            backend = FakeGeminiBackend(seed=seed, exhausted_rate=0.3)
+            results = []
+            for _ in range(20):
+                try:
+                    await backend.generate("m", "oi")
+                    results.append("ok")
+                except ResourceExhausted:
+                    results.append("quota")
+            return results
+
+        first = await outcomes(7)
+        assert first == await outcomes(7)
+        assert "quota" in first and "ok" in first
+
+    @pytest.mark.asyncio
+    async def test_rpm_quota(self):
+        backend = FakeGeminiBackend(rpm_quota=2)
+        await backend.generate("m", "a")
+        await backend.generate("m", "b")
+        with pytest.raises(ResourceExhausted):
+            await backend.generate("m", "c")
+
+    @pytest.mark.asyncio
+    async def test_embeddings_are_stable_unit_vectors(self):
+        backend = FakeGeminiBackend(embedding_dim=16)
+        first, second = await backend.embed("e", ["oi", "tchau"], "retrieval_document")
+
+        assert first == backend.embedding_for("oi")
+        assert first != second
+        assert sum(v * v for v in first) == pytest.approx(1.0)
+
+    def test_lognormal_latency_median(self):
+        import random
+        sample = lognormal_latency(0.2, 1.0)
+        rng = random.Random(1)
+        values = sorted(sample(rng) for _ in range(2001))
+        assert values[1000] == pytest.approx(0.2, rel=0.15)
+
+
+class TestLoadTestScript:
+
+    @pytest.mark.asyncio
+    async def test_small_offline_run(self, capsys):
+        args = ai_load_test.parse_args([
+            "--messages", "40", "--mentions", "5", "--latency-median", "0",
+            "--error-rate", "0", "--exhausted-rate", "0",
+        ])
+        await ai_load_test.main(args)
+
+        out = capsys.readouterr().out
+        assert "Moderação: 40 msgs" in out
+        assert "Menções: 5 respostas" in out
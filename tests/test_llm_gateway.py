@@ -0,0 +1,180 @@
+# tests/test_llm_gateway.py — Testes do LLMGateway
+"""
+Testa o gateway com backends falsos: prioridade entre filas, prazo,
+failover em ResourceExhausted, os baldes de tokens e o cache de
+modelos do GeminiBackend.
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from google.ai import generativelanguage as glm
+from google.api_core.exceptions import ResourceExhausted
+
+from utils.llm_gateway import (
+    OUTPUT_TOKEN_ALLOWANCE, GeminiBackend, Lane, LLMDeadlineExceeded, LLMGateway, TokenBucket,
+)
+
+
+class StubBackend:
+    """Backend que registra a ordem das chamadas."""
+
+    def __init__(self, name, calls, error=None):
+        self.name = name
+        self.calls = calls
+        self.error = error
+
+    async def generate(self, model, contents, **kwargs):
+        self.calls.append((self.name, contents))
+        if self.error:
+            raise self.error
+        return f"{self.name}:{contents}"
+
+    async def embed(self, model, texts, task_type):
+        self.calls.append((self.name, tuple(texts)))
+        return [[1.0] for _ in texts]
+
+
+class TestTokenBucket:
+
+    def test_wait_and_refill(self):
+        bucket = TokenBucket(capacity=2, rate=1.0)
+        now = bucket.updated
+        bucket.consume(2, now)
+        assert bucket.wait_time(1, now) == pytest.approx(1.0)
+        assert bucket.wait_time(1, now + 1.0) == 0.0
+
+    def test_oversized_request_waits_for_full_bucket(self):
+        bucket = TokenBucket(capacity=10, rate=5.0)
+        assert bucket.wait_time(1000, bucket.updated) == 0.0
+
+
+class TestLLMGateway:
+
+    @pytest.mark.asyncio
+    async def test_higher_lane_served_first(self):
+        calls = []
+        # 600 rpm com capacidade 1: um pedido a cada 0,1s
+        gateway = LLMGateway([StubBackend("k0", calls)], default_limits=(600, 10**9))
+        gateway._slots[0]._buckets("m")[0].capacity = 1
+        gateway._slots[0]._buckets("m")[0].tokens = 0
+
+        results = await asyncio.gather(
+            gateway.generate(Lane.MEMORY, "m", "memoria"),
+            gateway.generate(Lane.CHAT, "m", "chat"),
+            gateway.generate(Lane.MODERATION, "m", "moderacao"),
+        )
+
+        assert [c[1] for c in calls] == ["moderacao", "chat", "memoria"]
+        assert results == ["k0:memoria", "k0:chat", "k0:moderacao"]
+        snapshot = gateway.snapshot()
+        assert snapshot["chat"]["completed"] == 1
+        assert snapshot["memory"]["queued"] == 0
+
+    @pytest.mark.asyncio
+    async def test_lower_lane_does_not_take_tokens_reserved_by_higher_lane(self):
+        calls = []
+        gateway = LLMGateway([StubBackend("k0", calls)], default_limits=(10**6, 10**6))
+        tokens = gateway._slots[0]._buckets("m")[1]
+        tokens.rate = OUTPUT_TOKEN_ALLOWANCE * 5  # o chat espera ~0,2s pelo balde
+        tokens.tokens = 10
+
+        results = await asyncio.gather(
+            gateway.generate(Lane.CHAT, "m", "chat"),
+            gateway.embed(Lane.EMBEDDING, "m", ["x"], "retrieval_query"),
+        )
+
+        # O embedding cabia no balde já, mas a capacidade estava reservada para o chat
+        assert [c[1] for c in calls] == ["chat", ("x",)]
+        assert results == ["k0:chat", [[1.0]]]
+
+    @pytest.mark.asyncio
+    async def test_request_without_capacity_before_deadline_expires(self):
+        gateway = LLMGateway([StubBackend("k0", [])], default_limits=(1, 10**9))
+        gateway._slots[0]._buckets("m")[0].tokens = 0  # próximo slot em ~60s
+
+        with pytest.raises(LLMDeadlineExceeded):
+            await gateway.generate(Lane.CHAT, "m", "oi", deadline=1.0)
+        assert gateway.snapshot()["chat"]["expired"] == 1
+
+    @pytest.mark.asyncio
+    async def test_resource_exhausted_fails_over_to_other_key(self):
+        calls = []
+        gateway = LLMGateway([
+            StubBackend("k0", calls, error=ResourceExhausted("quota")),
+            StubBackend("k1", calls),
+        ])
+
+        result = await gateway.generate(Lane.MODERATION, "m", "lote")
+
+        assert result == "k1:lote"
+        assert [c[0] for c in calls] == ["k0", "k1"]
+        assert gateway._slots[0].cooldown_until > 0
+        assert gateway.snapshot()["moderation"]["rate_limited"] == 1
+
+    @pytest.mark.asyncio
+    async def test_embed_goes_through_backend(self):
+        calls = []
+        gateway = LLMGateway([StubBackend("k0", calls)])
+
+        vectors = await gateway.embed(Lane.EMBEDDING, "e", ["a", "b"], "retrieval_document")
+
+        assert vectors == [[1.0], [1.0]]
+        assert calls == [("k0", ("a", "b"))]
+
+    @pytest.mark.asyncio
+    async def test_no_keys_configured(self):
+        with pytest.raises(RuntimeError):
+            await LLMGateway([]).generate(Lane.CHAT, "m", "oi")
+
+
+class TestGeminiBackendModelCache:
+
+    def test_reuses_prepared_model_per_system_instruction(self):
+        backend = GeminiBackend("chave")
+        backend.MODEL_CACHE_SIZE = 2
+        with patch("utils.llm_gateway.content_types.to_content", side_effect=lambda text: MagicMock()) as convert:
+            first = backend._model("gemini-2.5-flash", "Você é um moderador.")
+            assert backend._model("gemini-2.5-pro", "Você é um moderador.") is not first
+            assert backend._model("gemini-2.5-flash", "Você é um moderador.") is first
+            backend._model("gemini-2.5-flash", None)  # Despeja o menos usado (pro)
+            backend._model("gemini-2.5-flash", "Você é um moderador.")
+
+        assert convert.call_count == 2
+        assert first[0] == "models/gemini-2.5-flash"
+
+    @pytest.mark.asyncio
+    async def test_generate_uses_the_key_client(self):
+        backend = GeminiBackend("chave")
+        backend._client = MagicMock()
+        backend._client.generate_content = AsyncMock(return_value=glm.GenerateContentResponse(candidates=[
+            glm.Candidate(content=glm.Content(parts=[glm.Part(text="oi")], role="model"), finish_reason=1),
+        ]))
+
+        response = await backend.generate(
+            "gemini-2.5-flash", "olá", system_instruction="Seja breve.",
+            generation_config={"temperature": 0.5},
+        )
+
+        assert response.text == "oi"
+        request = backend._client.generate_content.call_args.args[0]
+        assert request.model == "models/gemini-2.5-flash"
+        assert request.system_instruction.parts[0].text == "Seja breve."
+        assert request.contents[0].role == "user"
+        assert request.generation_config.temperature == pytest.approx(0.5)
+
+    @pytest.mark.asyncio
+    async def test_stream_uses_the_key_client(self):
+        async def chunks():
+            for text in ("o", "i"):
+                yield glm.GenerateContentResponse(candidates=[
+                    glm.Candidate(content=glm.Content(parts=[glm.Part(text=text)], role="model")),
+                ])
+
+        backend = GeminiBackend("chave")
+        backend._client = MagicMock()
+        backend._client.stream_generate_content = AsyncMock(return_value=chunks())
+
+        response = await backend.generate("gemini-2.5-flash", "olá", stream=True)
+
+        assert [chunk.text async for chunk in response] == ["o", "i"]
@@ -0,0 +1,205 @@
+# tests/test_memory_manager.py — Testes da montagem de contexto do MemoryManager
+"""
+Testa get_relevant_context com banco mockado: caches de contexto do
+servidor e de perfis, invalidação e consultas em paralelo. Testa também a
+extração de memória em lote (fila, pré-filtro e aplicação do resultado)
+e a compactação de memórias antigas.
+"""
+import asyncio
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from utils.memory_manager import MemoryManager, cluster_pairs, is_trivial_turn
+
+
+def _user(user_id, name, bot=False):
+    user = MagicMock()
+    user.id = user_id
+    user.display_name = name
+    user.bot = bot
+    return user
+
+
+@pytest.fixture
+def manager():
+    db = MagicMock()
+    db.get_server_context = AsyncMock(return_value={"theme": "Games"})
+    db.get_user_bot_profile = AsyncMock(
+        side_effect=lambda user_id, guild_id: {"computed_stats": '{"msg_rank": 1}'}
+    )
+    db.search_memories = AsyncMock(return_value=[{"content": "Evento na sexta"}])
+    mm = MemoryManager(db, chat_handler=None)
+    mm._generate_embedding = AsyncMock(return_value=[0.1])
+    return mm, db
+
+
+@pytest.fixture
+def guild():
+    guild = MagicMock()
+    guild.id = 1
+    guild.name = "BMIA"
+    return guild
+
+
+class TestGetRelevantContext:
+
+    @pytest.mark.asyncio
+    async def test_builds_all_blocks(self, manager, guild):
+        mm, db = manager
+        author, friend, bot = _user(10, "Ana"), _user(20, "Beto"), _user(30, "Bot", bot=True)
+
+        text = await mm.get_relevant_context(guild, author, "oi", mentions=[author, friend, bot])
+
+        assert "- Tema: Games" in text
+        assert "Sobre o Usuário Ana:" in text
+        assert "Sobre o Usuário Mencionado Beto:" in text
+        assert "Bot" not in text.replace("BMIA", "")
+        assert "- Evento na sexta" in text
+        assert "mais envia mensagens" in text
+        assert db.get_user_bot_profile.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_lookups_run_concurrently(self, manager, guild):
+        mm, db = manager
+
+        async def slow_dict(*args, **kwargs):
+            await asyncio.sleep(0.05)
+            return {}
+
+        async def slow_list(*args, **kwargs):
+            await asyncio.sleep(0.05)
+            return []
+
+        db.get_server_context = AsyncMock(side_effect=slow_dict)
+        db.get_user_bot_profile = AsyncMock(side_effect=slow_dict)
+        db.search_memories = AsyncMock(side_effect=slow_list)
+
+        loop = asyncio.get_running_loop()
+        begin = loop.time()
+        await mm.get_relevant_context(guild, _user(10, "Ana"), "oi")
+        # Em série seriam ~0.15s
+        assert loop.time() - begin < 0.12
+
+    @pytest.mark.asyncio
+    async def test_caches_until_invalidated(self, manager, guild):
+        mm, db = manager
+        author = _user(10, "Ana")
+
+        await mm.get_relevant_context(guild, author, "oi")
+        await mm.get_relevant_context(guild, author, "oi")
+        assert db.get_server_context.await_count == 1
+        assert db.get_user_bot_profile.await_count == 1
+
+        mm.invalidate_server_context(guild.id)
+        mm.invalidate_guild_profiles(guild.id)
+        await mm.get_relevant_context(guild, author, "oi")
+        assert db.get_server_context.await_count == 2
+        assert db.get_user_bot_profile.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_memory_errors_do_not_break_context(self, manager, guild):
+        mm, db = manager
+        db.search_memories = AsyncMock(side_effect=RuntimeError("db down"))
+
+        text = await mm.get_relevant_context(guild, _user(10, "Ana"), "oi")
+
+        assert "Memórias Relevantes" not in text
+        assert "- Tema: Games" in text
+
+
+class TestBatchedMemoryExtraction:
+
+    def test_trivial_turns_are_filtered(self):
+        assert is_trivial_turn("@BMIA oi, tudo bem?")
+        assert is_trivial_turn("kkkkk valeu")
+        assert not is_trivial_turn("@BMIA me chama de Zé")
+        assert not is_trivial_turn("qual a melhor build pro mapa novo?")
+
+    def test_queue_keeps_recent_turns_per_user(self, manager):
+        mm, _ = manager
+        mm.queue_turn(1, 10, "bom dia", "Bom dia!")
+        for i in range(5):
+            mm.queue_turn(1, 10, f"lembre do evento {i}", "ok")
+
+        turns = mm._pending_turns[(1, 10)]
+        assert [t[0] for t in turns] == ["lembre do evento 2", "lembre do evento 3", "lembre do evento 4"]
+
+    @pytest.mark.asyncio
+    async def test_flush_sends_one_call_and_applies_items(self, manager):
+        mm, db = manager
+        db.store_memory = AsyncMock()
+        db.update_user_bot_profile = AsyncMock()
+        reply = {"itens": [
+            {"turno": 1, "save_memory": True, "memory_content": "Evento é sexta",
+             "is_user_profile_update": False},
+            {"turno": 2, "save_memory": True, "memory_content": "Prefere apelido",
+             "is_user_profile_update": True, "profile_update": {"nickname_preference": "Zé"}},
+            {"turno": 9, "save_memory": True, "memory_content": "fora do lote"},
+        ]}
+        mm.gateway = MagicMock()
+        mm.gateway.generate = AsyncMock(return_value=SimpleNamespace(text=json.dumps(reply)))
+
+        mm.queue_turn(1, 10, "lembre que o evento é sexta", "Anotado!")
+        mm.queue_turn(1, 20, "pode me chamar de Zé", "Beleza, Zé!")
+        await mm.flush_memory_batch()
+
+        mm.gateway.generate.assert_awaited_once()
+        prompt = mm.gateway.generate.call_args.args[2]
+        assert "[1] Usuário: lembre que o evento é sexta" in prompt
+        assert "[2] Usuário: pode me chamar de Zé" in prompt
+        db.store_memory.assert_awaited_once_with(1, "Evento é sexta", [0.1], 10)
+        db.update_user_bot_profile.assert_awaited_once_with(20, 1, {"nickname_preference": "Zé"})
+        assert not mm._pending_turns
+
+
+class TestMemoryCompaction:
+
+    def test_cluster_pairs_joins_transitive_groups(self):
+        assert cluster_pairs([(3, 1), (5, 6), (1, 2)]) == [[1, 2, 3], [5, 6]]
+        assert cluster_pairs([]) == []
+
+    @pytest.mark.asyncio
+    async def test_compaction_summarizes_clusters_and_caps(self, manager):
+        mm, db = manager
+        db.has_vector = True
+        db.get_memory_compaction_candidates = AsyncMock(return_value=[{"guild_id": 1, "user_id": 10}])
+        db.get_old_memories = AsyncMock(return_value=[
+            {"id": 1, "content": "Gosta de Valorant"},
+            {"id": 2, "content": "Joga Valorant toda noite"},
+            {"id": 3, "content": "Mora em Recife"},
+        ])
+        db.get_similar_memory_pairs = AsyncMock(return_value=[(1, 2)])
+        db.replace_memories = AsyncMock()
+        db.cap_memories = AsyncMock(return_value=4)
+        reply = {"resumos": [{"grupo": 1, "texto": "Joga Valorant toda noite"}]}
+        mm.gateway = MagicMock()
+        mm.gateway.generate = AsyncMock(return_value=SimpleNamespace(text=json.dumps(reply)))
+
+        assert await mm.compact_memories() == 5
+
+        prompt = mm.gateway.generate.call_args.args[2]
+        assert "- Gosta de Valorant" in prompt and "Recife" not in prompt
+        db.replace_memories.assert_awaited_once_with(1, 10, [1, 2], "Joga Valorant toda noite", [0.1])
+
+    @pytest.mark.asyncio
+    async def test_compaction_lists_and_replaces_only_newest_facts(self, manager):
+        mm, db = manager
+        db.has_vector = True
+        db.get_memory_compaction_candidates = AsyncMock(return_value=[{"guild_id": 1, "user_id": 10}])
+        db.get_old_memories = AsyncMock(return_value=[
+            {"id": i, "content": f"Fato {i}"} for i in range(1, 26)
+        ])
+        db.get_similar_memory_pairs = AsyncMock(return_value=[(i, i + 1) for i in range(1, 25)])
+        db.replace_memories = AsyncMock()
+        db.cap_memories = AsyncMock(return_value=0)
+        reply = {"resumos": [{"grupo": 1, "texto": "Fato resumido"}]}
+        mm.gateway = MagicMock()
+        mm.gateway.generate = AsyncMock(return_value=SimpleNamespace(text=json.dumps(reply)))
+
+        assert await mm.compact_memories() == 19
+
+        prompt = mm.gateway.generate.call_args.args[2]
+        assert "- Fato 25" in prompt and "- Fato 5\n" not in prompt
+        db.replace_memories.assert_awaited_once_with(1, 10, list(range(6, 26)), "Fato resumido", [0.1])
@@ -0,0 +1,70 @@
+# tests/test_message_buffer.py — Testes do RecentMessageBuffer
+"""
+Testa o ring buffer de mensagens recentes: janela anterior à mensagem,
+fallback antes de semear, limites de memória e remoção de canais ociosos.
+"""
+from unittest.mock import patch
+
+from utils.message_buffer import RecentMessageBuffer
+
+
+def _fill(buffer, channel_id, ids):
+    for message_id in ids:
+        buffer.record(channel_id, message_id, "user", f"msg {message_id}")
+
+
+class TestRecentMessageBuffer:
+
+    def test_unknown_or_partial_channel_needs_fallback(self):
+        buffer = RecentMessageBuffer(per_channel=5)
+        assert buffer.get_history(1, before_id=100) is None
+
+        _fill(buffer, 1, [1, 2])
+        assert buffer.get_history(1, before_id=100, limit=5) is None
+
+    def test_full_window_served_without_seed(self):
+        buffer = RecentMessageBuffer(per_channel=5)
+        _fill(buffer, 1, range(1, 8))
+
+        history = buffer.get_history(1, before_id=7, limit=3)
+
+        assert [h["parts"][0] for h in history] == ["msg 4", "msg 5", "msg 6"]
+
+    def test_seed_merges_rest_history_in_order(self):
+        buffer = RecentMessageBuffer(per_channel=10)
+        buffer.record(1, 5, "user", "atual")
+        buffer.seed(1, [(2, "user", "oi"), (3, "model", "olá!"), (5, "user", "atual")])
+
+        history = buffer.get_history(1, before_id=5)
+
+        assert history == [
+            {"role": "user", "parts": ["oi"]},
+            {"role": "model", "parts": ["olá!"]},
+        ]
+
+    def test_char_cap_drops_oldest(self):
+        buffer = RecentMessageBuffer(per_channel=10, max_chars=10)
+        buffer.record(1, 1, "user", "a" * 6)
+        buffer.record(1, 2, "user", "b" * 6)
+
+        buffer.seed(1, [])
+        assert buffer.get_history(1, before_id=3) == [{"role": "user", "parts": ["b" * 6]}]
+
+    def test_discard_removes_deleted_messages(self):
+        buffer = RecentMessageBuffer(per_channel=5)
+        buffer.seed(1, [(1, "user", "spam"), (2, "user", "ok")])
+        buffer.discard(1, [1])
+
+        assert buffer.get_history(1, before_id=3) == [{"role": "user", "parts": ["ok"]}]
+
+    def test_idle_and_excess_channels_are_evicted(self):
+        buffer = RecentMessageBuffer(max_channels=2, idle_ttl=60)
+        with patch("utils.message_buffer.time.monotonic", return_value=0):
+            buffer.record(1, 1, "user", "a")
+            buffer.record(2, 1, "user", "b")
+            buffer.record(3, 1, "user", "c")
+        assert 1 not in buffer._channels
+
+        with patch("utils.message_buffer.time.monotonic", return_value=120):
+            buffer.record(4, 1, "user", "d")
+        assert list(buffer._channels) == [4]
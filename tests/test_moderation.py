@@ -1,10 +1,19 @@
 # tests/test_moderation.py — Testes unitários do módulo tasks/moderation.py
 """
-Testa o parsing de respostas do Gemini e a lógica de decisão de moderação.
+Testa o parsing de respostas do Gemini, a lógica de decisão de moderação
+e as ações em lote sobre as mensagens removidas.
 Não faz chamadas reais à API.
 """
 import pytest
-from tasks.moderation import _parse_json_response, _should_moderate
+from types import SimpleNamespace
+from datetime import timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import discord
+
+from tasks.moderation import (
+    _aplicar_vereditos, _build_prompt, _devolver_ao_buffer, _parse_json_response, _should_moderate,
+)
 
 
 class TestParseJsonResponse:
@@ -69,6 +78,29 @@ class TestParseJsonResponse:
         assert result[0].get("confianca", 0.0) == 0.95
 
 
+class TestStructuredOutput:
+    """Formato da saída estruturada e codificação compacta das mensagens."""
+
+    def test_only_flagged_ids_are_returned(self):
+        response = '{"sinalizadas": [{"id": 2, "confianca": 0.9, "motivo": "ameaça"}]}'
+        result = _parse_json_response(response, expected_count=3)
+        assert result == [{"id": 2, "confianca": 0.9, "motivo": "ameaça", "veredito": "SIM"}]
+        assert _should_moderate(result[0]) is True
+        assert _parse_json_response('{"sinalizadas": []}', expected_count=3) == []
+
+    def test_prompt_is_one_compact_line_per_message(self):
+        longa = "começo " + "x y " * 300 + "fim ofensivo"
+        prompt = _build_prompt([
+            SimpleNamespace(content="kkkkkkkkkkkkkkk\n\n  gg"),
+            SimpleNamespace(content=longa),
+        ])
+        lines = prompt.splitlines()
+
+        assert lines[:2] == ["MENSAGENS:", "1|kkkk gg"]
+        assert lines[2].startswith("2|começo") and lines[2].endswith("fim ofensivo")
+        assert " […] " in lines[2] and len(lines[2]) < 420
+
+
 class TestShouldModerate:
     """Testa a função de decisão de moderação."""
 
@@ -119,3 +151,131 @@ class TestShouldModerate:
         """Veredito 'Sim' em mixed case deve ser tratado corretamente."""
         result = {"veredito": "Sim", "confianca": 0.90}
         assert _should_moderate(result) is True
+
+
+def _channel(channel_id):
+    channel = MagicMock()
+    channel.id = channel_id
+    channel.name = f"canal-{channel_id}"
+    channel.delete_messages = AsyncMock()
+    channel.send = AsyncMock()
+    return channel
+
+
+def _message(msg_id, channel, author_id, content="conteúdo ofensivo"):
+    msg = MagicMock()
+    msg.id = msg_id
+    msg.channel = channel
+    msg.content = content
+    msg.reference = None
+    msg.guild = SimpleNamespace(id=1, name="BMIA")
+    msg.author = SimpleNamespace(id=author_id, mention=f"<@{author_id}>")
+    msg.delete = AsyncMock()
+    return msg
+
+
+class TestAplicarVereditos:
+    """Ações em lote sobre as mensagens marcadas pela IA."""
+
+    @pytest.mark.asyncio
+    async def test_bulk_delete_one_warning_per_channel_and_batched_writes(self):
+        geral, memes = _channel(10), _channel(20)
+        flagged = [_message(1, geral, 7), _message(2, geral, 8), _message(3, memes, 7, "feio")]
+        clean = _message(4, geral, 9)
+        db = MagicMock(mark_messages_moderated=AsyncMock(), update_message_moderation_status=AsyncMock())
+        points = MagicMock(remove_points_batch=AsyncMock())
+        telegram = MagicMock(log_messages_deleted=AsyncMock())
+
+        await _aplicar_vereditos(
+            [(flagged[0], "SIM"), (clean, "NÃO"), (flagged[1], "SIM"), (flagged[2], "SIM")],
+            db, points, telegram,
+        )
+
+        geral.delete_messages.assert_awaited_once_with(flagged[:2])
+        flagged[2].delete.assert_awaited_once()
+        assert geral.send.await_count == 1 and memes.send.await_count == 1
+        assert "2 mensagens de <@7>, <@8>" in geral.send.await_args.args[0]
+        assert telegram.log_messages_deleted.await_count == 2
+
+        db.mark_messages_moderated.assert_awaited_once_with([1, 2, 3])
+        db.update_message_moderation_status.assert_not_awaited()
+        points.remove_points_batch.assert_awaited_once_with(
+            [(7, 1, 2), (8, 1, 2), (7, 1, 1)], "moderation_deletion"
+        )
+
+    @pytest.mark.asyncio
+    async def test_clean_batch_and_forbidden_channel_write_nothing(self):
+        channel = _channel(10)
+        channel.delete_messages.side_effect = discord.Forbidden(MagicMock(status=403), "sem permissão")
+        db = MagicMock(mark_messages_moderated=AsyncMock())
+        points = MagicMock(remove_points_batch=AsyncMock())
+
+        await _aplicar_vereditos([(_message(1, channel, 7), "NÃO")], db, points, None)
+        await _aplicar_vereditos(
+            [(_message(2, channel, 7), "SIM"), (_message(3, channel, 8), "SIM")], db, points, None
+        )
+
+        channel.send.assert_not_awaited()
+        db.mark_messages_moderated.assert_not_awaited()
+        points.remove_points_batch.assert_not_awaited()
+
+
+    @pytest.mark.asyncio
+    async def test_messages_already_deleted_by_author_are_not_penalized(self):
+        geral, memes = _channel(10), _channel(20)
+        sumiu = _message(1, memes, 7)
+        sumiu.delete.side_effect = discord.NotFound(MagicMock(status=404), "Unknown Message")
+        lote = [_message(2, geral, 8), _message(3, geral, 9)]
+        geral.delete_messages.side_effect = discord.NotFound(MagicMock(status=404), "Unknown Message")
+        lote[1].delete.side_effect = discord.NotFound(MagicMock(status=404), "Unknown Message")
+        db = MagicMock(mark_messages_moderated=AsyncMock())
+        points = MagicMock(remove_points_batch=AsyncMock())
+
+        await _aplicar_vereditos(
+            [(sumiu, "SIM"), (lote[0], "SIM"), (lote[1], "SIM")], db, points, None,
+        )
+
+        memes.send.assert_not_awaited()
+        assert "<@8>" in geral.send.await_args.args[0] and "<@9>" not in geral.send.await_args.args[0]
+        db.mark_messages_moderated.assert_awaited_once_with([2])
+        points.remove_points_batch.assert_awaited_once_with([(8, 1, 2)], "moderation_deletion")
+
+class TestDevolverAoBuffer:
+    """Lote sem cota volta ao buffer, com limite de idade e de tamanho."""
+
+    def test_requeue_drops_stale_and_overflow(self):
+        agora = discord.utils.utcnow()
+        velha = SimpleNamespace(id=1, created_at=agora - timedelta(hours=2))
+        recente = SimpleNamespace(id=2, created_at=agora)
+        buffer = [SimpleNamespace(id=n, created_at=agora) for n in range(10, 14)]
+
+        with patch("tasks.moderation.MODERATION_MAX_BUFFER", 4):
+            _devolver_ao_buffer(buffer, [velha, recente])
+
+        # A velha não volta; o excesso sai da frente (as que esperam há mais tempo)
+        assert [m.id for m in buffer] == [10, 11, 12, 13]
+
+    def test_discarded_representative_releases_its_cluster(self):
+        from utils.raid_detector import RaidDetector
+
+        texto = "Entrem agora no servidor de sorteio de nitro grátis discord.gg/abc123"
+        agora = discord.utils.utcnow()
+
+        def msg(msg_id, created_at):
+            return SimpleNamespace(
+                id=msg_id, content=texto, created_at=created_at,
+                author=SimpleNamespace(id=msg_id), guild=SimpleNamespace(id=1),
+            )
+
+        detector = RaidDetector()
+        representante = msg(1, agora - timedelta(hours=1))
+        copia = msg(2, agora)
+        assert detector.observe(representante) is True
+        assert detector.observe(copia) is False
+
+        buffer = []
+        _devolver_ao_buffer(buffer, [representante], detector)
+
+        assert buffer == []
+        assert detector.drain_released() == [copia]
+        assert detector.observe(msg(3, agora)) is True  # Grupo saiu do LSH
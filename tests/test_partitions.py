@@ -0,0 +1,88 @@
+# tests/test_partitions.py — Criação de partições mensais
+"""
+Confere no PostgreSQL que _ensure_partitions move para a partição nova as
+linhas do mês que já tinham caído na partição default, e que uma falha ao
+criar uma partição não aborta a transação de quem chamou.
+
+Só roda com TEST_DATABASE_URL definido. ATENÇÃO: o schema public desse
+banco é apagado e recriado — use um banco descartável.
+"""
+import asyncio
+import os
+from datetime import datetime
+
+import pytest
+from unittest.mock import patch
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL não definido"
+)
+
+
+async def _run():
+    import asyncpg
+    import database
+    from database import Database, _add_months, _month_start, _partition_name
+
+    conn = await asyncpg.connect(TEST_DATABASE_URL)
+    try:
+        await conn.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+    finally:
+        await conn.close()
+
+    db = Database(TEST_DATABASE_URL)
+    await db.connect()
+    try:
+        results = {}
+        ahead = database.PARTITION_MONTHS_AHEAD
+        # Primeiro mês sem partição: as linhas dele vão para a default
+        month = _add_months(_month_start(datetime.now()), ahead + 1)
+        name = _partition_name("messages", month)
+
+        async with db.pool.acquire() as conn:
+            await conn.execute("INSERT INTO users (user_id, username) VALUES (1, 'u1')")
+            await conn.execute(
+                "INSERT INTO channels (channel_id, channel_name, channel_type, guild_id) VALUES (1, 'c1', 'text', 1)"
+            )
+            await conn.executemany("""
+                INSERT INTO messages (message_id, user_id, channel_id, guild_id, content_length, created_at)
+                VALUES ($1, 1, 1, 1, 10, $2)
+            """, [(1, month), (2, _add_months(month, 3))])
+
+        with patch("database.PARTITION_MONTHS_AHEAD", ahead + 1):
+            await db.maintain_partitions()
+
+        async with db.pool.acquire() as conn:
+            results["placement"] = {
+                row["message_id"]: row["partition"] for row in await conn.fetch(
+                    "SELECT message_id, tableoid::regclass::text AS partition FROM messages"
+                )
+            }
+            results["default_attached"] = "messages_default" in await db._list_partitions(conn, "messages")
+
+            # A faixa do mês seguinte já está ocupada: o CREATE falha dentro do savepoint
+            # e a transação externa continua utilizável
+            following = _add_months(month, 1)
+            async with conn.transaction():
+                await conn.execute(f"""
+                    CREATE TABLE messages_manual PARTITION OF messages
+                    FOR VALUES FROM ('{following:%Y-%m-%d}') TO ('{_add_months(following, 1):%Y-%m-%d}')
+                """)
+                with patch("database.PARTITION_MONTHS_AHEAD", ahead + 2):
+                    await db._ensure_partitions(conn, "messages")
+                results["after_failure"] = await conn.fetchval("SELECT COUNT(*) FROM messages")
+        results["name"] = name
+        return results
+    finally:
+        await db.disconnect()
+
+
+def test_new_partition_takes_rows_from_default():
+    results = asyncio.run(_run())
+
+    assert results["placement"][1] == results["name"]
+    assert results["placement"][2] == "messages_default"
+    assert results["default_attached"]
+    assert results["after_failure"] == 2
@@ -68,6 +68,15 @@ class TestAddPoints:
         )
         mock_db.add_user_points.assert_not_called()
 
+    @pytest.mark.asyncio
+    async def test_add_points_invalidates_user_stats_cache(self, mock_db):
+        """Pontos novos devem descartar o /stats me em cache do usuário."""
+        from utils.points_manager import PointsManager
+        pm = PointsManager(mock_db, ignored_channels=[])
+        pm.user_stats = MagicMock()
+        await pm.add_points(user_id=1, points=5, interaction_type="message", guild_id=100)
+        pm.user_stats.invalidate.assert_called_once_with(1, 100)
+
 
 class TestGiveawayManagerParseDuration:
     """Testa o parser de duração do GiveawayManager (sem DB)."""
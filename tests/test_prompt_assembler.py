@@ -0,0 +1,67 @@
+# tests/test_prompt_assembler.py — Testes da montagem do prompt com orçamento de tokens
+"""
+Testa o PromptAssembler: com orçamento folgado tudo entra na ordem original;
+apertado, saem primeiro as partes de menor pontuação e as mensagens mais
+antigas do histórico (sem buracos), e textos longos são truncados.
+"""
+from utils.prompt_assembler import PromptAssembler, PromptPart, render, truncate
+
+
+SERVER = "Contexto do Servidor 'BMIA':"
+MEMORIES = "\nMemórias Relevantes (Fatos/Decisões Passadas):"
+
+
+def _parts():
+    return [
+        PromptPart("- Tema: Games", 1.0, SERVER),
+        PromptPart("- Extras: " + "x" * 400, 0.6, SERVER),
+        PromptPart("- Gosta de Valorant (0.91)", 0.85, MEMORIES),
+        PromptPart("- Mora em Recife (0.10)", 0.45, MEMORIES),
+    ]
+
+
+def _history(n, size=40):
+    return [
+        {"role": "user" if i % 2 == 0 else "model", "parts": [f"msg{i} " + "y" * size]}
+        for i in range(n)
+    ]
+
+
+class TestPromptAssembler:
+
+    def test_everything_fits_in_original_order(self):
+        history, context = PromptAssembler(budget=10_000).assemble(_history(4), _parts())
+
+        assert len(history) == 4
+        assert context == render(_parts())
+        assert context.startswith(SERVER + "\n- Tema: Games")
+
+    def test_tight_budget_drops_low_scores_and_oldest_history(self):
+        assembler = PromptAssembler(budget=80)
+        history, context = assembler.assemble(_history(6), _parts())
+
+        assert "- Tema: Games" in context and "Gosta de Valorant" in context
+        assert "Extras" not in context and "Recife" not in context
+        # Só as mensagens mais recentes, em sequência
+        kept = [msg["parts"][0].split()[0] for msg in history]
+        assert kept and kept == [f"msg{i}" for i in range(6 - len(kept), 6)]
+        assert len(kept) < 6
+
+    def test_reserved_tokens_and_section_headers(self):
+        history, context = PromptAssembler(budget=200).assemble(_history(2), _parts(), reserved=200)
+        assert (history, context) == ([], "")
+
+        only_memory = [PromptPart("- Evento na sexta", 0.7, MEMORIES)]
+        _, context = PromptAssembler(budget=100).assemble([], only_memory)
+        assert context == MEMORIES + "\n- Evento na sexta"
+
+    def test_truncates_long_parts_and_prompt(self):
+        assembler = PromptAssembler(budget=10_000, part_max_tokens=10, prompt_max_tokens=10)
+        history, context = assembler.assemble(_history(1, size=200), _parts())
+
+        assert len(history[0]["parts"][0]) <= 45
+        assert "- Extras: xxx" in context and context.count("x") < 40
+
+        prompt = assembler.fit_prompt("início " + "z" * 200 + " qual o evento?")
+        assert prompt.startswith("início") and prompt.endswith("qual o evento?")
+        assert truncate("curto", 10) == "curto"
@@ -0,0 +1,272 @@
+# tests/test_query_plans.py — Regressão de planos das consultas do Database
+"""
+Popula um PostgreSQL local com volume sintético, roda cada consulta dos
+métodos do Database sob EXPLAIN (ANALYZE, BUFFERS) e falha quando o plano
+volta a fazer seq scan em tabela grande ou estoura o orçamento de latência.
+
+Só roda com TEST_DATABASE_URL definido. ATENÇÃO: o schema public desse
+banco é apagado e recriado — use um banco descartável.
+"""
+import asyncio
+import contextlib
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "")
+# Orçamento de tempo de execução por consulta (ms)
+LATENCY_BUDGET_MS = float(os.getenv("QUERY_PLAN_BUDGET_MS", "250"))
+# Seq scan acima deste número de blocos lidos conta como regressão
+SEQ_SCAN_MAX_BLOCKS = 64
+
+GUILD = 1000
+USER = 5000
+GUILDS, USERS, CHANNELS = 20, 400, 200
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL não definido"
+)
+
+
+# ── Infra: pool que roda EXPLAIN antes de cada comando ────────────────────────
+
+class _ExplainingConnection:
+    """Repassa os comandos para a conexão real, guardando o plano de cada um."""
+
+    def __init__(self, conn, plans):
+        self._conn = conn
+        self._plans = plans
+
+    async def _explain(self, query, args):
+        # EXPLAIN ANALYZE executa o comando: roda numa transação desfeita em seguida
+        tr = self._conn.transaction()
+        await tr.start()
+        try:
+            raw = await self._conn.fetchval(
+                "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, *args
+            )
+        finally:
+            await tr.rollback()
+        self._plans.append((query, json.loads(raw)[0]))
+
+    async def execute(self, query, *args):
+        await self._explain(query, args)
+        return await self._conn.execute(query, *args)
+
+    async def fetch(self, query, *args):
+        await self._explain(query, args)
+        return await self._conn.fetch(query, *args)
+
+    async def fetchrow(self, query, *args):
+        await self._explain(query, args)
+        return await self._conn.fetchrow(query, *args)
+
+    async def fetchval(self, query, *args):
+        await self._explain(query, args)
+        return await self._conn.fetchval(query, *args)
+
+
+class _ExplainingPool:
+
+    def __init__(self, pool):
+        self._pool = pool
+        self.plans = []
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        async with self._pool.acquire() as conn:
+            yield _ExplainingConnection(conn, self.plans)
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def _seq_scan_offenders(plan):
+    """Seq scans que leram mais que SEQ_SCAN_MAX_BLOCKS blocos."""
+    offenders = []
+    for node in _plan_nodes(plan["Plan"]):
+        if node["Node Type"] != "Seq Scan":
+            continue
+        blocks = node.get("Shared Hit Blocks", 0) + node.get("Shared Read Blocks", 0)
+        if blocks > SEQ_SCAN_MAX_BLOCKS:
+            offenders.append(f"{node.get('Relation Name')} ({blocks} blocos)")
+    return offenders
+
+
+# ── Dados sintéticos ──────────────────────────────────────────────────────────
+
+SEED_SQL = f"""
+    INSERT INTO users (user_id, username)
+    SELECT {USER} + g, 'user' || g FROM generate_series(0, {USERS - 1}) g;
+
+    INSERT INTO channels (channel_id, channel_name, channel_type, guild_id)
+    SELECT g, 'canal' || g, 'text', {GUILD} + g % {GUILDS} FROM generate_series(1, {CHANNELS}) g;
+
+    -- ~120 dias de histórico, em ordem de inserção (como em produção)
+    INSERT INTO messages (message_id, user_id, channel_id, guild_id, content_length,
+                          has_attachments, created_at, was_moderated)
+    SELECT g, {USER} + g % {USERS}, 1 + g % {CHANNELS}, {GUILD} + (1 + g % {CHANNELS}) % {GUILDS},
+           g % 300, g % 17 = 0, NOW() - INTERVAL '120 days' + g * INTERVAL '50 milliseconds',
+           g % 97 = 0
+    FROM generate_series(1, 200000) g;
+
+    INSERT INTO voice_activity (user_id, channel_id, guild_id, joined_at, left_at, duration_seconds)
+    SELECT {USER} + g % {USERS}, 1 + g % {CHANNELS}, {GUILD} + (1 + g % {CHANNELS}) % {GUILDS},
+           NOW() - INTERVAL '120 days' + g * INTERVAL '300 seconds',
+           CASE WHEN g % 500 = 0 THEN NULL
+                ELSE NOW() - INTERVAL '120 days' + g * INTERVAL '300 seconds' + INTERVAL '20 minutes' END,
+           CASE WHEN g % 500 = 0 THEN NULL ELSE 1200 END
+    FROM generate_series(1, 34000) g;
+
+    INSERT INTO user_activities (user_id, guild_id, activity_name, activity_type,
+                                 started_at, ended_at, duration_seconds)
+    SELECT {USER} + g % {USERS}, {GUILD} + g % {GUILDS}, 'Jogo ' || g % 40,
+           CASE WHEN g % 10 = 0 THEN 'streaming' ELSE 'playing' END,
+           NOW() - INTERVAL '120 days' + g * INTERVAL '300 seconds',
+           CASE WHEN g % 500 = 0 THEN NULL
+                ELSE NOW() - INTERVAL '120 days' + g * INTERVAL '300 seconds' + INTERVAL '1 hour' END,
+           CASE WHEN g % 500 = 0 THEN NULL ELSE 3600 END
+    FROM generate_series(1, 34000) g;
+
+    INSERT INTO interaction_points (user_id, guild_id, type_id, created_at, points, event_count)
+    SELECT {USER} + u, {GUILD} + u % {GUILDS}, t,
+           date_trunc('hour', NOW()) - h * INTERVAL '1 hour', 10, 10
+    FROM generate_series(0, {USERS - 1}) u, generate_series(0, 2879, 24) h, generate_series(1, 3) t;
+
+    INSERT INTO daily_user_stats (guild_id, user_id, date, messages_count, voice_seconds, total_points)
+    SELECT {GUILD} + u % {GUILDS}, {USER} + u, CURRENT_DATE - d, 10, 600, d
+    FROM generate_series(0, {USERS - 1}) u, generate_series(0, 119) d;
+
+    INSERT INTO embed_requests (id, status, created_at)
+    SELECT gen_random_uuid(), CASE WHEN g % 1000 = 0 THEN 'pending' ELSE 'sent' END,
+           NOW() - g * INTERVAL '1 minute'
+    FROM generate_series(1, 20000) g;
+"""
+
+# Tabelas que initialize_schema não cria
+EXTERNAL_TABLES_SQL = """
+    CREATE TABLE daily_user_stats (
+        guild_id BIGINT NOT NULL,
+        user_id BIGINT NOT NULL,
+        date DATE NOT NULL,
+        messages_count INTEGER DEFAULT 0,
+        voice_seconds INTEGER DEFAULT 0,
+        total_points INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT NOW(),
+        updated_at TIMESTAMP DEFAULT NOW(),
+        UNIQUE (guild_id, user_id, date)
+    );
+    CREATE TABLE embed_requests (
+        id UUID PRIMARY KEY,
+        status TEXT NOT NULL DEFAULT 'pending',
+        error_message TEXT,
+        created_at TIMESTAMP DEFAULT NOW()
+    );
+"""
+
+
+async def _seed():
+    import asyncpg
+    from database import Database
+
+    conn = await asyncpg.connect(TEST_DATABASE_URL)
+    try:
+        await conn.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+        await conn.execute(EXTERNAL_TABLES_SQL)
+    finally:
+        await conn.close()
+
+    db = Database(TEST_DATABASE_URL)
+    await db.connect()
+    try:
+        async with db.pool.acquire() as conn:
+            await conn.execute(SEED_SQL)
+        await db.refresh_message_rollup()
+        async with db.pool.acquire() as conn:
+            await conn.execute("VACUUM ANALYZE")
+    finally:
+        await db.disconnect()
+
+
+@pytest.fixture(scope="module")
+def seeded_database():
+    asyncio.run(_seed())
+    return TEST_DATABASE_URL
+
+
+# ── Casos ─────────────────────────────────────────────────────────────────────
+
+YEAR = datetime.now().year
+
+# (nome, chamada, seq scan permitido)
+# get_leaderboard sem guild soma o histórico inteiro: varrer tudo é o plano certo.
+CASES = [
+    ("get_server_stats", lambda db: db.get_server_stats(GUILD, 30), False),
+    ("get_top_users_by_messages", lambda db: db.get_top_users_by_messages(GUILD, 10, 30), False),
+    ("get_top_channels", lambda db: db.get_top_channels(GUILD, 10, 30), False),
+    ("get_hourly_activity", lambda db: db.get_hourly_activity(GUILD, 7), False),
+    ("get_messages_per_day", lambda db: db.get_messages_per_day(GUILD, 30), False),
+    ("get_daily_points", lambda db: db.get_daily_points(USER, "message", GUILD), False),
+    ("get_user_current_total_points", lambda db: db.get_user_current_total_points(USER, GUILD), False),
+    ("get_top_users_date_range",
+     lambda db: db.get_top_users_date_range(GUILD, datetime(YEAR, 1, 1), datetime(YEAR + 1, 1, 1)), False),
+    ("get_detailed_user_stats", lambda db: db.get_detailed_user_stats(USER, GUILD, 30), False),
+    ("get_leaderboard_guild", lambda db: db.get_leaderboard(10, 30, GUILD), False),
+    ("get_leaderboard_all_time", lambda db: db.get_leaderboard(10, None, None), True),
+    ("update_message_moderation_status",
+     lambda db: db.update_message_moderation_status(150000, True), False),
+    ("update_voice_leave", lambda db: db.update_voice_leave(USER, 1), False),
+    ("get_open_voice_sessions", lambda db: db.get_open_voice_sessions(), False),
+    ("close_voice_session", lambda db: db.close_voice_session(500, datetime.now()), False),
+    ("move_voice_session",
+     lambda db: db.move_voice_session(500, datetime.now(), USER, 1, GUILD), False),
+    ("checkpoint_voice_sessions",
+     lambda db: db.checkpoint_voice_sessions([500, 34000], [datetime.now(), datetime.now()]), False),
+    ("end_activity", lambda db: db.end_activity(500), False),
+    ("get_top_activities", lambda db: db.get_top_activities(GUILD, 10, 30), False),
+    ("get_user_activities", lambda db: db.get_user_activities(USER, GUILD, 30), False),
+    ("get_yearly_activities", lambda db: db.get_yearly_activities(GUILD, YEAR), False),
+    ("get_pending_embeds", lambda db: db.get_pending_embeds(), False),
+    ("get_top_users_total_points_year", lambda db: db.get_top_users_total_points_year(GUILD, YEAR), False),
+    ("get_top_users_total_points_rank", lambda db: db.get_top_users_total_points_rank(GUILD, YEAR, 2), False),
+    ("get_top_users_voice_time_year", lambda db: db.get_top_users_voice_time_year(GUILD, YEAR), False),
+    ("get_top_users_streaming_time_year", lambda db: db.get_top_users_streaming_time_year(GUILD, YEAR), False),
+    ("get_top_users_messages_year", lambda db: db.get_top_users_messages_year(GUILD, YEAR), False),
+    ("get_top_users_moderated_year", lambda db: db.get_top_users_moderated_year(GUILD, YEAR), False),
+    ("get_top_users_game_time_year", lambda db: db.get_top_users_game_time_year(GUILD, YEAR), False),
+    ("get_top_users_distinct_games_year", lambda db: db.get_top_users_distinct_games_year(GUILD, YEAR), False),
+    ("get_top_users_longest_session_year", lambda db: db.get_top_users_longest_session_year(GUILD, YEAR), False),
+    ("get_top_users_night_voice_year", lambda db: db.get_top_users_night_voice_year(GUILD, YEAR), False),
+    ("get_top_users_attachments_year", lambda db: db.get_top_users_attachments_year(GUILD, YEAR), False),
+    ("get_top_users_active_days_year", lambda db: db.get_top_users_active_days_year(GUILD, YEAR), False),
+]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name,call,allow_seq_scan", CASES, ids=[c[0] for c in CASES])
+async def test_query_plan(seeded_database, name, call, allow_seq_scan):
+    import asyncpg
+    from database import Database
+
+    pool = await asyncpg.create_pool(seeded_database, min_size=1, max_size=1, statement_cache_size=0)
+    try:
+        db = Database(seeded_database)
+        db.pool = _ExplainingPool(pool)
+        await call(db)
+
+        assert db.pool.plans, f"{name} não executou nenhuma consulta"
+        for query, plan in db.pool.plans:
+            summary = " ".join(query.split())[:120]
+            if not allow_seq_scan:
+                offenders = _seq_scan_offenders(plan)
+                assert not offenders, f"{name}: seq scan em {offenders} — {summary}"
+            assert plan["Execution Time"] <= LATENCY_BUDGET_MS, (
+                f"{name}: {plan['Execution Time']:.1f} ms > {LATENCY_BUDGET_MS} ms — {summary}"
+            )
+    finally:
+        await pool.close()
@@ -0,0 +1,107 @@
+# tests/test_raid_detector.py — Testes do agrupamento de mensagens quase idênticas
+"""
+Testa o RaidDetector (MinHash + LSH): variações leves do mesmo texto entram
+no grupo do representante, textos diferentes e curtos seguem para a
+moderação, o veredito do representante vale para as cópias e os grupos
+expiram após a janela.
+"""
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from tasks.moderation import _expandir_grupos
+from utils.raid_detector import RaidDetector, minhash, similarity
+
+RAID = "Entrem agora no servidor de sorteio de nitro grátis discord.gg/abc123"
+
+
+def _msg(msg_id, content, author_id=None, guild_id=1):
+    return SimpleNamespace(
+        id=msg_id, content=content,
+        author=SimpleNamespace(id=author_id or msg_id),
+        guild=SimpleNamespace(id=guild_id),
+    )
+
+
+class TestMinHash:
+
+    def test_similar_texts_have_close_signatures(self):
+        base = minhash(RAID)
+        assert similarity(base, minhash(RAID.upper() + "!!")) == 1.0
+        assert similarity(base, minhash(RAID.replace("abc123", "xyz789"))) > 0.6
+        assert similarity(base, minhash("Alguém quer jogar valorant hoje à noite?")) < 0.2
+        assert minhash("kkkk") is None
+
+
+class TestRaidDetector:
+
+    def test_clusters_variations_across_accounts(self):
+        detector = RaidDetector()
+        variations = [RAID, RAID + " corre", "@fulano " + RAID, RAID.replace("abc123", "abc124")]
+        results = [detector.observe(_msg(i, text)) for i, text in enumerate(variations, 1)]
+
+        assert results == [True, False, False, False]
+        assert detector.observe(_msg(10, "Alguém quer jogar valorant hoje à noite?")) is True
+        assert detector.observe(_msg(11, "gg")) is True
+        assert detector.observe(_msg(12, RAID, guild_id=2)) is True  # Outro servidor
+
+    def test_representative_verdict_applies_to_cluster(self):
+        detector = RaidDetector()
+        representative = _msg(1, RAID)
+        detector.observe(representative)
+        detector.observe(_msg(2, RAID + "!"))
+        detector.observe(_msg(3, RAID + "!!"))
+
+        resultados = _expandir_grupos(detector, [(representative, "SIM")])
+        assert [(m.id, v) for m, v in resultados] == [(1, "SIM"), (2, "SIM"), (3, "SIM")]
+
+        # Cópias depois do veredito já chegam marcadas
+        assert detector.observe(_msg(4, RAID)) is False
+        assert [m.id for m in detector.drain_flagged()] == [4]
+        assert detector.drain_flagged() == []
+
+    def test_clusters_expire_after_window(self):
+        detector = RaidDetector(window=60)
+        with patch("utils.raid_detector.time.monotonic", return_value=1000.0):
+            detector.observe(_msg(1, RAID))
+            detector.resolve(_msg(1, RAID), False)
+        with patch("utils.raid_detector.time.monotonic", return_value=1061.0):
+            assert detector.observe(_msg(2, RAID)) is True
+
+        assert list(detector._clusters) == [2]
+
+    def test_copies_after_approval_are_moderated_again(self):
+        detector = RaidDetector()
+        benign = _msg(1, "Alguém quer fechar um time pra ranqueada hoje à noite depois das dez? Chamem no privado")
+        detector.observe(benign)
+        detector.resolve(benign, False)
+
+        # Mesma mensagem com um insulto no fim: não herda o NÃO
+        assert detector.observe(_msg(2, benign.content + " seu lixo")) is True
+        assert detector.drain_flagged() == []
+
+    def test_disabled_guild_is_not_clustered(self):
+        detector = RaidDetector()
+        detector.observe(_msg(1, RAID))
+        detector.observe(_msg(2, RAID + "!"))
+
+        detector.set_guild_enabled(1, False)
+        assert detector._clusters == {} and detector._buckets == {}
+        assert detector.observe(_msg(3, RAID)) is True
+        assert detector.drain_released() == []
+
+        detector.set_guild_enabled(1, True)
+        assert detector.observe(_msg(4, RAID)) is True
+        assert detector.observe(_msg(5, RAID)) is False
+
+    def test_evicted_pending_cluster_releases_members(self):
+        detector = RaidDetector()
+        detector.observe(_msg(1, RAID))
+        copy = _msg(2, RAID + "!")
+        detector.observe(copy)
+
+        with patch("utils.raid_detector.MAX_CLUSTERS", 1):
+            detector.observe(_msg(3, "Alguém quer jogar valorant hoje à noite?"))
+
+        assert detector.drain_released() == [copy]
+        # Fora do LSH: a próxima cópia abre um grupo novo em vez de cair no órfão
+        assert detector.observe(_msg(4, RAID)) is True
@@ -0,0 +1,118 @@
+# tests/test_reply_streamer.py — Testes do StreamingReply
+"""
+Testa a postagem progressiva de respostas em streaming: primeira frase
+imediata, edições com cadência, divisão em 2000 caracteres e fim da digitação.
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from utils.message_buffer import RecentMessageBuffer
+from utils.reply_streamer import StreamingReply, _split_point
+
+
+class FakeMessage:
+    """Mensagem do Discord com reply/edit registrando o conteúdo."""
+
+    def __init__(self, sent, message_id=1):
+        self.sent = sent
+        self.id = message_id
+        self.content = None
+
+    async def reply(self, content):
+        msg = FakeMessage(self.sent, 100 + len(self.sent))
+        msg.content = content
+        self.sent.append(msg)
+        return msg
+
+    async def edit(self, content):
+        self.content = content
+
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+
+class TestStreamingReply:
+
+    @pytest.mark.asyncio
+    async def test_first_sentence_posted_then_edited(self):
+        sent = []
+        reply = StreamingReply(FakeMessage(sent), edit_interval=0)
+        first_post = AsyncMock()
+
+        async def chunks():
+            yield "Oi! "
+            assert len(sent) == 1 and sent[0].content == "Oi! "
+            first_post.assert_awaited_once()
+            yield "Tudo bem?"
+
+        text = await reply.send(chunks(), on_first_post=first_post)
+
+        assert text == "Oi! Tudo bem?"
+        assert [m.content for m in sent] == ["Oi! Tudo bem?"]
+
+    @pytest.mark.asyncio
+    async def test_edits_respect_interval(self):
+        sent = []
+        reply = StreamingReply(FakeMessage(sent), edit_interval=3600)
+        edits = []
+
+        async def chunks():
+            yield "Primeira frase."
+            sent[0].edit = AsyncMock(side_effect=lambda content: edits.append(content))
+            for word in (" a", " b", " c"):
+                yield word
+
+        await reply.send(chunks())
+
+        # Só a edição final (o intervalo nunca passou durante o stream)
+        assert edits == ["Primeira frase. a b c"]
+
+    @pytest.mark.asyncio
+    async def test_rolls_over_at_limit(self):
+        sent = []
+        reply = StreamingReply(FakeMessage(sent), edit_interval=0, limit=20)
+        text = await reply.send(_chunks("palavra " * 3, "palavra " * 3, "fim."))
+
+        assert text == "palavra " * 6 + "fim."
+        assert all(len(m.content) <= 20 for m in sent)
+        assert "".join(m.content for m in sent) == text
+        assert len(sent) == 3
+
+    @pytest.mark.asyncio
+    async def test_short_reply_without_sentence_end_is_flushed(self):
+        sent = []
+        first_post = AsyncMock()
+        await StreamingReply(FakeMessage(sent)).send(_chunks("ok"), on_first_post=first_post)
+
+        assert [m.content for m in sent] == ["ok"]
+        first_post.assert_awaited_once()
+
+    def test_split_prefers_word_break(self):
+        assert _split_point("aaaa bbbb cccc", 12) == 10
+        assert _split_point("a" * 30, 12) == 12
+
+    @pytest.mark.asyncio
+    async def test_history_buffer_gets_final_text(self):
+        sent = []
+        history = RecentMessageBuffer()
+        history.seed(5, [(1, "user", "conta uma história")])
+        reply = StreamingReply(FakeMessage(sent), edit_interval=3600, limit=30)
+
+        async def chunks():
+            yield "Era uma vez. "
+            # on_message do próprio bot: só a primeira frase existe neste momento
+            history.record(5, sent[0].id, "model", sent[0].content)
+            yield "Um dragão morava num castelo muito alto. "
+            yield "Fim."
+
+        text = await reply.send(chunks())
+        for posted, final in reply.posted:
+            history.update(5, posted.id, final)
+        # A segunda parte só chega ao on_message depois do fim do streaming
+        history.record(5, sent[1].id, "model", "Um")
+
+        contents = [entry["parts"][0] for entry in history.get_history(5, before_id=10**6)]
+        assert contents[0] == "conta uma história"
+        assert "".join(contents[1:]) == text
@@ -0,0 +1,82 @@
+# tests/test_rollups.py — Equivalência entre rollups e consultas brutas
+"""
+Confere que get_server_stats servido pelo daily_message_rollup devolve o
+mesmo resultado da agregação direta em messages, para várias janelas.
+
+Só roda com TEST_DATABASE_URL definido. ATENÇÃO: o schema public desse
+banco é apagado e recriado — use um banco descartável.
+"""
+import asyncio
+import os
+
+import pytest
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL não definido"
+)
+
+GUILDS = (1, 2, 3)
+
+# ~420 dias de mensagens com densidade irregular, canais/usuários repetidos
+# entre dias e parte delas moderada
+SEED_SQL = """
+    INSERT INTO users (user_id, username) SELECT g, 'u' || g FROM generate_series(1, 60) g;
+    INSERT INTO channels (channel_id, channel_name, channel_type, guild_id)
+    SELECT g, 'c' || g, 'text', 1 + g % 3 FROM generate_series(1, 30) g;
+    INSERT INTO messages (message_id, user_id, channel_id, guild_id, content_length, created_at, was_moderated)
+    SELECT g, 1 + (g * 7) % 60, 1 + (g * 13) % 30, 1 + (1 + (g * 13) % 30) % 3, 10,
+           NOW() - INTERVAL '420 days' + (g * g % 1000003) * INTERVAL '36 seconds',
+           g % 11 = 0
+    FROM generate_series(1, 30000) g;
+"""
+
+RAW_SQL = """
+    SELECT COUNT(*) AS total_messages,
+           COUNT(DISTINCT user_id) AS active_users,
+           COUNT(DISTINCT channel_id) AS active_channels,
+           COUNT(*) FILTER (WHERE was_moderated) AS moderated_messages
+    FROM messages
+    WHERE guild_id = $1 AND created_at >= NOW() - make_interval(days => $2)
+"""
+
+
+async def _run():
+    import asyncpg
+    from database import Database
+
+    conn = await asyncpg.connect(TEST_DATABASE_URL)
+    try:
+        await conn.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+    finally:
+        await conn.close()
+
+    db = Database(TEST_DATABASE_URL)
+    await db.connect()
+    try:
+        async with db.pool.acquire() as conn:
+            await conn.execute(SEED_SQL)
+        await db.refresh_message_rollup()
+        await db.refresh_message_rollup()  # idempotente
+
+        async with db.pool.acquire() as conn:
+            rollup_rows = await conn.fetchval("SELECT COUNT(*) FROM daily_message_rollup")
+        assert rollup_rows > 0
+
+        mismatches = []
+        for guild_id in GUILDS:
+            for days in (1, 2, 7, 30, 90, 365, 500):
+                served = await db.get_server_stats(guild_id, days)
+                async with db.pool.acquire() as conn:
+                    raw = dict(await conn.fetchrow(RAW_SQL, guild_id, days))
+                served.pop('period_days')
+                if served != raw:
+                    mismatches.append((guild_id, days, served, raw))
+        return mismatches
+    finally:
+        await db.disconnect()
+
+
+def test_server_stats_rollup_matches_raw():
+    assert asyncio.run(_run()) == []
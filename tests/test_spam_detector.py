@@ -1,7 +1,9 @@
 # tests/test_spam_detector.py — Testes unitários do SpamDetector
 import time
 import pytest
-from utils.spam_detector import SpamDetector
+from unittest.mock import patch
+
+from utils.spam_detector import SpamDetector, normalize_content
 
 
 class TestSpamDetector:
@@ -78,3 +80,58 @@ class TestSpamDetector:
             result = detector.is_spam(user_id=5)
         # Com janela 0, cada mensagem remove as anteriores -> nunca spam
         assert result is False
+
+    def test_inactive_users_expire_without_full_scan(self):
+        """Usuários saem do dicionário assim que a janela da última mensagem vence."""
+        detector = SpamDetector(max_messages=5, time_window=5)
+        with patch("utils.spam_detector.time.time", return_value=1000.0):
+            for uid in range(50):
+                detector.is_spam(user_id=uid)
+        with patch("utils.spam_detector.time.time", return_value=1003.0):
+            detector.is_spam(user_id=1)  # Continua ativo
+        with patch("utils.spam_detector.time.time", return_value=1006.0):
+            detector.is_spam(user_id=999)
+
+        assert set(detector.user_messages) == {(None, 1), (None, 999)}
+
+    def test_per_guild_limits(self):
+        """Limites do servidor sobrescrevem o padrão só naquele servidor."""
+        detector = SpamDetector(max_messages=5, time_window=5)
+        detector.set_guild_limits(1, max_messages=2)
+        results = [detector.is_spam(user_id=7, guild_id=1) for _ in range(3)]
+        assert results == [False, False, True]
+        assert not any(detector.is_spam(user_id=7, guild_id=2) for _ in range(5))
+
+        detector.set_guild_limits(1)
+        assert detector.limits(1) == (5, 5)
+
+
+class TestDuplicateContent:
+    """Cópias do mesmo texto entre contas diferentes."""
+
+    def test_copy_paste_flood_across_accounts(self):
+        detector = SpamDetector(duplicate_accounts=3, duplicate_window=30)
+        text = "Entrem no meu servidor: discord.gg/abc123 !!!"
+        results = [
+            detector.is_spam(user_id=uid, guild_id=1, content=variant)
+            for uid, variant in enumerate([text, text.upper(), "<@123> " + text, text])
+        ]
+        assert results == [False, False, True, True]
+        # Outro servidor tem contagem própria
+        assert detector.is_spam(user_id=50, guild_id=2, content=text) is False
+
+    def test_short_and_expired_contents_ignored(self):
+        detector = SpamDetector(duplicate_accounts=2, duplicate_window=30)
+        assert not any(detector.is_spam(user_id=uid, guild_id=1, content="bom dia!") for uid in range(5))
+
+        with patch("utils.spam_detector.time.time", return_value=1000.0):
+            detector.is_spam(user_id=1, guild_id=1, content="promo https://exemplo.com/x")
+        with patch("utils.spam_detector.time.time", return_value=1031.0):
+            assert detector.is_spam(user_id=2, guild_id=1, content="promo https://exemplo.com/x") is False
+        assert normalize_content("  Olá, <@1> MUNDO!! ") == "olá mundo"
+
+    def test_common_phrases_without_links_are_not_copies(self):
+        detector = SpamDetector(duplicate_accounts=3, duplicate_window=30)
+        for text in ("boa noite galera", "qual o evento de sexta?"):
+            assert not any(detector.is_spam(user_id=uid, guild_id=1, content=text) for uid in range(5))
+        assert detector.recent_contents == {}
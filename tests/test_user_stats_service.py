@@ -0,0 +1,128 @@
+# tests/test_user_stats_service.py — Testes do cache de /stats me
+"""
+Testa o UserStatsService (cache por guild/usuário/janela) e a montagem
+de get_detailed_user_stats a partir das consultas parciais.
+"""
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+
+@pytest.fixture
+def mock_db():
+    db = MagicMock()
+    db.get_detailed_user_stats = AsyncMock(side_effect=lambda u, g, d: {'user': u, 'days': d})
+    return db
+
+
+class TestUserStatsService:
+
+    @pytest.mark.asyncio
+    async def test_second_call_is_served_from_cache(self, mock_db):
+        from utils.user_stats_service import UserStatsService
+        service = UserStatsService(mock_db, ttl=60)
+        first = await service.get_user_stats(1, 100, 30)
+        second = await service.get_user_stats(1, 100, 30)
+        assert first == second
+        assert mock_db.get_detailed_user_stats.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_windows_are_cached_separately(self, mock_db):
+        from utils.user_stats_service import UserStatsService
+        service = UserStatsService(mock_db, ttl=60)
+        await service.get_user_stats(1, 100, 30)
+        await service.get_user_stats(1, 100, 7)
+        assert mock_db.get_detailed_user_stats.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_entry_expires_after_ttl(self, mock_db):
+        from utils.user_stats_service import UserStatsService
+        service = UserStatsService(mock_db, ttl=60)
+        with patch("utils.user_stats_service.time.monotonic", return_value=1000.0):
+            await service.get_user_stats(1, 100, 30)
+        with patch("utils.user_stats_service.time.monotonic", return_value=1061.0):
+            await service.get_user_stats(1, 100, 30)
+        assert mock_db.get_detailed_user_stats.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_invalidate_drops_only_that_user(self, mock_db):
+        """invalidate descarta todas as janelas do usuário e preserva os demais."""
+        from utils.user_stats_service import UserStatsService
+        service = UserStatsService(mock_db, ttl=60)
+        await service.get_user_stats(1, 100, 30)
+        await service.get_user_stats(1, 100, 7)
+        await service.get_user_stats(2, 100, 30)
+        service.invalidate(1, 100)
+        await service.get_user_stats(1, 100, 30)
+        await service.get_user_stats(2, 100, 30)
+        assert mock_db.get_detailed_user_stats.await_count == 4
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_query(self, mock_db):
+        """Misses simultâneos do mesmo usuário e janela fazem uma única consulta."""
+        from utils.user_stats_service import UserStatsService
+        release = asyncio.Event()
+
+        async def slow_stats(user_id, guild_id, days):
+            await release.wait()
+            return {'user': user_id, 'days': days}
+
+        mock_db.get_detailed_user_stats = AsyncMock(side_effect=slow_stats)
+        service = UserStatsService(mock_db, ttl=60)
+        pending = asyncio.gather(*(service.get_user_stats(1, 100, 30) for _ in range(5)))
+        await asyncio.sleep(0)
+        release.set()
+        results = await pending
+
+        assert mock_db.get_detailed_user_stats.await_count == 1
+        assert all(r == {'user': 1, 'days': 30} for r in results)
+
+    @pytest.mark.asyncio
+    async def test_invalidate_during_query_skips_caching_it(self, mock_db):
+        """Uma consulta iniciada antes de invalidate não fica no cache."""
+        from utils.user_stats_service import UserStatsService
+        release = asyncio.Event()
+
+        async def slow_stats(user_id, guild_id, days):
+            await release.wait()
+            return {'user': user_id, 'days': days}
+
+        mock_db.get_detailed_user_stats = AsyncMock(side_effect=slow_stats)
+        service = UserStatsService(mock_db, ttl=60)
+        pending = asyncio.ensure_future(service.get_user_stats(1, 100, 30))
+        await asyncio.sleep(0)
+        service.invalidate(1, 100)
+        release.set()
+        await pending
+        await service.get_user_stats(1, 100, 30)
+
+        assert mock_db.get_detailed_user_stats.await_count == 2
+
+
+class TestDetailedUserStatsAssembly:
+
+    @pytest.mark.asyncio
+    async def test_totals_derived_from_partial_queries(self):
+        """Total de pontos e tempo de jogo saem do detalhamento; top 3 jogos ordenado."""
+        from database import Database
+        db = Database.__new__(Database)
+        db._user_daily_totals = AsyncMock(return_value={'messages': 12, 'voice_seconds': 7260})
+        db._user_points_breakdown = AsyncMock(return_value={'message': 10, 'minute_tick': 30, 'penalty': -5})
+        db._user_game_activities = AsyncMock(return_value=[
+            {'activity_name': 'A', 'seconds': 600},
+            {'activity_name': 'B', 'seconds': 3000},
+            {'activity_name': 'C', 'seconds': 120},
+            {'activity_name': 'D', 'seconds': 1800},
+        ])
+        db._user_top_text_channels = AsyncMock(return_value=[])
+        db._user_top_voice_channels = AsyncMock(return_value=[])
+
+        stats = await db.get_detailed_user_stats(1, 100, 30)
+
+        assert stats['total_messages'] == 12
+        assert stats['voice_minutes'] == 121
+        assert stats['total_points'] == 35
+        assert stats['game_minutes'] == 92
+        assert [a['activity_name'] for a in stats['top_activities']] == ['B', 'D', 'A']
+        assert stats['top_activities'][0]['minutes'] == 50
@@ -0,0 +1,65 @@
+# tests/test_vector_index.py — Testes do índice vetorial local (sem pgvector)
+"""
+Testa o LocalVectorIndex com banco mockado: filtro por usuário/memórias
+globais, append incremental, carga única por servidor e despejo LRU.
+Requer numpy (dependência opcional); sem ele os testes são pulados.
+"""
+import asyncio
+import struct
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+pytest.importorskip("numpy")
+
+from utils.vector_index import LocalVectorIndex
+
+
+def _row(user_id, content, vector):
+    return {
+        "user_id": user_id, "content": content, "created_at": None,
+        "embedding_blob": struct.pack(f"<{len(vector)}f", *vector),
+    }
+
+
+@pytest.fixture
+def db():
+    db = MagicMock()
+    db.get_memory_vectors = AsyncMock(return_value=[
+        _row(10, "Gosta de Valorant", [1.0, 0.0, 0.0]),
+        _row(20, "Memória de outro usuário", [1.0, 0.0, 0.0]),
+        _row(None, "Evento na sexta", [0.6, 0.8, 0.0]),
+        _row(10, "Mora em Recife", [0.0, 0.0, 1.0]),
+    ])
+    return db
+
+
+class TestLocalVectorIndex:
+
+    @pytest.mark.asyncio
+    async def test_ranks_user_and_guild_memories(self, db):
+        index = LocalVectorIndex(db)
+        found = await index.search(1, [2.0, 0.0, 0.0], user_id=10, limit=3)
+
+        assert [m["content"] for m in found] == ["Gosta de Valorant", "Evento na sexta", "Mora em Recife"]
+        assert found[0]["similarity"] == pytest.approx(1.0)
+
+    @pytest.mark.asyncio
+    async def test_loads_each_guild_once_and_appends(self, db):
+        index = LocalVectorIndex(db)
+        await asyncio.gather(index.search(1, [1.0, 0.0, 0.0], 10), index.search(1, [0.0, 1.0, 0.0], 10))
+        index.add(1, 10, "Joga de Jett", [0.0, 0.0, 2.0])
+        found = await index.search(1, [0.0, 0.0, 1.0], user_id=10, limit=2)
+
+        db.get_memory_vectors.assert_awaited_once_with(1)
+        assert [m["content"] for m in found] == ["Mora em Recife", "Joga de Jett"]
+
+    @pytest.mark.asyncio
+    async def test_evicts_least_recently_used_guild(self, db):
+        index = LocalVectorIndex(db, max_guilds=2)
+        for guild_id in (1, 2, 1, 3):
+            await index.search(guild_id, [1.0, 0.0, 0.0], 10)
+
+        assert list(index._guilds) == [1, 3]
+        index.invalidate(1)
+        await index.search(1, [1.0, 0.0, 0.0], 10)
+        assert db.get_memory_vectors.await_count == 4
@@ -0,0 +1,129 @@
+# tests/test_voice_sessions.py — Testes do VoiceSessionRegistry
+"""
+Testa o registro de sessões de voz: cada transição vira uma única escrita pela
+chave primária, saídas sem sessão conhecida caem no UPDATE antigo, o checkpoint
+é um só comando e a reconciliação da inicialização reabre as sessões dos
+membros que estão em voz.
+"""
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from stats_collector import StatsCollector
+from utils.points_manager import PointsManager
+from utils.voice_sessions import VoiceSession, VoiceSessionRegistry
+
+JOINED = datetime(2026, 3, 1, 12, 0)
+
+
+@pytest.fixture
+def db():
+    db = MagicMock()
+    db.open_voice_session = AsyncMock(return_value={"id": 1, "joined_at": JOINED})
+    db.move_voice_session = AsyncMock(return_value={"id": 2, "joined_at": JOINED})
+    db.close_voice_session = AsyncMock()
+    db.update_voice_leave = AsyncMock()
+    db.insert_voice_join = AsyncMock()
+    db.checkpoint_voice_sessions = AsyncMock()
+    db.upsert_user = AsyncMock()
+    db.upsert_channel = AsyncMock()
+    return db
+
+
+def _member(user_id, bot=False):
+    return SimpleNamespace(id=user_id, name=f"user{user_id}", discriminator="0", bot=bot)
+
+
+def _state(channel_id, guild_id=10):
+    if channel_id is None:
+        return SimpleNamespace(channel=None)
+    guild = SimpleNamespace(id=guild_id)
+    return SimpleNamespace(channel=SimpleNamespace(id=channel_id, name=f"voz{channel_id}", guild=guild))
+
+
+class TestVoiceSessionRegistry:
+
+    @pytest.mark.asyncio
+    async def test_join_move_leave_use_primary_key(self, db):
+        registry = VoiceSessionRegistry(db)
+        await registry.join(10, 5, 100)
+        assert registry.get(10, 5) == VoiceSession(1, 100, JOINED)
+
+        await registry.move(10, 5, 100, 200)
+        db.move_voice_session.assert_awaited_once_with(1, JOINED, 5, 200, 10)
+        assert registry.get(10, 5) == VoiceSession(2, 200, JOINED)
+
+        await registry.leave(10, 5, 200)
+        db.close_voice_session.assert_awaited_once_with(2, JOINED)
+        db.update_voice_leave.assert_not_called()
+        assert registry.get(10, 5) is None
+
+    @pytest.mark.asyncio
+    async def test_unknown_session_falls_back_to_legacy_update(self, db):
+        registry = VoiceSessionRegistry(db)
+        await registry.leave(10, 5, 100)
+        db.update_voice_leave.assert_awaited_once_with(5, 100)
+        db.close_voice_session.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_checkpoint_is_a_single_write(self, db):
+        registry = VoiceSessionRegistry(db)
+        await registry.join(10, 5, 100)
+        await registry.join(10, 6, 100)
+        await registry.checkpoint()
+        db.checkpoint_voice_sessions.assert_awaited_once_with([1, 1], [JOINED, JOINED])
+
+    @pytest.mark.asyncio
+    async def test_reconcile_reopens_members_in_voice(self, db):
+        db.reconcile_voice_sessions = AsyncMock(return_value={
+            "closed": 3,
+            "opened": [{"id": 7, "user_id": 5, "channel_id": 100, "guild_id": 10, "joined_at": JOINED}],
+        })
+        channel = SimpleNamespace(id=100, members=[_member(5), _member(99, bot=True)])
+        guild = SimpleNamespace(id=10, voice_channels=[channel], stage_channels=[])
+        registry = VoiceSessionRegistry(db)
+
+        manager = PointsManager(db)
+        manager.session_registry = registry
+        await manager.recover_sessions([guild])
+
+        db.reconcile_voice_sessions.assert_awaited_once_with([(5, "user5", 100, 10)])
+        assert registry.get(10, 5) == VoiceSession(7, 100, JOINED)
+
+    @pytest.mark.asyncio
+    async def test_reconnect_keeps_live_sessions(self, db):
+        db.reconcile_voice_sessions = AsyncMock(return_value={
+            "closed": 0,
+            "opened": [{"id": 7, "user_id": 5, "channel_id": 100, "guild_id": 10, "joined_at": JOINED}],
+        })
+        channel = SimpleNamespace(id=100, members=[_member(5)])
+        guild = SimpleNamespace(id=10, voice_channels=[channel], stage_channels=[])
+        manager = PointsManager(db)
+        manager.session_registry = VoiceSessionRegistry(db)
+
+        await manager.recover_sessions([guild])
+        await manager.recover_sessions([guild])  # on_ready de uma reconexão
+
+        db.reconcile_voice_sessions.assert_awaited_once()
+        assert manager.session_registry.get(10, 5) == VoiceSession(7, 100, JOINED)
+
+
+class TestStatsCollectorVoice:
+
+    @pytest.mark.asyncio
+    async def test_transitions_go_through_registry(self, db):
+        collector = StatsCollector(db)
+        collector.voice_sessions = VoiceSessionRegistry(db)
+        member = _member(5)
+
+        await collector.on_voice_state_update(member, _state(None), _state(100))
+        await collector.on_voice_state_update(member, _state(100), _state(200))
+        await collector.on_voice_state_update(member, _state(200), _state(None))
+
+        db.open_voice_session.assert_awaited_once_with(5, 100, 10)
+        db.move_voice_session.assert_awaited_once()
+        db.close_voice_session.assert_awaited_once_with(2, JOINED)
+        db.insert_voice_join.assert_not_called()
+        db.update_voice_leave.assert_not_called()
@@ -4,6 +4,7 @@ import discord
 from database import Database
 import logging
 from typing import Dict, Optional
+from utils.command_cache import ACTIVITY_COMMANDS
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +22,8 @@ class ActivityTracker:
         self.db = db
         # Cache de atividades em andamento: {(user_id, guild_id, activity_name): activity_id}
         self.active_activities: Dict[tuple, int] = {}
+        # CommandCache dos slash commands (opcional), invalidado ao fim de cada sessão
+        self.command_cache = None
     
     async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
         """
@@ -188,6 +191,8 @@ class ActivityTracker:
             
             # Remove do cache
             del self.active_activities[cache_key]
+            if self.command_cache:
+                self.command_cache.invalidate(member.guild.id, ACTIVITY_COMMANDS)
             
             logger.debug(f"🎮 {member.name} parou: {activity_name}")
             
@@ -215,6 +220,8 @@ class ActivityTracker:
                 del self.active_activities[key]
             
             if keys_to_remove:
+                if self.command_cache:
+                    self.command_cache.invalidate(member.guild.id, ACTIVITY_COMMANDS)
                 logger.info(f"🧹 Limpas {len(keys_to_remove)} atividades de {member.name}")
                 
         except Exception as e:
@@ -0,0 +1,66 @@
+import math
+import operator
+import time
+from typing import Dict, List, Optional
+
+
+class SemanticAnswerCache:
+    """
+    Per-guild cache of bot answers keyed by the question's embedding.
+
+    A new question whose cosine similarity to a cached one reaches `threshold`
+    gets the cached answer, skipping context assembly and the chat model.
+    Entries expire after `ttl` seconds and a guild keeps at most `max_per_guild`
+    (oldest dropped first). Whatever an answer may depend on (server context,
+    memories, profiles) must call invalidate() when it changes.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl: float = 1800, max_per_guild: int = 100):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_per_guild = max_per_guild
+        # guild_id -> [(expires_at, unit vector, answer)], oldest first
+        self._entries: Dict[int, List[tuple]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _unit(embedding: List[float]) -> Optional[List[float]]:
+        norm = math.sqrt(sum(map(operator.mul, embedding, embedding)))
+        return [v / norm for v in embedding] if norm else None
+
+    def lookup(self, guild_id: int, embedding: List[float]) -> Optional[str]:
+        """Best cached answer at or above the threshold, or None."""
+        entries = self._entries.get(guild_id)
+        query = self._unit(embedding) if entries else None
+        if not query:
+            self.misses += 1
+            return None
+
+        now = time.monotonic()
+        entries[:] = [entry for entry in entries if entry[0] > now]
+        best, best_score = None, self.threshold
+        for _, vector, answer in entries:
+            score = sum(map(operator.mul, vector, query))
+            if score >= best_score:
+                best, best_score = answer, score
+        if best is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return best
+
+    def store(self, guild_id: int, embedding: List[float], answer: str):
+        vector = self._unit(embedding)
+        if not vector or not answer:
+            return
+        entries = self._entries.setdefault(guild_id, [])
+        entries.append((time.monotonic() + self.ttl, vector, answer))
+        if len(entries) > self.max_per_guild:
+            del entries[:len(entries) - self.max_per_guild]
+
+    def invalidate(self, guild_id: Optional[int] = None):
+        if guild_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(guild_id, None)
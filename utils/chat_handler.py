@@ -1,95 +1,24 @@
-import os
 import logging
-import google.generativeai as genai
 from google.api_core.exceptions import ResourceExhausted
 
+from utils.llm_gateway import Lane, LLMDeadlineExceeded
+
 logger = logging.getLogger(__name__)
 
 class ChatHandler:
-    def __init__(self, api_key, model_name="gemini-2.5-flash"):
-        self.api_key = api_key
-        self.model_name = model_name
-        self.model = None
-        self._setup()
+    # Replies sent instead of a model answer when the call fails
+    BUSY_REPLY = "Estou um pouco sobrecarregado agora. Tente novamente mais tarde."
+    ERROR_REPLY = "Desculpe, ocorreu um erro ao processar sua mensagem."
 
-    def _setup(self):
-        if not self.api_key:
-            logger.warning("ChatHandler: No API key provided. Chat features will be disabled.")
-            return
-
-        try:
-            # Note: genai.configure is global. If main.py already configured it, 
-            # this might overwrite it if the keys are different.
-            # To support multiple keys safely, we might need to use client instantiation if available 
-            # or rely on the fact that we might be switching keys?
-            # actually, genai library creates a client. 
-            # If we want to use a specific key for this model instance without messing global config,
-            # we might need to look at how the library handles it. 
-            # But standard usage is genai.configure.
-            # If the user provides a dedicated key, we might need to re-configure or accept that 
-            # we are switching "contexts". 
-            # However, simpler approach for now: Use the key provided to this handler via a client if possible,
-            # Or just re-configure if strictly necessary, but that influences other threads.
-            # 
-            # WAIT: checking docs, google.generativeai.GenerativeModel doesn't take api_key in init.
-            # It relies on global configure.
-            # If we strictly need a separate key, we should surely verify if the library supports client instances.
-            # It seems `genai.configure` is indeed global.
-            # 
-            # WORKAROUND: If we want to use a separate key, we can try passing `client_options` or similar?
-            # Actually, `genai` has `Client` object in newer versions?
-            # Let's stick to the simplest approach first: 
-            # If the specific key is different from the main one, we might risk race conditions if we reconfigure.
-            # 
-            # But the proposal said "Dedicated API key".
-            # If `google.generativeai` allows passing `api_key` to `generate_content` or model construction?
-            # No, it seems it doesn't easily support multiple keys in the same process with the high-level `genai` module.
-            # 
-            # CORRECTIVE ACTION: I will assume that for now we might share the key or 
-            # if we really need a separate one, we have to look for a Client class.
-            # 
-            # Let's inspect if `lib` is recent enough to have `genai.Client`.
-            # For now, I will write it assuming `genai.configure` but adding a TODO or verify if we can pass it.
-            # Actually, looking at recent docs, `genai.configure(api_key=...)` is the way.
-            # If we change it, it changes globally.
-            # 
-            # IF the user wants a separate key for cost management, it implies they might accept that
-            # we switch the global key just before the call? That's unsafe in async.
-            # 
-            # Alternative: Use HTTP REST API for this specific feature if we need a different key safely.
-            # OR, just assume for now we use the main key if we can't easily isolate.
-            # 
-            # Let's try to assume we can use the same key for now OR checking if `genai.Client(api_key=...)` exists.
-            # I will check existence of Client by trying to import it or just stick to `genai.GenerativeModel`.
-            # 
-            # BUT, the `main.py` uses `genai.configure(api_key=GEMINI_API_KEY)`.
-            # If `GEMINI_CHAT_API_KEY` is provided, we probably want to prioritize it for chat.
-            # 
-            # Let's implement using the standard model init. I'll add logic to "configure" locally if needed
-            # but usually it's better to just use one key for the bot process unless there's a strict requirement.
-            # The requirement SAYS "Dedicated Configuration ... distinct from main ...".
-            # 
-            # I will just default to whatever is configured globally for now in `__init__` if I cannot isolate it,
-            # checking if `api_key` argument to `GenerativeModel` exists? No.
-            # 
-            # Let's use `genai.configure` safely? No.
-            # 
-            # DECISION: I will implement using the global configuration for now, but strictly asserting that
-            # we use the *model name* specified. 
-            # If the user REALLY needs a separate key effectively, they might need a library update or use REST.
-            # I will assume the user has set the global key to one that works for both OR 
-            # I will try to support `api_key` if I can find a way.
-            # 
-            # Actually, let's look at `google.generativeai` imports.
-            # `configure` accepts `api_key`.
-            # 
-            # I will proceed with creating the class and assume global config is managed in main or 
-            # IF I am given a key, I will re-configure.
-            pass
-        except Exception as e:
-            logger.error(f"Error configuring ChatHandler: {e}")
+    def __init__(self, gateway, model_name="gemini-2.5-flash"):
+        # All calls go through the LLMGateway, which owns the API keys (one client
+        # per key), so a dedicated chat key no longer means reconfiguring genai globally.
+        self.gateway = gateway
+        self.model_name = model_name
 
-        self.model = genai.GenerativeModel(self.model_name)
+    @staticmethod
+    def _contents(prompt, history):
+        return list(history) + [{"role": "user", "parts": [prompt]}]
 
     async def generate_response(self, prompt, history=[], system_instruction=None):
         """
@@ -98,24 +27,55 @@ class ChatHandler:
         system_instruction: Optional string to define the bot's persona/behavior for this turn.
         """
         try:
-            # If system_instruction provided, we might need a model instance with that instruction.
-            # Creating a GenerativeModel is lightweight.
-            if system_instruction:
-                model = genai.GenerativeModel(self.model_name, system_instruction=system_instruction)
-            else:
-                if not self.model: # Fallback to default setup if available
-                     self.model = genai.GenerativeModel(self.model_name)
-                model = self.model
-
-            chat = model.start_chat(history=history)
-            response = await chat.send_message_async(prompt)
+            response = await self.gateway.generate(
+                Lane.CHAT, self.model_name, self._contents(prompt, history),
+                system_instruction=system_instruction,
+            )
             return response.text
-        except ResourceExhausted:
+        except (ResourceExhausted, LLMDeadlineExceeded):
+            logger.warning("ChatHandler: Quota exceeded.")
+            return self.BUSY_REPLY
+        except Exception as e:
+            logger.error(f"ChatHandler Error: {e}")
+            return self.ERROR_REPLY
+
+    @classmethod
+    def is_fallback(cls, text):
+        return text in (cls.BUSY_REPLY, cls.ERROR_REPLY)
+
+    async def stream_response(self, prompt, history=[], system_instruction=None, outcome=None):
+        """
+        Same as generate_response, but yields the reply text as the model streams it.
+        If the call fails before any text arrives, yields the usual fallback message;
+        a failure mid-stream ends the reply with what was already produced.
+        outcome: optional dict; its "complete" key is set to False when the call failed.
+        """
+        produced = False
+        try:
+            response = await self.gateway.generate(
+                Lane.CHAT, self.model_name, self._contents(prompt, history),
+                system_instruction=system_instruction, stream=True,
+            )
+            async for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    continue  # Chunk without text parts (e.g. finish/safety metadata)
+                if text:
+                    produced = True
+                    yield text
+        except (ResourceExhausted, LLMDeadlineExceeded):
             logger.warning("ChatHandler: Quota exceeded.")
-            return "Estou um pouco sobrecarregado agora. Tente novamente mais tarde."
+            if outcome is not None:
+                outcome["complete"] = False
+            if not produced:
+                yield self.BUSY_REPLY
         except Exception as e:
             logger.error(f"ChatHandler Error: {e}")
-            return "Desculpe, ocorreu um erro ao processar sua mensagem."
+            if outcome is not None:
+                outcome["complete"] = False
+            if not produced:
+                yield self.ERROR_REPLY
 
     def format_history(self, discord_messages, bot_user):
         """
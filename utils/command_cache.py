@@ -0,0 +1,87 @@
+# utils/command_cache.py - Cache de resultados dos slash commands
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# TTL (segundos) de cada comando em cache. Rankings longos mudam devagar.
+COMMAND_TTLS: Dict[str, float] = {
+    "stats_server": 120,
+    "stats_top": 120,
+    "stats_channels": 120,
+    "stats_leaderboard": 60,
+    "games_top": 300,
+    "games_yearly": 1800,
+}
+
+# Comandos afetados por cada caminho de ingestão
+MESSAGE_COMMANDS = ("stats_server", "stats_top", "stats_channels")
+POINTS_COMMANDS = ("stats_leaderboard",)
+ACTIVITY_COMMANDS = ("games_top", "games_yearly")
+
+
+def _normalize(params: Dict[str, Any]) -> tuple:
+    """Parâmetros em forma canônica (ordem das chaves não importa)."""
+    return tuple(sorted(params.items()))
+
+
+class CommandCache:
+    """Cache por (guild, comando, parâmetros) com single-flight.
+
+    Chamadas simultâneas com a mesma chave compartilham uma única consulta.
+    A invalidação vinda da ingestão poupa entradas com menos de `min_age`
+    segundos, para que uma rajada do mesmo comando continue em uma consulta.
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, min_age: float = 15.0):
+        self.ttls = dict(COMMAND_TTLS if ttls is None else ttls)
+        self.min_age = min_age
+        # Formato: {guild_id: {(command, params): (gravado_em, valor)}}
+        self._entries: Dict[int, Dict[Tuple[str, tuple], Tuple[float, Any]]] = {}
+        self._inflight: Dict[Tuple[int, str, tuple], asyncio.Future] = {}
+
+    async def get_or_load(self, guild_id: int, command: str, params: Dict[str, Any],
+                          loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Retorna o valor em cache ou executa `loader` (uma vez por chave)."""
+        params_key = _normalize(params)
+        now = time.monotonic()
+
+        entry = self._entries.get(guild_id, {}).get((command, params_key))
+        if entry and now - entry[0] < self.ttls.get(command, 0):
+            return entry[1]
+
+        flight_key = (guild_id, command, params_key)
+        future = self._inflight.get(flight_key)
+        if future is None:
+            future = asyncio.ensure_future(self._load(guild_id, command, params_key, loader))
+            self._inflight[flight_key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(flight_key, None))
+        # shield: um chamador cancelado não cancela a consulta dos demais
+        return await asyncio.shield(future)
+
+    async def _load(self, guild_id: int, command: str, params_key: tuple,
+                    loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = await loader()
+        self._entries.setdefault(guild_id, {})[(command, params_key)] = (time.monotonic(), value)
+        return value
+
+    def invalidate(self, guild_id: int, commands: Optional[Tuple[str, ...]] = None, force: bool = False):
+        """Descarta entradas da guild (todas ou só de `commands`).
+
+        Sem `force`, entradas mais novas que `min_age` são mantidas.
+        """
+        entries = self._entries.get(guild_id)
+        if not entries:
+            return
+        now = time.monotonic()
+        stale = [
+            key for key, (stored_at, _) in entries.items()
+            if (commands is None or key[0] in commands)
+            and (force or now - stored_at >= self.min_age)
+        ]
+        for key in stale:
+            del entries[key]
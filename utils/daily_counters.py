@@ -0,0 +1,73 @@
+# utils/daily_counters.py - Contadores diários de pontos em memória (limites por dia)
+
+import asyncio
+import logging
+from typing import Dict, Tuple
+
+from config import now_brt
+
+logger = logging.getLogger(__name__)
+
+
+class DailyCounterStore:
+    """Pontos ganhos hoje por (guild, usuário, tipo, dia BRT), sem consulta por mensagem.
+
+    Cada chave é semeada do banco (db.get_daily_points) no primeiro uso do dia,
+    uma única vez mesmo com mensagens simultâneas, e depois só é incrementada
+    em memória por add(), chamado quando os pontos são gravados. Pontos somados
+    enquanto a semente ainda está sendo lida ficam pendentes e entram no valor
+    semeado (na dúvida o contador sobra, nunca falta). Na virada do
+    dia (meia-noite BRT) tudo é descartado e as chaves voltam a ser semeadas.
+
+    Genérico por tipo de interação: serve para qualquer limite diário
+    (mensagens curtas, reações, voz...).
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._day = None
+        # Formato: {(guild_id, user_id, tipo, dia): pontos}
+        self._counts: Dict[Tuple[int, int, str, object], int] = {}
+        self._loading: Dict[Tuple[int, int, str, object], asyncio.Future] = {}
+        # add() recebido durante a semente: {chave: pontos}
+        self._pending: Dict[Tuple[int, int, str, object], int] = {}
+
+    def _today(self):
+        today = now_brt().date()
+        if today != self._day:
+            # Meia-noite BRT: os contadores de ontem não servem mais
+            self._day = today
+            self._counts.clear()
+            self._pending.clear()
+        return today
+
+    async def get(self, guild_id: int, user_id: int, interaction_type: str) -> int:
+        """Pontos do tipo que o usuário já ganhou hoje no servidor."""
+        key = (guild_id, user_id, interaction_type, self._today())
+        count = self._counts.get(key)
+        if count is not None:
+            return count
+
+        future = self._loading.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._seed(key))
+            self._loading[key] = future
+            future.add_done_callback(lambda _: self._loading.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _seed(self, key) -> int:
+        guild_id, user_id, interaction_type, day = key
+        total = int(await self.db.get_daily_points(user_id, interaction_type, guild_id) or 0)
+        total += self._pending.pop(key, 0)
+        # Chave de um dia que já virou: devolve o valor, mas não guarda
+        if day == self._day:
+            self._counts[key] = total
+        return total
+
+    def add(self, guild_id: int, user_id: int, interaction_type: str, points: int):
+        """Registra pontos recém-gravados. Chaves ainda não semeadas ficam para o banco."""
+        key = (guild_id, user_id, interaction_type, self._today())
+        if key in self._counts:
+            self._counts[key] += points
+        elif key in self._loading:
+            self._pending[key] = self._pending.get(key, 0) + points
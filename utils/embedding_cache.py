@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from utils.llm_gateway import Lane
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Content-hash LRU of embeddings, backed by the `embedding_cache` table.
+
+    Concurrent misses are collected for `batch_window` seconds (or until
+    `max_batch` texts are queued) and resolved with a single batched embed
+    request on the gateway's embedding lane, so a burst of mentions costs one
+    API request instead of one each.
+    """
+
+    def __init__(self, db, model_name: str, gateway, task_type: str = "retrieval_document",
+                 max_entries: int = 2048, batch_window: float = 0.02, max_batch: int = 100):
+        self.db = db
+        self.gateway = gateway
+        self.model_name = model_name
+        self.task_type = task_type
+        self.max_entries = max_entries
+        self.batch_window = batch_window
+        self.max_batch = max_batch  # The API accepts at most 100 texts per call
+
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}  # key -> future shared by every waiter
+        self._queue: Dict[str, str] = {}  # key -> normalized text waiting for the next flush
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes = set()  # Keeps flush tasks referenced until they finish
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Collapse whitespace so trivially different texts share an entry."""
+        return " ".join(text.split())
+
+    def key_for(self, normalized: str) -> str:
+        raw = f"{self.model_name}\x00{self.task_type}\x00{normalized}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def embed(self, text: str) -> Optional[List[float]]:
+        """Returns the embedding for `text`, or None if it could not be generated."""
+        normalized = self.normalize(text or "")
+        if not normalized:
+            return None
+        key = self.key_for(normalized)
+
+        cached = self._lru.get(key)
+        if cached is not None:
+            self._lru.move_to_end(key)
+            return cached
+
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[key] = future
+            self._queue[key] = normalized
+            if len(self._queue) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.batch_window, self._flush)
+
+        try:
+            # shield: a cancelled caller must not cancel the result for the others
+            return await asyncio.shield(future)
+        except Exception as e:
+            logger.error(f"Embedding error: {e}")
+            return None
+
+    def _flush(self):
+        """Hands the queued texts to a background batch request."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._queue:
+            return
+        batch, self._queue = self._queue, {}
+        task = asyncio.ensure_future(self._resolve(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _resolve(self, batch: Dict[str, str]):
+        try:
+            found: Dict[str, List[float]] = {}
+            try:
+                found = await self.db.get_cached_embeddings(list(batch))
+            except Exception as e:
+                logger.warning(f"Embedding cache lookup failed: {e}")
+
+            missing = [key for key in batch if key not in found]
+            if missing:
+                vectors = await self.gateway.embed(
+                    Lane.EMBEDDING, self.model_name, [batch[key] for key in missing], self.task_type
+                )
+                fresh = dict(zip(missing, vectors))
+                found.update(fresh)
+                try:
+                    await self.db.store_cached_embeddings(fresh)
+                except Exception as e:
+                    logger.warning(f"Embedding cache write failed: {e}")
+
+            for key in batch:
+                self._remember(key, found[key])
+                future = self._pending.pop(key, None)
+                if future and not future.done():
+                    future.set_result(found[key])
+        except Exception as e:
+            for key in batch:
+                future = self._pending.pop(key, None)
+                if future and not future.done():
+                    future.set_exception(e)
+                    future.exception()  # Mark as retrieved in case every waiter was cancelled
+
+    def _remember(self, key: str, embedding: List[float]):
+        self._lru[key] = embedding
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
@@ -0,0 +1,172 @@
+# utils/fake_llm_backend.py - Backend local e determinístico no lugar do Gemini
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Callable, List, Optional
+
+from google.api_core.exceptions import InternalServerError, ResourceExhausted
+
+# Marcador que torna uma mensagem "ofensiva" para o veredito simulado
+DEFAULT_FLAG_WORDS = ("[ofensivo]",)
+# Mensagens numeradas no prompt de moderação: 1|texto
+_MODERATION_LINE = re.compile(r"^(\d+)\|(.*)$", re.MULTILINE)
+# Turnos numerados no prompt de extração de memória: [1] Usuário: texto
+_MEMORY_TURN = re.compile(r"\[(\d+)\] Usuário: (.*)")
+
+
+def lognormal_latency(median: float, p95: float) -> Callable[[random.Random], float]:
+    """Distribuição log-normal de latência (segundos) a partir da mediana e do p95."""
+    sigma = math.log(max(p95, median) / median) / 1.645 if median > 0 else 0.0
+    mu = math.log(median) if median > 0 else 0.0
+
+    def sample(rng: random.Random) -> float:
+        return rng.lognormvariate(mu, sigma) if median > 0 else 0.0
+    return sample
+
+
+def _response(text: str, prompt_tokens: int) -> SimpleNamespace:
+    """Objeto com a mesma superfície usada do GenerateContentResponse."""
+    usage = SimpleNamespace(total_token_count=prompt_tokens + len(text) // 4 + 1)
+    return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+class _FakeStream:
+    """Stream assíncrono de chunks com `.text`, como AsyncGenerateContentResponse."""
+
+    def __init__(self, chunks: List[str], delay: float):
+        self._chunks = chunks
+        self._delay = delay
+        self.usage_metadata = None
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self._chunks:
+            await asyncio.sleep(self._delay)
+            yield SimpleNamespace(text=chunk)
+
+
+class FakeGeminiBackend:
+    """Implementa a interface de backend do LLMGateway sem rede.
+
+    - Latência sorteada de `latency` (ex.: lognormal_latency(0.4, 1.5)).
+    - `error_rate` / `exhausted_rate`: fração de chamadas que falham com
+      InternalServerError / ResourceExhausted.
+    - `rpm_quota`: cota simulada do servidor por minuto (ResourceExhausted ao exceder).
+    - Moderação: sinaliza (confiança 0.95) as mensagens com alguma de
+      `flag_words`, no JSON do response_schema (só as sinalizadas).
+    - Memória: salva, no lote, os turnos em que o usuário pede para lembrar algo.
+    - Embeddings: vetores unitários derivados do hash do texto.
+
+    Tudo é determinístico para a mesma `seed` e a mesma sequência de chamadas.
+    """
+
+    def __init__(self, seed: int = 0, latency: Optional[Callable[[random.Random], float]] = None,
+                 error_rate: float = 0.0, exhausted_rate: float = 0.0,
+                 rpm_quota: Optional[int] = None, flag_words=DEFAULT_FLAG_WORDS,
+                 embedding_dim: int = 768, stream_chunks: int = 4):
+        self.rng = random.Random(seed)
+        self.latency = latency or (lambda rng: 0.0)
+        self.error_rate = error_rate
+        self.exhausted_rate = exhausted_rate
+        self.rpm_quota = rpm_quota
+        self.flag_words = tuple(word.lower() for word in flag_words)
+        self.embedding_dim = embedding_dim
+        self.stream_chunks = stream_chunks
+
+        self.calls = 0
+        self._recent: deque = deque()  # Instantes das chamadas no último minuto
+
+    async def generate(self, model: str, contents, system_instruction: Optional[str] = None,
+                       generation_config: Optional[dict] = None, stream: bool = False):
+        await self._simulate_call()
+        prompt = self._last_user_text(contents)
+        text = self._answer(prompt)
+        tokens = (len(prompt) + len(system_instruction or "")) // 4 + 1
+        if not stream:
+            return _response(text, tokens)
+
+        size = max(1, math.ceil(len(text) / self.stream_chunks))
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        return _FakeStream(chunks, delay=self.latency(self.rng) / max(1, len(chunks)))
+
+    async def embed(self, model: str, texts: List[str], task_type: str) -> List[List[float]]:
+        await self._simulate_call()
+        return [self.embedding_for(text) for text in texts]
+
+    def embedding_for(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.embedding_dim)]
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    # ── Simulação ────────────────────────────────────────────────────────────
+
+    async def _simulate_call(self):
+        self.calls += 1
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] >= 60:
+            self._recent.popleft()
+        if self.rpm_quota is not None and len(self._recent) >= self.rpm_quota:
+            raise ResourceExhausted("fake: cota por minuto excedida")
+        self._recent.append(now)
+
+        await asyncio.sleep(self.latency(self.rng))
+        roll = self.rng.random()
+        if roll < self.exhausted_rate:
+            raise ResourceExhausted("fake: cota injetada")
+        if roll < self.exhausted_rate + self.error_rate:
+            raise InternalServerError("fake: erro injetado")
+
+    @staticmethod
+    def _last_user_text(contents) -> str:
+        if isinstance(contents, str):
+            return contents
+        last = contents[-1]
+        if isinstance(last, dict):
+            return " ".join(str(part) for part in last.get("parts", []))
+        return str(last)
+
+    def _answer(self, prompt: str) -> str:
+        if "MENSAGENS:" in prompt:
+            return self._moderation_verdicts(prompt)
+        if '"save_memory"' in prompt:
+            return self._memory_extraction(prompt)
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        return (
+            f"Resposta simulada {digest}. "
+            "Esta é uma resposta de teste gerada localmente, sem chamar a API. "
+            "Ela tem algumas frases para exercitar o streaming."
+        )
+
+    def _moderation_verdicts(self, prompt: str) -> str:
+        section = prompt.split("MENSAGENS:", 1)[1]
+        flagged = [
+            {"id": int(match.group(1)), "confianca": 0.95, "motivo": "marcador de teste"}
+            for match in _MODERATION_LINE.finditer(section)
+            if any(word in match.group(2).lower() for word in self.flag_words)
+        ]
+        return json.dumps({"sinalizadas": flagged}, ensure_ascii=False)
+
+    def _memory_extraction(self, prompt: str) -> str:
+        items = []
+        for match in _MEMORY_TURN.finditer(prompt):
+            user_text = match.group(2).strip()
+            if "lembre" in user_text.lower():
+                items.append({
+                    "turno": int(match.group(1)),
+                    "save_memory": True,
+                    "memory_content": user_text,
+                    "is_user_profile_update": False,
+                    "profile_update": {},
+                })
+        return json.dumps({"itens": items}, ensure_ascii=False)
@@ -0,0 +1,446 @@
+# utils/llm_gateway.py - Gateway central das chamadas ao Gemini
+
+import asyncio
+import hashlib
+import itertools
+import logging
+import time
+from collections import OrderedDict, deque
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Protocol, Tuple
+
+import google.generativeai as genai
+from google.ai import generativelanguage as glm
+from google.generativeai.types import content_types, generation_types
+from google.api_core.exceptions import ResourceExhausted
+
+logger = logging.getLogger(__name__)
+
+
+class Lane(IntEnum):
+    """Filas de prioridade do gateway (menor valor = atendido primeiro)."""
+    MODERATION = 0
+    CHAT = 1
+    MEMORY = 2
+    EMBEDDING = 3
+
+
+# Prazo padrão (segundos) de cada fila; pedidos que não conseguem capacidade
+# dentro do prazo falham cedo em vez de ocupar a cota quando já não servem.
+LANE_DEADLINES: Dict[Lane, float] = {
+    Lane.MODERATION: 120.0,
+    Lane.CHAT: 30.0,
+    Lane.MEMORY: 600.0,
+    Lane.EMBEDDING: 30.0,
+}
+
+# Margem de tokens de saída reservada por chamada de geração
+OUTPUT_TOKEN_ALLOWANCE = 1024
+
+
+class LLMDeadlineExceeded(Exception):
+    """O pedido não pôde ser atendido dentro do prazo da sua fila."""
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Estimativa grosseira (≈4 caracteres por token), usada só para o rate limit."""
+    return sum(len(text) for text in texts) // 4 + 1
+
+
+def _contents_text(contents) -> List[str]:
+    """Extrai o texto de um prompt (str ou histórico no formato role/parts)."""
+    if isinstance(contents, str):
+        return [contents]
+    texts = []
+    for item in contents:
+        if isinstance(item, str):
+            texts.append(item)
+        elif isinstance(item, dict):
+            texts.extend(str(part) for part in item.get("parts", []))
+    return texts
+
+
+class LLMBackend(Protocol):
+    """Interface dos backends do gateway (GeminiBackend, FakeGeminiBackend)."""
+
+    async def generate(self, model: str, contents, system_instruction: Optional[str] = None,
+                       generation_config: Optional[dict] = None, stream: bool = False) -> Any:
+        """Resposta com `.text` (e `usage_metadata`), ou stream assíncrono de chunks com `.text`."""
+
+    async def embed(self, model: str, texts: List[str], task_type: str) -> List[List[float]]:
+        """Um embedding por texto, na mesma ordem."""
+
+
+class TokenBucket:
+    """Balde de tokens com reposição contínua (`rate` por segundo)."""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Segundos até haver `amount` disponível (0 se já há)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float, now: float):
+        self._refill(now)
+        # Pode ficar negativo na reconciliação com o uso real
+        self.tokens -= min(amount, self.capacity)
+
+
+class _KeySlot:
+    """Uma chave de API: seu backend (cliente próprio) e os baldes por modelo."""
+
+    def __init__(self, index: int, backend, limits: Dict[str, Tuple[int, int]],
+                 default_limits: Tuple[int, int]):
+        self.index = index
+        self.backend = backend
+        self.limits = limits
+        self.default_limits = default_limits
+        self.buckets: Dict[str, Tuple[TokenBucket, TokenBucket]] = {}
+        self.cooldown_until = 0.0
+
+    def _buckets(self, model: str) -> Tuple[TokenBucket, TokenBucket]:
+        if model not in self.buckets:
+            rpm, tpm = self.limits.get(model, self.default_limits)
+            self.buckets[model] = (TokenBucket(rpm, rpm / 60), TokenBucket(tpm, tpm / 60))
+        return self.buckets[model]
+
+    def wait_time(self, model: str, tokens: int, now: float) -> float:
+        requests, token_bucket = self._buckets(model)
+        return max(
+            self.cooldown_until - now,
+            requests.wait_time(1, now),
+            token_bucket.wait_time(tokens, now),
+        )
+
+    def consume(self, model: str, tokens: int, now: float):
+        requests, token_bucket = self._buckets(model)
+        requests.consume(1, now)
+        token_bucket.consume(tokens, now)
+
+    def adjust_tokens(self, model: str, delta: int):
+        """Corrige o balde com a diferença entre o uso real e o estimado."""
+        _, token_bucket = self._buckets(model)
+        token_bucket.consume(delta, time.monotonic())
+
+
+class _Request:
+    __slots__ = ("lane", "model", "tokens", "call", "deadline", "seq", "future",
+                 "enqueued_at", "attempts", "tried")
+
+    def __init__(self, lane: Lane, model: str, tokens: int,
+                 call: Callable[[Any], Awaitable[Any]], deadline: float, seq: int):
+        self.lane = lane
+        self.model = model
+        self.tokens = tokens
+        self.call = call
+        self.deadline = deadline
+        self.seq = seq
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+        self.tried: set = set()
+
+    def sort_key(self):
+        return (self.lane, self.deadline, self.seq)
+
+
+class GatewayMetrics:
+    """Contadores e amostras de latência por fila."""
+
+    COUNTERS = ("submitted", "completed", "failed", "expired", "rate_limited")
+
+    def __init__(self, samples: int = 512):
+        self.counters = {lane: dict.fromkeys(self.COUNTERS, 0) for lane in Lane}
+        self.queue_wait = {lane: deque(maxlen=samples) for lane in Lane}
+        self.latency = {lane: deque(maxlen=samples) for lane in Lane}
+
+    def incr(self, lane: Lane, counter: str):
+        self.counters[lane][counter] += 1
+
+    @staticmethod
+    def _percentile(samples, pct: float) -> Optional[float]:
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct))] * 1000, 1)
+
+    def snapshot(self, queued: Dict[Lane, int]) -> Dict[str, Dict[str, Any]]:
+        return {
+            lane.name.lower(): {
+                **self.counters[lane],
+                "queued": queued.get(lane, 0),
+                "p50_wait_ms": self._percentile(self.queue_wait[lane], 0.50),
+                "p95_wait_ms": self._percentile(self.queue_wait[lane], 0.95),
+                "p95_latency_ms": self._percentile(self.latency[lane], 0.95),
+            }
+            for lane in Lane
+        }
+
+
+class LLMGateway:
+    """Ponto único de acesso ao Gemini para moderação, chat, memória e embeddings.
+
+    Cada chave de API tem seu próprio backend/cliente e baldes de requisições e
+    tokens por modelo. Os pedidos esperam numa fila ordenada por (fila, prazo):
+    o despachante envia o primeiro pedido que tem capacidade em alguma chave,
+    sem deixar filas menores consumirem o balde que uma fila maior está
+    esperando encher, falha cedo quem não consegue capacidade antes do prazo e, em
+    ResourceExhausted, põe a chave em resfriamento e tenta outra.
+    """
+
+    def __init__(self, backends: List[LLMBackend], limits: Optional[Dict[str, Tuple[int, int]]] = None,
+                 default_limits: Tuple[int, int] = (15, 1_000_000),
+                 cooldown: float = 30.0, max_attempts: int = 3):
+        self._slots = [_KeySlot(i, backend, limits or {}, default_limits)
+                       for i, backend in enumerate(backends)]
+        self.cooldown = cooldown
+        self.max_attempts = max_attempts
+        self.metrics = GatewayMetrics()
+
+        self._queue: List[_Request] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._running: set = set()
+
+    # ── API pública ──────────────────────────────────────────────────────────
+
+    async def generate(self, lane: Lane, model: str, contents, *, system_instruction: Optional[str] = None,
+                       generation_config: Optional[dict] = None, stream: bool = False,
+                       deadline: Optional[float] = None):
+        """Gera conteúdo (resposta do backend, ou o stream se `stream=True`)."""
+        texts = _contents_text(contents)
+        if system_instruction:
+            texts.append(system_instruction)
+        tokens = estimate_tokens(*texts) + OUTPUT_TOKEN_ALLOWANCE
+
+        async def call(backend):
+            return await backend.generate(
+                model, contents, system_instruction=system_instruction,
+                generation_config=generation_config, stream=stream,
+            )
+
+        return await self._submit(lane, model, tokens, call, deadline)
+
+    async def embed(self, lane: Lane, model: str, texts: List[str], task_type: str,
+                    deadline: Optional[float] = None) -> List[List[float]]:
+        """Gera embeddings em lote (uma requisição para todos os textos)."""
+        async def call(backend):
+            return await backend.embed(model, texts, task_type)
+
+        return await self._submit(lane, model, estimate_tokens(*texts), call, deadline)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        queued: Dict[Lane, int] = {}
+        for req in self._queue:
+            queued[req.lane] = queued.get(req.lane, 0) + 1
+        return self.metrics.snapshot(queued)
+
+    # ── Fila e despacho ──────────────────────────────────────────────────────
+
+    async def _submit(self, lane: Lane, model: str, tokens: int,
+                      call: Callable[[Any], Awaitable[Any]], deadline: Optional[float]):
+        if not self._slots:
+            raise RuntimeError("LLMGateway sem chaves de API configuradas.")
+
+        timeout = LANE_DEADLINES[lane] if deadline is None else deadline
+        req = _Request(lane, model, tokens, call, time.monotonic() + timeout, next(self._seq))
+        self.metrics.incr(lane, "submitted")
+        self._enqueue(req)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch_loop())
+        return await req.future
+
+    def _enqueue(self, req: _Request):
+        self._queue.append(req)
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+
+    async def _dispatch_loop(self):
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            next_wait = None
+            self._queue.sort(key=_Request.sort_key)
+            # (chave, modelo) que um pedido à frente está esperando encher:
+            # filas de prioridade menor não consomem desse balde até ele sair
+            reserved: Dict[Tuple[int, str], Tuple[Lane, float]] = {}
+
+            for req in list(self._queue):
+                if req.future.done():  # Chamador cancelado
+                    self._queue.remove(req)
+                    continue
+
+                slot, wait = self._pick_slot(req, now, reserved)
+                if slot is not None and wait <= 0:
+                    self._queue.remove(req)
+                    self._start(slot, req, now)
+                    continue
+
+                if now + wait > req.deadline:
+                    self._queue.remove(req)
+                    self._expire(req)
+                    continue
+                if slot is not None:
+                    reserved.setdefault((slot.index, req.model), (req.lane, wait))
+                next_wait = wait if next_wait is None else min(next_wait, wait)
+
+            if self._queue:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=next_wait or 0.01)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _pick_slot(
+        self,
+        req: _Request,
+        now: float,
+        reserved: Optional[Dict[Tuple[int, str], Tuple[Lane, float]]] = None,
+    ) -> Tuple[Optional[_KeySlot], float]:
+        """Chave com capacidade mais cedo para o pedido (evita repetir chaves que já falharam).
+
+        Uma chave reservada por um pedido de fila mais prioritária conta como
+        ocupada pelo menos até ele ser atendido.
+        """
+        candidates = [slot for slot in self._slots if slot.index not in req.tried] or self._slots
+        best, best_wait = None, float("inf")
+        for slot in candidates:
+            wait = slot.wait_time(req.model, req.tokens, now)
+            hold = reserved.get((slot.index, req.model)) if reserved else None
+            if hold is not None and hold[0] < req.lane:
+                wait = max(wait, hold[1])
+            if wait < best_wait:
+                best, best_wait = slot, wait
+        return best, best_wait
+
+    def _expire(self, req: _Request):
+        self.metrics.incr(req.lane, "expired")
+        if not req.future.done():
+            req.future.set_exception(LLMDeadlineExceeded(
+                f"{req.lane.name.lower()}: sem capacidade no prazo para {req.model}"
+            ))
+
+    def _start(self, slot: _KeySlot, req: _Request, now: float):
+        slot.consume(req.model, req.tokens, now)
+        req.attempts += 1
+        self.metrics.queue_wait[req.lane].append(now - req.enqueued_at)
+        task = asyncio.ensure_future(self._run(slot, req))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, slot: _KeySlot, req: _Request):
+        started = time.monotonic()
+        try:
+            result = await req.call(slot.backend)
+        except ResourceExhausted as e:
+            self.metrics.incr(req.lane, "rate_limited")
+            slot.cooldown_until = time.monotonic() + self.cooldown
+            req.tried.add(slot.index)
+            logger.warning(f"⚠️ Cota esgotada na chave #{slot.index} ({req.model}); resfriando {self.cooldown:.0f}s.")
+            if req.attempts < self.max_attempts and time.monotonic() < req.deadline:
+                req.enqueued_at = time.monotonic()
+                self._enqueue(req)
+                return
+            self._fail(req, e)
+        except Exception as e:
+            self._fail(req, e)
+        else:
+            self.metrics.latency[req.lane].append(time.monotonic() - started)
+            self.metrics.incr(req.lane, "completed")
+            usage = getattr(result, "usage_metadata", None)
+            total = getattr(usage, "total_token_count", None) if usage else None
+            if total:
+                slot.adjust_tokens(req.model, total - req.tokens)
+            if not req.future.done():
+                req.future.set_result(result)
+
+    def _fail(self, req: _Request, error: Exception):
+        self.metrics.incr(req.lane, "failed")
+        if not req.future.done():
+            req.future.set_exception(error)
+
+
+class GeminiBackend:
+    """Backend real: um cliente assíncrono do Gemini por chave de API.
+
+    `genai.configure` é global; com um cliente próprio por chave, cada chave é
+    isolada sem reconfigurar o módulo. As chamadas montam o
+    GenerateContentRequest e vão direto ao cliente da chave.
+    """
+
+    # Cabeçalhos de pedido (nome do modelo + instrução de sistema convertida)
+    # guardados (LRU) por (modelo, hash da instrução de sistema)
+    MODEL_CACHE_SIZE = 128
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self._client = None
+        self._models: "OrderedDict[tuple, Tuple[str, Optional[glm.Content]]]" = OrderedDict()
+
+    @property
+    def client(self):
+        # Criado no primeiro uso, já dentro do event loop do bot (canal gRPC assíncrono)
+        if self._client is None:
+            self._client = glm.GenerativeServiceAsyncClient(client_options={"api_key": self.api_key})
+        return self._client
+
+    def _model(self, model: str, system_instruction: Optional[str] = None) -> Tuple[str, Optional[glm.Content]]:
+        # Moderação, memória e conversas seguidas no mesmo contexto repetem a mesma
+        # instrução: reaproveita a conversão em vez de refazê-la a cada chamada
+        digest = hashlib.sha256(system_instruction.encode()).digest() if system_instruction else None
+        key = (model, digest)
+        prepared = self._models.get(key)
+        if prepared is not None:
+            self._models.move_to_end(key)
+            return prepared
+
+        name = model if "/" in model else f"models/{model}"
+        system = content_types.to_content(system_instruction) if system_instruction else None
+        prepared = (name, system)
+        self._models[key] = prepared
+        if len(self._models) > self.MODEL_CACHE_SIZE:
+            self._models.popitem(last=False)
+        return prepared
+
+    async def generate(self, model: str, contents, system_instruction: Optional[str] = None,
+                       generation_config: Optional[dict] = None, stream: bool = False):
+        name, system = self._model(model, system_instruction)
+        contents = content_types.to_contents(contents)
+        if contents and not contents[-1].role:
+            contents[-1].role = "user"
+        request = glm.GenerateContentRequest(
+            model=name,
+            contents=contents,
+            system_instruction=system,
+            generation_config=generation_types.to_generation_config_dict(generation_config),
+        )
+        if stream:
+            with generation_types.rewrite_stream_error():
+                iterator = await self.client.stream_generate_content(request)
+            return await generation_types.AsyncGenerateContentResponse.from_aiterator(iterator)
+        response = await self.client.generate_content(request)
+        return generation_types.AsyncGenerateContentResponse.from_response(response)
+
+    async def embed(self, model: str, texts: List[str], task_type: str) -> List[List[float]]:
+        result = await genai.embed_content_async(
+            model=model, content=texts, task_type=task_type, client=self.client,
+        )
+        return result['embedding']
@@ -2,32 +2,139 @@
 import logging
 import json
 import asyncio
-import google.generativeai as genai
+import re
+import time
+from collections import OrderedDict, deque
 from typing import List, Dict, Any, Optional
 
+from config import (
+    CHAT_ANSWER_CACHE, CHAT_ANSWER_CACHE_THRESHOLD, CHAT_ANSWER_CACHE_TTL,
+    GEMINI_EMBEDDING_MODEL, MEMORY_COMPACTION_MIN_AGE_DAYS, MEMORY_COMPACTION_THRESHOLD,
+)
+from utils.answer_cache import SemanticAnswerCache
+from utils.embedding_cache import EmbeddingCache
+from utils.vector_index import LocalVectorIndex
+from utils.llm_gateway import Lane
+from utils.prompt_assembler import PromptPart, render
+
 logger = logging.getLogger(__name__)
 
+# Batched memory extraction
+EXTRACTION_BATCH_SIZE = 20   # turns per extraction call
+MAX_TURNS_PER_USER = 3       # most recent turns kept per user between flushes
+MAX_PENDING_USERS = 200      # global backlog bound (oldest users dropped first)
+MAX_TURN_CHARS = 500         # each side of a turn is truncated in the prompt
+MAX_CLUSTER_FACTS = 20       # facts of a cluster listed in the compaction prompt
+
+# Words that carry no memorable information on their own
+_FILLER_WORDS = {
+    "oi", "ola", "olá", "opa", "eai", "eae", "salve", "fala", "bom", "boa", "dia", "tarde", "noite",
+    "tudo", "bem", "beleza", "blz", "td", "e", "aí", "ai", "vc", "você", "tu", "como", "vai",
+    "valeu", "vlw", "obrigado", "obrigada", "obg", "tmj", "ok", "okay", "sim", "não", "nao",
+    "kk", "kkk", "haha", "hahaha", "rs", "lol", "top", "show", "massa", "legal", "bot", "bmia",
+    "tchau", "flw", "falou", "até", "mais", "nada", "hm", "hmm", "ué", "né", "ne",
+}
+# Cues that a turn may carry a fact or preference worth extracting
+_MEMORY_CUES = re.compile(
+    r"lembr|meu nome|me chama|pode me chamar|prefiro|prefer|gosto|odeio|adoro|favorit|"
+    r"eu sou|trabalho|estudo|moro|evento|regra|sempre|nunca",
+    re.IGNORECASE,
+)
+_LAUGHTER = re.compile(r"^(k+|(ha)+h?|(he)+h?|(rs)+|lo+l)$")
+# First-person questions ("qual meu jogo favorito?") are about the asker: never cached
+_FIRST_PERSON = re.compile(
+    r"\b(eu|meu|meus|minha|minhas|mim|comigo|me|sou|estou|tenho)\b",
+    re.IGNORECASE,
+)
+
+
+def is_trivial_turn(text: str) -> bool:
+    """Cheap pre-filter: True for turns with obviously nothing to remember."""
+    if not text:
+        return True
+    if _MEMORY_CUES.search(text):
+        return False
+    # Mentions were already resolved to "@Name"; they are not content
+    words = [
+        w for w in re.findall(r"[\w@]+", text.lower())
+        if not w.startswith("@") and not _LAUGHTER.match(w)
+    ]
+    meaningful = [w for w in words if w not in _FILLER_WORDS]
+    return len(meaningful) < 3
+
+
+def cluster_pairs(pairs) -> List[List[int]]:
+    """Connected components (union-find) of the similar pairs; only clusters of 2+ ids."""
+    parent: Dict[int, int] = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    clusters: Dict[int, List[int]] = {}
+    for x in parent:
+        clusters.setdefault(find(x), []).append(x)
+    return [sorted(ids) for _, ids in sorted(clusters.items()) if len(ids) > 1]
+
+
 class MemoryManager:
-    def __init__(self, db, chat_handler):
+    def __init__(self, db, chat_handler, gateway=None):
         self.db = db
         self.chat_handler = chat_handler
-        self.model_name = "models/text-embedding-004" # Standard efficient embedding model
+        self.gateway = gateway
+        self.model_name = GEMINI_EMBEDDING_MODEL # Standard efficient embedding model
+        self.memory_model_name = "gemini-2.5-flash"
+        self.embeddings = EmbeddingCache(db, self.model_name, gateway)
 
+        # Without pgvector, semantic recall runs on an in-process index (needs numpy);
+        # without either, embeddings would be computed for nothing
+        has_vector = getattr(db, "has_vector", True)
+        self.vector_index = LocalVectorIndex(db) if not has_vector and LocalVectorIndex.available() else None
+        self.use_embeddings = bool(has_vector) or self.vector_index is not None
 
+        # Context caches. Writers call the invalidate_* methods; the TTL only
+        # bounds staleness for writes that bypass them.
+        self.context_ttl = 600
+        self._server_contexts: Dict[int, tuple] = {}  # guild_id -> (expires_at, ctx)
+        self._profiles: Dict[tuple, tuple] = {}  # (guild_id, user_id) -> (expires_at, profile)
 
-    def _format_user_stats(self, user_display_name, user_profile, is_author=True):
-        """Helper to format stats for a user."""
-        parts = []
+        # Optional reuse of answers to near-identical questions; every invalidate_*
+        # below (and every memory write) also drops the guild's cached answers
+        self.answers = (
+            SemanticAnswerCache(CHAT_ANSWER_CACHE_THRESHOLD, CHAT_ANSWER_CACHE_TTL)
+            if CHAT_ANSWER_CACHE else None
+        )
+
+        # (guild_id, user_id) -> recent (user_content, bot_response) turns awaiting extraction
+        self._pending_turns: "OrderedDict[tuple, deque]" = OrderedDict()
+
+
+
+    def _user_parts(self, user_display_name, user_profile, is_author=True) -> List[PromptPart]:
+        """Profile lines of a user, scored for the prompt budget (mentioned users rank lower)."""
         if is_author:
-            parts.append(f"\nSobre o Usuário {user_display_name}:")
+            section = f"\nSobre o Usuário {user_display_name}:"
         else:
-            parts.append(f"\nSobre o Usuário Mencionado {user_display_name}:")
+            section = f"\nSobre o Usuário Mencionado {user_display_name}:"
+        weight = 1.0 if is_author else 0.8
+        parts = []
+
+        def add(text, score):
+            parts.append(PromptPart(text, score * weight, section))
 
         if user_profile:
-             if user_profile.get('nickname_preference'): parts.append(f"- Prefere ser chamado de: {user_profile['nickname_preference']}")
+             if user_profile.get('nickname_preference'): add(f"- Prefere ser chamado de: {user_profile['nickname_preference']}", 0.95)
              # Only show tone preference for author, usually relevant for response style
-             if is_author and user_profile.get('tone_preference'): parts.append(f"- Preferência de resposta: {user_profile['tone_preference']}")
-             if user_profile.get('interaction_summary'): parts.append(f"- Histórico: {user_profile['interaction_summary']}")
+             if is_author and user_profile.get('tone_preference'): add(f"- Preferência de resposta: {user_profile['tone_preference']}", 0.9)
+             if user_profile.get('interaction_summary'): add(f"- Histórico: {user_profile['interaction_summary']}", 0.7)
              
              # Computed Stats (Deterministic Context)
              comp_stats_raw = user_profile.get('computed_stats')
@@ -47,83 +154,242 @@ class MemoryManager:
                         if stats.get('total_voice_hours'): facts.append(f"Acumulou {stats['total_voice_hours']} horas de voz recentemente.")
                         
                         if facts:
-                            parts.append("- Fatos Recentes (Estatísticas): " + " ".join(facts))
+                            add("- Fatos Recentes (Estatísticas): " + " ".join(facts), 0.5)
                  except Exception as e:
                      logger.warning(f"Error parsing computed_stats: {e}")
 
         else:
-             parts.append("- (Novo usuário ou sem perfil)")
+             add("- (Novo usuário ou sem perfil)", 0.3)
         
         return parts
 
-    async def get_relevant_context(self, guild, user, message_content: str, mentions=None) -> str:
-        """
-        Gathers all layers of context (Global, User, Long-term) and constructs the context block.
-        """
-        guild_id = guild.id
-        user_id = user.id
-
-        # 1. Fetch Global Context
+    async def get_server_context(self, guild_id: int) -> Dict[str, Any]:
+        now = time.monotonic()
+        cached = self._server_contexts.get(guild_id)
+        if cached and cached[0] > now:
+            return cached[1]
         server_ctx = await self.db.get_server_context(guild_id)
-        
-        # 2. Fetch User Profile
-        user_profile = await self.db.get_user_bot_profile(user_id, guild_id)
-        
-        # 3. Fetch Relevant Memories (Vector Search)
-        relevant_memories = []
+        self._server_contexts[guild_id] = (now + self.context_ttl, server_ctx)
+        return server_ctx
+
+    async def get_user_profile(self, user_id: int, guild_id: int) -> Dict[str, Any]:
+        """Profile with computed_stats already parsed into a dict."""
+        key = (guild_id, user_id)
+        now = time.monotonic()
+        cached = self._profiles.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        profile = await self.db.get_user_bot_profile(user_id, guild_id)
+        comp_stats_raw = profile.get('computed_stats')
+        if isinstance(comp_stats_raw, str):
+            try:
+                profile['computed_stats'] = json.loads(comp_stats_raw)
+            except Exception as e:
+                logger.warning(f"Error parsing computed_stats: {e}")
+                profile['computed_stats'] = None
+
+        self._profiles[key] = (now + self.context_ttl, profile)
+        self._prune_profiles(now)
+        return profile
+
+    def invalidate_server_context(self, guild_id: int):
+        self._server_contexts.pop(guild_id, None)
+        self.invalidate_answers(guild_id)
+
+    def invalidate_profile(self, user_id: int, guild_id: int):
+        self._profiles.pop((guild_id, user_id), None)
+        self.invalidate_answers(guild_id)
+
+    def invalidate_guild_profiles(self, guild_id: int):
+        for key in [k for k in self._profiles if k[0] == guild_id]:
+            del self._profiles[key]
+        self.invalidate_answers(guild_id)
+
+    def invalidate_answers(self, guild_id: Optional[int] = None):
+        if self.answers:
+            self.answers.invalidate(guild_id)
+
+    @staticmethod
+    def _answer_cacheable(question: str, mentions) -> bool:
+        # Follow-ups ("e depois?") depend on the history, questions about other
+        # members on their profiles and first-person ones on the asker's memories
+        return (
+            not is_trivial_turn(question)
+            and not _FIRST_PERSON.search(question)
+            and not any(not m.bot for m in (mentions or []))
+        )
+
+    def _asker_names(self, guild_id: int, asker) -> List[str]:
+        """Every name the answer may use for the asker (Discord names and preferred nickname)."""
+        names = [getattr(asker, "display_name", None), getattr(asker, "name", None)]
+        cached = self._profiles.get((guild_id, getattr(asker, "id", None)))
+        if cached and cached[1]:
+            names.append(cached[1].get("nickname_preference"))
+        return [n for n in names if isinstance(n, str) and len(n) > 1]
+
+    async def get_cached_answer(self, guild_id: int, question: str, mentions=None) -> Optional[str]:
+        """Cached answer to a near-identical question in this guild, or None."""
+        if not self.answers or not self._answer_cacheable(question, mentions):
+            return None
+        embedding = await self._generate_embedding(question)
+        return self.answers.lookup(guild_id, embedding) if embedding else None
+
+    async def cache_answer(self, guild_id: int, question: str, answer: str, asker=None, mentions=None):
+        if not self.answers or not self._answer_cacheable(question, mentions):
+            return
+        lowered = answer.lower()
+        if asker and any(name.lower() in lowered for name in self._asker_names(guild_id, asker)):
+            return  # Addressed to the asker: not reusable by other members
+        # Already in the embedding LRU: computed by get_cached_answer
+        embedding = await self._generate_embedding(question)
+        if embedding:
+            self.answers.store(guild_id, embedding, answer)
+
+    def _prune_profiles(self, now: float):
+        for key in [k for k, (expires, _) in self._profiles.items() if expires <= now]:
+            del self._profiles[key]
+
+    async def _fetch_memories(self, guild_id: int, user_id: int, message_content: str) -> List[Dict[str, Any]]:
         try:
+            if not self.use_embeddings:
+                return await self.db.search_memories(guild_id, None, user_id, limit=3)
             # Generate embedding for the current query
             embedding = await self._generate_embedding(message_content)
             if embedding:
-                relevant_memories = await self.db.search_memories(guild_id, embedding, user_id, limit=3)
+                if self.vector_index:
+                    return await self.vector_index.search(guild_id, embedding, user_id, limit=3)
+                return await self.db.search_memories(guild_id, embedding, user_id, limit=3)
         except Exception as e:
             logger.error(f"Error fetching memories: {e}")
+        return []
+
+    async def _fetch_mentioned_profile(self, mentioned_user, guild_id: int):
+        try:
+            return await self.get_user_profile(mentioned_user.id, guild_id)
+        except Exception as e:
+            logger.error(f"Error fetching profile for mentioned user {mentioned_user.id}: {e}")
+            return None
+
+    async def get_relevant_context(self, guild, user, message_content: str, mentions=None) -> str:
+        """
+        Gathers all layers of context (Global, User, Long-term) and constructs the context block.
+        """
+        return render(await self.get_context_parts(guild, user, message_content, mentions))
+
+    async def get_context_parts(self, guild, user, message_content: str, mentions=None) -> List[PromptPart]:
+        """
+        Same context as get_relevant_context, as scored lines so a PromptAssembler
+        can drop the least useful ones when the prompt budget is tight.
+        """
+        guild_id = guild.id
+        user_id = user.id
+
+        mentioned = [
+            m for m in (mentions or [])
+            if m.id != user.id and not m.bot
+        ]
+
+        # 1-3. Global context, author profile, memories (vector search) and
+        # mentioned profiles are independent lookups, so fetch them concurrently
+        server_ctx, user_profile, relevant_memories, *mentioned_profiles = await asyncio.gather(
+            self.get_server_context(guild_id),
+            self.get_user_profile(user_id, guild_id),
+            self._fetch_memories(guild_id, user_id, message_content),
+            *(self._fetch_mentioned_profile(m, guild_id) for m in mentioned)
+        )
 
         # 4. Construct the Text Block
         context_parts = []
         
         # Server Block
-        context_parts.append(f"Contexto do Servidor '{guild.name}':")
+        section = f"Contexto do Servidor '{guild.name}':"
         if server_ctx:
-            if server_ctx.get('theme'): context_parts.append(f"- Tema: {server_ctx['theme']}")
-            if server_ctx.get('rules'): context_parts.append(f"- Regras: {server_ctx['rules']}")
-            if server_ctx.get('tone'): context_parts.append(f"- Tom Desejado: {server_ctx['tone']}")
-            if server_ctx.get('extras'): context_parts.append(f"- Extras: {server_ctx['extras']}")
+            if server_ctx.get('theme'): context_parts.append(PromptPart(f"- Tema: {server_ctx['theme']}", 1.0, section))
+            if server_ctx.get('rules'): context_parts.append(PromptPart(f"- Regras: {server_ctx['rules']}", 0.9, section))
+            if server_ctx.get('tone'): context_parts.append(PromptPart(f"- Tom Desejado: {server_ctx['tone']}", 1.0, section))
+            if server_ctx.get('extras'): context_parts.append(PromptPart(f"- Extras: {server_ctx['extras']}", 0.6, section))
         else:
-            context_parts.append("- (Nenhum contexto global definido ainda)")
+            context_parts.append(PromptPart("- (Nenhum contexto global definido ainda)", 0.3, section))
 
         # User Block (Author)
-        context_parts.extend(self._format_user_stats(user.display_name, user_profile, is_author=True))
+        context_parts.extend(self._user_parts(user.display_name, user_profile, is_author=True))
 
         # Mentioned Users Block
-        if mentions:
-            for mentioned_user in mentions:
-                if mentioned_user.id != user.id and not mentioned_user.bot:
-                    try:
-                        m_profile = await self.db.get_user_bot_profile(mentioned_user.id, guild_id)
-                        context_parts.extend(self._format_user_stats(mentioned_user.display_name, m_profile, is_author=False))
-                    except Exception as e:
-                        logger.error(f"Error fetching profile for mentioned user {mentioned_user.id}: {e}")
-
-        # Memories Block
-        if relevant_memories:
-            context_parts.append(f"\nMemórias Relevantes (Fatos/Decisões Passadas):")
-            for mem in relevant_memories:
-                similarity = f" ({mem.get('similarity', 0):.2f})" if 'similarity' in mem else ""
-                context_parts.append(f"- {mem['content']}{similarity}")
-
-        return "\n".join(context_parts)
-
-    async def process_message_for_memory(self, guild_id: int, user_id: int, user_content: str, bot_response: str):
+        for mentioned_user, m_profile in zip(mentioned, mentioned_profiles):
+            if m_profile is not None:
+                context_parts.extend(self._user_parts(mentioned_user.display_name, m_profile, is_author=False))
+
+        # Memories Block: the closer to the message, the more a memory is worth
+        section = "\nMemórias Relevantes (Fatos/Decisões Passadas):"
+        for mem in relevant_memories or []:
+            if 'similarity' in mem:
+                similarity = mem.get('similarity') or 0
+                score = 0.4 + 0.5 * max(0.0, min(1.0, similarity))
+                context_parts.append(PromptPart(f"- {mem['content']} ({similarity:.2f})", score, section))
+            else:
+                context_parts.append(PromptPart(f"- {mem['content']}", 0.6, section))
+
+        return context_parts
+
+    def queue_turn(self, guild_id: int, user_id: int, user_content: str, bot_response: str):
+        """
+        Queues a conversation turn for the next batched memory extraction.
+        Obviously trivial turns (greetings, laughter, one-word replies) are dropped here.
+        """
+        if is_trivial_turn(user_content):
+            return
+        key = (guild_id, user_id)
+        turns = self._pending_turns.get(key)
+        if turns is None:
+            turns = self._pending_turns[key] = deque(maxlen=MAX_TURNS_PER_USER)
+        turns.append((user_content[:MAX_TURN_CHARS], bot_response[:MAX_TURN_CHARS]))
+
+        while len(self._pending_turns) > MAX_PENDING_USERS:
+            self._pending_turns.popitem(last=False)
+
+    async def flush_memory_batch(self):
         """
-        Background task: Analyzes the conversation turn to see if new memories or profile updates are needed.
+        Background task: sends the queued turns, EXTRACTION_BATCH_SIZE at a time, through
+        one extraction call each and applies the returned memory/profile updates.
         """
-        prompt = f"""
-        Analise a seguinte interação entre um usuário e o bot.
-        Usuário: {user_content}
-        Bot: {bot_response}
+        while self._pending_turns:
+            batch = []
+            while self._pending_turns and len(batch) < EXTRACTION_BATCH_SIZE:
+                (guild_id, user_id), turns = next(iter(self._pending_turns.items()))
+                batch.append((guild_id, user_id, *turns.popleft()))
+                if not turns:
+                    del self._pending_turns[(guild_id, user_id)]
+
+            try:
+                # Separate call from the chat (no history), on the gateway's memory lane
+                # so it never competes with moderation or chat replies
+                response = await self.gateway.generate(
+                    Lane.MEMORY, self.memory_model_name, self._build_extraction_prompt(batch)
+                )
+                data = self._parse_json_response(response.text)
+            except Exception as e:
+                logger.error(f"Error processing memory: {e}")
+                continue
+
+            items = data.get("itens", []) if isinstance(data, dict) else []
+            await asyncio.gather(*(
+                self._apply_extraction(batch[item["turno"] - 1], item)
+                for item in items
+                if isinstance(item, dict) and isinstance(item.get("turno"), int)
+                and 1 <= item["turno"] <= len(batch)
+            ))
 
-        IDENTIFIQUE se há alguma informação nova e PERMANENTE que deve ser salva em memória de longo prazo ou no perfil do usuário.
+    @staticmethod
+    def _build_extraction_prompt(batch) -> str:
+        turns = "\n".join(
+            f"[{n}] Usuário: {user_content}\n    Bot: {bot_response}"
+            for n, (_, _, user_content, bot_response) in enumerate(batch, 1)
+        )
+        return f"""
+        Analise as interações numeradas abaixo entre usuários e o bot.
+
+        IDENTIFIQUE, em cada uma, se há alguma informação nova e PERMANENTE que deve ser salva em memória de longo prazo ou no perfil do usuário.
         
         Critérios:
         1. Fatos sobre o usuário (nome, gosto, profissão, jogo favorito).
@@ -132,63 +398,129 @@ class MemoryManager:
         4. NÃO salve cumprimentos, piadas banais ou conversa fiada.
         5. NÃO salve informações sensíveis (senhas, documentos).
 
-        Retorne APENAS um JSON:
+        INTERAÇÕES:
+        {turns}
+
+        Retorne APENAS um JSON, incluindo em "itens" somente as interações com algo a salvar:
         {{
-            "save_memory": boolean,
-            "memory_content": "texto resumido do fato",
-            "is_user_profile_update": boolean,
-            "profile_update": {{ "key": "value" }} (keys permitidas: nickname_preference, tone_preference)
+            "itens": [
+                {{
+                    "turno": número da interação,
+                    "save_memory": boolean,
+                    "memory_content": "texto resumido do fato",
+                    "is_user_profile_update": boolean,
+                    "profile_update": {{ "key": "value" }} (keys permitidas: nickname_preference, tone_preference)
+                }}
+            ]
         }}
         """
 
+    async def _apply_extraction(self, turn, data: Dict):
+        guild_id, user_id = turn[0], turn[1]
         try:
-            # Reusing the existing chat handler's initialized model logic if possible, 
-            # but ideally we want a separate call. Using the main 'generate_response' might be messy due to history.
-            # We will use the underlying model directly if exposed, or call generic generate.
-            # Assuming ChatHandler exposes the model or method.
-            
-            # Use a specific version for stability
-            model = genai.GenerativeModel('gemini-2.5-flash') 
-            response = await model.generate_content_async(prompt)
-            data = self._parse_json_response(response.text)
-
-            if data and data.get("save_memory"):
-                content = data["memory_content"]
-                
-                # Check privacy
-                if not content: return 
-
-                # Generate embedding
-                embedding = await self._generate_embedding(content)
-                
-                # Store
-                is_profile = data.get("is_user_profile_update")
-                if is_profile:
-                    updates = data.get("profile_update", {})
-                    if updates:
-                        await self.db.update_user_bot_profile(user_id, guild_id, updates)
-                        logger.info(f"Updated profile for user {user_id}")
-                else:
-                    # General memory
-                    await self.db.store_memory(guild_id, content, embedding, user_id)
-                    logger.info(f"Stored new memory for user {user_id}: {content}")
+            if not data.get("save_memory"):
+                return
+            content = data.get("memory_content")
 
+            # Check privacy
+            if not content: return
+
+            if data.get("is_user_profile_update"):
+                updates = data.get("profile_update", {})
+                if updates:
+                    await self.db.update_user_bot_profile(user_id, guild_id, updates)
+                    self.invalidate_profile(user_id, guild_id)
+                    logger.info(f"Updated profile for user {user_id}")
+            else:
+                # General memory (embeddings of the batch share one embed call)
+                embedding = await self._generate_embedding(content) if self.use_embeddings else None
+                merged = await self.db.store_memory(guild_id, content, embedding, user_id)
+                self.invalidate_answers(guild_id)
+                if self.vector_index:
+                    if merged:
+                        self.vector_index.invalidate(guild_id)
+                    elif embedding:
+                        self.vector_index.add(guild_id, user_id, content, embedding)
+                logger.info(f"{'Merged' if merged else 'Stored new'} memory for user {user_id}: {content}")
         except Exception as e:
             logger.error(f"Error processing memory: {e}")
 
+    async def compact_memories(self, min_age_days: int = MEMORY_COMPACTION_MIN_AGE_DAYS,
+                               threshold: float = MEMORY_COMPACTION_THRESHOLD, min_memories: int = 5) -> int:
+        """
+        Background task: merges clusters of similar old memories of each user into one
+        summarized memory, then applies the per-user/per-guild caps.
+        Returns how many rows were removed in total.
+        """
+        removed = 0
+        if self.db.has_vector:
+            for owner in await self.db.get_memory_compaction_candidates(min_memories, min_age_days):
+                guild_id, user_id = owner["guild_id"], owner["user_id"]
+                try:
+                    removed += await self._compact_user(guild_id, user_id, min_age_days, threshold)
+                except Exception as e:
+                    logger.error(f"Error compacting memories of user {user_id}: {e}")
+        capped = await self.db.cap_memories()
+        if capped and self.vector_index:
+            self.vector_index.invalidate()
+        if removed or capped:
+            self.invalidate_answers()
+        removed += capped
+        return removed
+
+    async def _compact_user(self, guild_id: int, user_id: int, min_age_days: int, threshold: float) -> int:
+        memories = {m["id"]: m for m in await self.db.get_old_memories(guild_id, user_id, min_age_days)}
+        pairs = await self.db.get_similar_memory_pairs(list(memories), threshold)
+        # Only the newest facts of a large cluster fit in the prompt (ids grow with time);
+        # older ones stay as they are and are only replaced once they get listed
+        clusters = [cluster[-MAX_CLUSTER_FACTS:] for cluster in cluster_pairs(pairs)]
+        if not clusters:
+            return 0
+
+        groups = [[memories[i]["content"] for i in cluster] for cluster in clusters]
+        response = await self.gateway.generate(
+            Lane.MEMORY, self.memory_model_name, self._build_summary_prompt(groups)
+        )
+        data = self._parse_json_response(response.text)
+        summaries = {
+            item.get("grupo"): item.get("texto")
+            for item in (data.get("resumos", []) if isinstance(data, dict) else [])
+            if isinstance(item, dict)
+        }
+
+        removed = 0
+        for n, cluster in enumerate(clusters, 1):
+            summary = summaries.get(n)
+            if not summary:
+                continue
+            embedding = await self._generate_embedding(summary)
+            await self.db.replace_memories(guild_id, user_id, cluster, summary, embedding)
+            removed += len(cluster) - 1
+        if removed:
+            logger.info(f"Compacted {removed} memories of user {user_id} in guild {guild_id}")
+        return removed
+
+    @staticmethod
+    def _build_summary_prompt(groups: List[List[str]]) -> str:
+        listing = "\n".join(
+            f"[{n}]\n" + "\n".join(f"- {fact}" for fact in facts)
+            for n, facts in enumerate(groups, 1)
+        )
+        return f"""
+        Cada grupo numerado abaixo reúne memórias parecidas sobre o mesmo usuário.
+        Resuma cada grupo em UM fato curto, sem perder informação relevante.
+        Se os fatos se contradizem, mantenha o mais recente (o último da lista).
+
+        GRUPOS:
+        {listing}
+
+        Retorne APENAS um JSON:
+        {{ "resumos": [ {{ "grupo": número do grupo, "texto": "fato resumido" }} ] }}
+        """
+
     async def _generate_embedding(self, text: str) -> Optional[List[float]]:
-        try:
-            # We use embed_content from genai wrapped in asyncio.to_thread to prevent blocking the event loop
-            result = await asyncio.to_thread(
-                genai.embed_content,
-                model=self.model_name,
-                content=text,
-                task_type="retrieval_document"
-            )
-            return result['embedding']
-        except Exception as e:
-            logger.error(f"Embedding error: {e}")
-            return None
+        # Cached by content hash; concurrent misses share one batched API call
+        return await self.embeddings.embed(text)
 
     def _parse_json_response(self, text: str) -> Dict:
         """Helper to safely parse JSON from LLM response which might contain backticks."""
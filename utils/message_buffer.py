@@ -0,0 +1,128 @@
+# utils/message_buffer.py - Buffer em memória das mensagens recentes por canal
+
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional
+
+
+class _ChannelBuffer:
+    __slots__ = ("entries", "chars", "complete", "last_seen")
+
+    def __init__(self, size: int):
+        # Cada entrada: (message_id, role, conteúdo já com menções resolvidas)
+        self.entries: deque = deque(maxlen=size)
+        self.chars = 0
+        # True quando o buffer contém tudo desde a janela buscada via REST
+        self.complete = False
+        self.last_seen = time.monotonic()
+
+
+class RecentMessageBuffer:
+    """Ring buffer das últimas mensagens de cada canal, no formato do histórico do chat.
+
+    Alimentado pelo on_message, evita o `channel.history()` nas respostas por
+    menção. Um canal só é servido pelo buffer quando ele cobre a janela pedida:
+    depois de um restart, a primeira resposta busca via REST e semeia o buffer.
+    Cada canal guarda no máximo `per_channel` mensagens e `max_chars`
+    caracteres; canais ociosos por `idle_ttl` segundos (ou além de
+    `max_channels`) são descartados.
+    """
+
+    def __init__(self, per_channel: int = 10, max_chars: int = 8000,
+                 max_channels: int = 500, idle_ttl: float = 3600.0):
+        self.per_channel = per_channel
+        self.max_chars = max_chars
+        self.max_channels = max_channels
+        self.idle_ttl = idle_ttl
+        # Ordenado por atividade (mais recente no fim)
+        self._channels: "OrderedDict[int, _ChannelBuffer]" = OrderedDict()
+        # Texto final de mensagens editadas antes de o on_message registrá-las
+        self._updates: "OrderedDict[int, str]" = OrderedDict()
+
+    def record(self, channel_id: int, message_id: int, role: str, content: str):
+        """Adiciona uma mensagem ao buffer do canal."""
+        content = self._updates.pop(message_id, content)
+        if not content:
+            return
+        buffer = self._touch(channel_id)
+        if len(buffer.entries) == buffer.entries.maxlen:
+            buffer.chars -= len(buffer.entries[0][2])
+        buffer.entries.append((message_id, role, content))
+        buffer.chars += len(content)
+        while buffer.chars > self.max_chars and len(buffer.entries) > 1:
+            buffer.chars -= len(buffer.entries.popleft()[2])
+
+    def seed(self, channel_id: int, messages: Iterable[tuple]):
+        """Semeia o canal com o histórico buscado via REST (ordem cronológica).
+
+        Mensagens já registradas pelo on_message são mescladas pelo ID.
+        """
+        buffer = self._touch(channel_id)
+        merged = {entry[0]: entry for entry in messages}
+        merged.update((entry[0], entry) for entry in buffer.entries)
+        buffer.entries.clear()
+        buffer.chars = 0
+        for message_id in sorted(merged):
+            self.record(channel_id, *merged[message_id])
+        buffer.complete = True
+
+    def get_history(self, channel_id: int, before_id: int, limit: int = 10) -> Optional[List[Dict]]:
+        """Histórico anterior a `before_id` no formato do ChatHandler, ou None se o
+        buffer não cobre a janela (o chamador deve buscar via REST)."""
+        buffer = self._channels.get(channel_id)
+        if buffer is None:
+            return None
+        entries = [entry for entry in buffer.entries if entry[0] < before_id]
+        if not buffer.complete and len(entries) < limit:
+            return None
+        return [
+            {"role": role, "parts": [content]}
+            for _, role, content in entries[-limit:]
+        ]
+
+    def update(self, channel_id: int, message_id: int, content: str):
+        """Troca o conteúdo de uma mensagem editada (ex.: resposta em streaming finalizada).
+
+        Se a mensagem ainda não foi registrada, o texto fica guardado para o record().
+        """
+        buffer = self._channels.get(channel_id)
+        for i, entry in enumerate(buffer.entries if buffer else ()):
+            if entry[0] == message_id:
+                buffer.entries[i] = (message_id, entry[1], content)
+                buffer.chars += len(content) - len(entry[2])
+                while buffer.chars > self.max_chars and len(buffer.entries) > 1:
+                    buffer.chars -= len(buffer.entries.popleft()[2])
+                return
+        self._updates[message_id] = content
+        while len(self._updates) > self.per_channel * 10:
+            self._updates.popitem(last=False)
+
+    def discard(self, channel_id: int, message_ids: Iterable[int]):
+        """Remove mensagens apagadas do buffer."""
+        buffer = self._channels.get(channel_id)
+        if buffer is None:
+            return
+        ids = set(message_ids)
+        kept = [entry for entry in buffer.entries if entry[0] not in ids]
+        if len(kept) != len(buffer.entries):
+            buffer.entries.clear()
+            buffer.entries.extend(kept)
+            buffer.chars = sum(len(entry[2]) for entry in kept)
+
+    def _touch(self, channel_id: int) -> _ChannelBuffer:
+        now = time.monotonic()
+        buffer = self._channels.get(channel_id)
+        if buffer is None:
+            buffer = self._channels[channel_id] = _ChannelBuffer(self.per_channel)
+        else:
+            self._channels.move_to_end(channel_id)
+        buffer.last_seen = now
+        self._evict(now)
+        return buffer
+
+    def _evict(self, now: float):
+        while self._channels:
+            channel_id, oldest = next(iter(self._channels.items()))
+            if len(self._channels) <= self.max_channels and now - oldest.last_seen < self.idle_ttl:
+                break
+            del self._channels[channel_id]
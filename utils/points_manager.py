@@ -3,6 +3,7 @@ from typing import List
 import logging
 from database import Database
 from datetime import datetime
+from utils.command_cache import POINTS_COMMANDS
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +15,14 @@ class PointsManager:
         # Depreciado para cálculo de pontos, mantido se necessário para legacy analytics
         self.voice_sessions = {}
         self.activity_sessions = {}
+        # Optional UserStatsService / CommandCache; invalidated whenever points change
+        self.user_stats = None
+        self.command_cache = None
+        # Optional DailyCounterStore; kept in step with every award (daily caps)
+        self.daily_counters = None
+        # Optional VoiceSessionRegistry; reconciled with the DB once per process
+        self.session_registry = None
+        self._sessions_recovered = False
 
     async def add_points(self, user_id: int, points: int, interaction_type: str, guild_id: int, username: str = "Unknown", discriminator: str = "0000", is_bot: bool = False):
         """Adds points to a user for a specific interaction type."""
@@ -25,6 +34,9 @@ class PointsManager:
             await self.db.upsert_user(user_id, username, discriminator, is_bot)
             
             await self.db.add_interaction_point(user_id, points, interaction_type, guild_id)
+            self._invalidate_caches(user_id, guild_id)
+            if self.daily_counters:
+                self.daily_counters.add(guild_id, user_id, interaction_type, points)
             
             # --- SNAPSHOT DAILY TOTALS ---
             # Fetch updated total
@@ -47,10 +59,32 @@ class PointsManager:
             # Para simplificar, adicionar pontos negativos é uma forma de remover
             # Assumindo que o DB suporta incrementos negativos ou criar método específico no DB se precisar
             await self.db.add_interaction_point(user_id, -points, "penalty", guild_id) 
+            self._invalidate_caches(user_id, guild_id)
             logger.info(f"Removed {points} points from user {user_id}. Reason: {reason}")
         except Exception as e:
             logger.error(f"Error removing points for user {user_id}: {e}")
 
+    async def remove_points_batch(self, penalties: List[tuple], reason: str = None):
+        """Removes points from several users in one write. penalties: (user_id, guild_id, points)."""
+        if not penalties:
+            return
+        try:
+            await self.db.add_interaction_points_batch(
+                [(user_id, guild_id, -points) for user_id, guild_id, points in penalties], "penalty"
+            )
+            for user_id, guild_id, _ in penalties:
+                self._invalidate_caches(user_id, guild_id)
+            logger.info(f"Removed points from {len(penalties)} message author(s). Reason: {reason}")
+        except Exception as e:
+            logger.error(f"Error removing points in batch: {e}")
+
+    def _invalidate_caches(self, user_id: int, guild_id: int):
+        """Drops cached stats that depend on this user's points."""
+        if self.user_stats:
+            self.user_stats.invalidate(user_id, guild_id)
+        if self.command_cache:
+            self.command_cache.invalidate(guild_id, POINTS_COMMANDS)
+
     async def process_voice_points(self, guilds: List[discord.Guild]):
         """
         Processa periodicamente pontos de voz, streaming e atividades.
@@ -290,6 +324,17 @@ class PointsManager:
         # Legacy stub
         pass
 
-    async def recover_sessions(self):
-         # Legacy stub
-         pass
+    async def recover_sessions(self, guilds=()):
+        """Closes voice sessions left open by a crash and reopens them for members in voice.
+
+        Runs once per process: on_ready also fires on gateway reconnects, and
+        reconciling then would close and reopen sessions that are still live.
+        """
+        if not self.session_registry or self._sessions_recovered:
+            return
+        try:
+            closed, opened = await self.session_registry.reconcile(guilds)
+            self._sessions_recovered = True
+            logger.info(f"🎤 Voice sessions reconciled: {closed} stale closed, {opened} reopened")
+        except Exception as e:
+            logger.error(f"Error recovering voice sessions: {e}")
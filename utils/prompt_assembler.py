@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import CHAT_PROMPT_TOKEN_BUDGET
+from utils.llm_gateway import estimate_tokens
+
+# Scores of the history messages: the newest gets HISTORY_WEIGHT and each older
+# one is worth HISTORY_DECAY times the next (10th most recent ≈ 0.21)
+HISTORY_WEIGHT = 0.9
+HISTORY_DECAY = 0.85
+
+
+@dataclass
+class PromptPart:
+    """One line of the context block, ranked by `score` (0-1) when the budget is tight."""
+    text: str
+    score: float
+    section: str = ""  # Header printed before the first kept line of its section
+
+
+def render(parts: Sequence[PromptPart]) -> str:
+    """Joins the parts in their given order, printing each section header once."""
+    lines, section = [], None
+    for part in parts:
+        if part.section and part.section != section:
+            lines.append(part.section)
+        section = part.section
+        lines.append(part.text)
+    return "\n".join(lines)
+
+
+def truncate(text: str, max_tokens: int, keep_tail: bool = False) -> str:
+    """Cuts `text` to about `max_tokens`; keep_tail keeps its end too (where questions usually are)."""
+    limit = max_tokens * 4
+    if len(text) <= limit:
+        return text
+    if not keep_tail:
+        return text[:limit].rstrip() + " […]"
+    head = limit * 2 // 3
+    return text[:head].rstrip() + " […] " + text[-(limit - head):].lstrip()
+
+
+class PromptAssembler:
+    """
+    Fits a chat turn into a token budget.
+
+    The context block (server, profiles, memories) and the recent history are
+    all candidates ranked by score: context parts carry their own score (memory
+    similarity, how useful a profile fact is) and history messages decay with
+    age. Parts are taken greedily from the best down while they fit, then put
+    back in their original order. History is always a contiguous run of the
+    most recent messages, so the model never sees a gap in the conversation.
+    """
+
+    def __init__(self, budget: int = CHAT_PROMPT_TOKEN_BUDGET, part_max_tokens: int = 300,
+                 prompt_max_tokens: int = 1000):
+        self.budget = budget
+        self.part_max_tokens = part_max_tokens
+        self.prompt_max_tokens = prompt_max_tokens
+
+    def fit_prompt(self, prompt: str) -> str:
+        return truncate(prompt, self.prompt_max_tokens, keep_tail=True)
+
+    def assemble(self, history: Optional[List[Dict]], parts: Sequence[PromptPart],
+                 reserved: int = 0) -> Tuple[List[Dict], str]:
+        """
+        Chooses what fits in `budget - reserved` tokens (reserved covers the
+        prompt and the fixed instructions). Returns (history, context_block).
+        """
+        history = history or []
+        parts = [
+            PromptPart(truncate(p.text, self.part_max_tokens), p.score, p.section) for p in parts
+        ]
+        messages = [
+            {**msg, "parts": [truncate(str(text), self.part_max_tokens) for text in msg.get("parts", [])]}
+            for msg in history
+        ]
+
+        # (score, order, kind, index): on equal scores, context wins over history
+        candidates = [(p.score, 0, i, "part") for i, p in enumerate(parts)]
+        newest = len(messages) - 1
+        candidates += [
+            (HISTORY_WEIGHT * HISTORY_DECAY ** (newest - i), 1, i, "history")
+            for i in range(len(messages))
+        ]
+        candidates.sort(key=lambda c: (-c[0], c[1], -c[2] if c[3] == "history" else c[2]))
+
+        remaining = self.budget - reserved
+        kept_parts, sections = set(), set()
+        oldest_kept = len(messages)
+        for _, _, i, kind in candidates:
+            if kind == "history":
+                if i != oldest_kept - 1:
+                    continue  # An older message did not fit: keep the run contiguous
+                cost = estimate_tokens(*messages[i]["parts"])
+                if cost <= remaining:
+                    remaining -= cost
+                    oldest_kept = i
+                continue
+            part = parts[i]
+            cost = estimate_tokens(part.text)
+            if part.section and part.section not in sections:
+                cost += estimate_tokens(part.section)
+            if cost <= remaining:
+                remaining -= cost
+                kept_parts.add(i)
+                sections.add(part.section)
+
+        context = render([p for i, p in enumerate(parts) if i in kept_parts])
+        return messages[oldest_kept:], context
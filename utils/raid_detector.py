@@ -0,0 +1,216 @@
+import logging
+import random
+import time
+import zlib
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Set, Tuple
+
+from utils.spam_detector import normalize_content
+
+logger = logging.getLogger(__name__)
+
+# Assinatura MinHash: NUM_PERM permutações em BANDS faixas de NUM_PERM // BANDS linhas.
+# Com 16 faixas de 4 linhas, textos com Jaccard ≥ 0.7 viram candidatos em ~99% dos casos
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_SIZE = 5       # shingles de 5 caracteres do texto normalizado
+MIN_SHINGLES = 8       # textos mais curtos não são agrupados (vão direto à moderação)
+MAX_CHARS = 400        # só o começo de mensagens longas entra na assinatura
+MAX_CLUSTERS = 5000    # grupos guardados (aguardando veredito ou ativos)
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def minhash(text: str) -> Optional[Tuple[int, ...]]:
+    """Assinatura MinHash dos shingles do texto normalizado; None para textos curtos demais."""
+    normalized = normalize_content(text)[:MAX_CHARS]
+    shingles = {
+        zlib.crc32(normalized[i:i + SHINGLE_SIZE].encode())
+        for i in range(len(normalized) - SHINGLE_SIZE + 1)
+    }
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    return tuple(min((a * x + b) % _PRIME for x in shingles) for a, b in _PERMUTATIONS)
+
+
+def similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    """Estimativa de Jaccard: fração de posições iguais nas assinaturas."""
+    return sum(a == b for a, b in zip(sig_a, sig_b)) / NUM_PERM
+
+
+class _Cluster:
+    __slots__ = ("guild_id", "signature", "created_at", "representative", "keys", "members", "authors",
+                 "verdict", "raid_logged")
+
+    def __init__(self, guild_id, signature, created_at, representative, keys):
+        self.guild_id = guild_id
+        self.signature = signature
+        self.created_at = created_at
+        self.representative = representative
+        self.keys = keys
+        self.members: list = []          # absorvidas e ainda não entregues à moderação
+        self.authors = {representative.author.id}
+        self.verdict: Optional[bool] = None  # None = aguardando a moderação
+        self.raid_logged = False
+
+
+class RaidDetector:
+    """
+    Agrupa mensagens quase idênticas do fluxo ao vivo (shingles + MinHash + LSH).
+
+    A primeira mensagem de um grupo (o representante) segue para o buffer de
+    moderação; as parecidas que chegam dentro de `window` segundos no mesmo
+    servidor são absorvidas pelo grupo enquanto ele aguarda a moderação ou já foi
+    marcado como SIM, e recebem o veredito do representante sem chamada extra ao
+    modelo. Depois de um NÃO, cópias parecidas voltam a ser analisadas uma a uma
+    (senão bastaria acrescentar um insulto a uma mensagem aprovada). Grupos com
+    `raid_accounts` contas ou mais são registrados no log como possível raid.
+
+    Servidores com a moderação por IA desligada (set_guild_enabled) não são
+    agrupados. Se o limite de grupos estourar, um grupo ainda sem veredito sai do
+    LSH e as mensagens que ele absorveu voltam para o buffer (drain_released).
+
+    Fluxo: on_message chama observe(); o processador de moderação chama
+    take_members() e resolve() para cada representante analisado,
+    drain_flagged() para as cópias que chegaram depois de um veredito SIM e
+    drain_released() para as mensagens de grupos descartados.
+    """
+
+    def __init__(self, threshold: float = 0.6, window: float = 120, raid_accounts: int = 5):
+        self.threshold = threshold
+        self.window = window
+        self.raid_accounts = raid_accounts
+        self._rows = NUM_PERM // BANDS
+        # (guild_id, faixa, hash da faixa) -> grupo
+        self._buckets: Dict[Tuple[int, int, int], _Cluster] = {}
+        # id do representante -> grupo (ordem de criação)
+        self._clusters: "OrderedDict[int, _Cluster]" = OrderedDict()
+        self._expiry: Deque[Tuple[float, _Cluster, list]] = deque()
+        self._flagged: list = []
+        self._released: list = []
+        self.disabled_guilds: Set[int] = set()
+
+    def set_guild_enabled(self, guild_id: int, enabled: bool):
+        """Liga/desliga o agrupamento de um servidor (segue a moderação por IA)."""
+        if enabled:
+            self.disabled_guilds.discard(guild_id)
+        elif guild_id not in self.disabled_guilds:
+            self.disabled_guilds.add(guild_id)
+            # Sem moderação ninguém vai resolver estes grupos
+            for cluster in [c for c in self._clusters.values() if c.guild_id == guild_id]:
+                self._drop(cluster, release=False)
+
+    def _band_keys(self, guild_id: int, signature: Tuple[int, ...]) -> list:
+        rows = self._rows
+        return [
+            (guild_id, band, hash(signature[band * rows:(band + 1) * rows]))
+            for band in range(BANDS)
+        ]
+
+    def observe(self, message) -> bool:
+        """
+        Registra a mensagem. True se ela deve ir para o buffer de moderação
+        (mensagem única ou primeira do grupo); False se foi absorvida por um grupo.
+        """
+        if not message.guild or message.guild.id in self.disabled_guilds:
+            return True
+        now = time.monotonic()
+        self._expire(now)
+
+        signature = minhash(message.content or "")
+        if signature is None:
+            return True
+        keys = self._band_keys(message.guild.id, signature)
+
+        cluster = self._match(keys, signature)
+        if cluster is None:
+            cluster = _Cluster(message.guild.id, signature, now, message, keys)
+            self._clusters[message.id] = cluster
+            for key in keys:
+                self._buckets.setdefault(key, cluster)
+            self._expiry.append((now + self.window, cluster, keys))
+            while len(self._clusters) > MAX_CLUSTERS:
+                _, oldest = self._clusters.popitem(last=False)
+                self._drop(oldest, release=True)
+            return True
+
+        cluster.authors.add(message.author.id)
+        if len(cluster.authors) >= self.raid_accounts and not cluster.raid_logged:
+            cluster.raid_logged = True
+            logger.warning(
+                "🚨 Possível raid no servidor %s: %d contas enviando mensagens parecidas com %.80r",
+                cluster.guild_id, len(cluster.authors), cluster.representative.content,
+            )
+        if cluster.verdict is None:
+            cluster.members.append(message)
+        elif cluster.verdict:
+            self._flagged.append(message)
+        else:
+            return True  # Representante aprovado: a cópia (talvez alterada) é analisada sozinha
+        return False
+
+    def _match(self, keys: list, signature: Tuple[int, ...]) -> Optional[_Cluster]:
+        seen = set()
+        for key in keys:
+            cluster = self._buckets.get(key)
+            if cluster is None or id(cluster) in seen:
+                continue
+            seen.add(id(cluster))
+            if similarity(cluster.signature, signature) >= self.threshold:
+                return cluster
+        return None
+
+    def take_members(self, message) -> list:
+        """Mensagens absorvidas pelo grupo de `message` desde a última chamada."""
+        cluster = self._clusters.get(message.id)
+        if cluster is None:
+            return []
+        members, cluster.members = cluster.members, []
+        return members
+
+    def resolve(self, message, flagged: bool):
+        """Guarda o veredito do representante: cópias seguintes já chegam decididas."""
+        cluster = self._clusters.get(message.id)
+        if cluster is not None:
+            cluster.verdict = flagged
+            if time.monotonic() >= cluster.created_at + self.window:
+                del self._clusters[message.id]  # Já expirou do LSH: não recebe mais cópias
+
+    def drain_flagged(self) -> list:
+        """Cópias de grupos já marcados como SIM, para remover sem nova análise."""
+        flagged, self._flagged = self._flagged, []
+        return flagged
+
+    def discard(self, message):
+        """Representante descartado sem análise: o grupo sai do LSH e as cópias são liberadas."""
+        cluster = self._clusters.get(message.id)
+        if cluster is not None and cluster.representative is message:
+            self._drop(cluster, release=True)
+
+    def drain_released(self) -> list:
+        """Mensagens absorvidas por grupos descartados antes do veredito: voltam ao buffer."""
+        released, self._released = self._released, []
+        return released
+
+    def _drop(self, cluster: _Cluster, release: bool):
+        """Tira o grupo do LSH; as mensagens ainda sem veredito são liberadas se `release`."""
+        for key in cluster.keys:
+            if self._buckets.get(key) is cluster:
+                del self._buckets[key]
+        if self._clusters.get(cluster.representative.id) is cluster:
+            del self._clusters[cluster.representative.id]
+        if release and cluster.verdict is None:
+            self._released.extend(cluster.members)
+        cluster.members = []
+
+    def _expire(self, now: float):
+        while self._expiry and self._expiry[0][0] <= now:
+            _, cluster, keys = self._expiry.popleft()
+            for key in keys:
+                if self._buckets.get(key) is cluster:
+                    del self._buckets[key]
+            # Grupos já decididos saem; os que aguardam a moderação ficam até take_members
+            if cluster.verdict is not None:
+                self._clusters.pop(cluster.representative.id, None)
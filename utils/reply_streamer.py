@@ -0,0 +1,120 @@
+import logging
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+DISCORD_MESSAGE_LIMIT = 2000
+SENTENCE_ENDS = (".", "!", "?", "\n")
+
+
+def _split_point(text: str, limit: int) -> int:
+    """Where to cut `text` so the head fits in one message, preferring a line/word break."""
+    if len(text) <= limit:
+        return len(text)
+    cut = max(text.rfind("\n", 0, limit), text.rfind(" ", 0, limit))
+    return cut + 1 if cut >= limit // 2 else limit
+
+
+class StreamingReply:
+    """
+    Posts a streamed model reply as a Discord reply that grows while the model writes.
+
+    The first message goes out as soon as the first sentence (or `first_chunk_chars`
+    characters) is available; after that the message is edited at most once every
+    `edit_interval` seconds, which keeps well inside Discord's edit rate limit.
+    When the text passes 2000 characters, the current message is finalized and the
+    rest continues in a new reply. After send(), `posted` holds every message with
+    its final text (anything recorded at creation only saw the first sentence).
+    """
+
+    def __init__(self, message: discord.Message, edit_interval: float = 1.0,
+                 first_chunk_chars: int = 200, limit: int = DISCORD_MESSAGE_LIMIT):
+        self.message = message
+        self.edit_interval = edit_interval
+        self.first_chunk_chars = first_chunk_chars
+        self.limit = limit
+
+        self._current: Optional[discord.Message] = None  # Message being edited
+        self._shown = ""  # Text currently visible in _current
+        self._pending = ""  # Text of _current (visible or not) not yet rolled over
+        self._last_edit = 0.0
+        self._posted: Dict[int, Tuple[discord.Message, str]] = {}
+
+    async def send(self, chunks: AsyncIterator[str],
+                   on_first_post: Optional[Callable[[], Awaitable[None]]] = None) -> str:
+        """Consumes `chunks` and returns the full reply text."""
+        full = []
+        async for chunk in chunks:
+            full.append(chunk)
+            self._pending += chunk
+
+            if self._current is None:
+                if self._ready_for_first_post():
+                    await self._post_first(on_first_post)
+                continue
+
+            await self._roll_over()
+            if time.monotonic() - self._last_edit >= self.edit_interval:
+                await self._edit()
+
+        # Stream finished: flush whatever is left
+        if self._current is None:
+            if self._pending.strip():
+                await self._post_first(on_first_post)
+        else:
+            await self._roll_over()
+            await self._edit()
+        if self._current is not None:
+            self._finalize(self._pending[:self.limit])
+        return "".join(full)
+
+    @property
+    def posted(self) -> List[Tuple[discord.Message, str]]:
+        """Messages posted by send(), in order, each with its final text."""
+        return list(self._posted.values())
+
+    def _finalize(self, text: str):
+        self._posted[id(self._current)] = (self._current, text)
+
+    def _ready_for_first_post(self) -> bool:
+        text = self._pending.rstrip(" ")
+        return len(text) >= self.first_chunk_chars or text.endswith(SENTENCE_ENDS)
+
+    async def _post_first(self, on_first_post):
+        await self._post(self._pending[:_split_point(self._pending, self.limit)])
+        if on_first_post:
+            await on_first_post()
+        await self._roll_over()
+
+    async def _post(self, text: str):
+        self._current = await self.message.reply(text)
+        self._shown = text
+        self._last_edit = time.monotonic()
+
+    async def _roll_over(self):
+        """Finalizes the current message and continues in a new one once the text passes the limit."""
+        while len(self._pending) > self.limit:
+            cut = _split_point(self._pending, self.limit)
+            head, rest = self._pending[:cut], self._pending[cut:]
+            if not rest.strip():
+                break  # Only whitespace past the limit so far
+            if head != self._shown:
+                await self._safe_edit(head)
+            self._finalize(head)
+            self._pending = rest
+            await self._post(rest[:_split_point(rest, self.limit)])
+
+    async def _edit(self):
+        if self._shown != self._pending[:self.limit]:
+            await self._safe_edit(self._pending[:self.limit])
+
+    async def _safe_edit(self, text: str):
+        try:
+            await self._current.edit(content=text)
+            self._shown = text
+        except discord.HTTPException as e:
+            logger.warning(f"StreamingReply: failed to edit message: {e}")
+        self._last_edit = time.monotonic()
@@ -1,35 +1,128 @@
+import hashlib
+import re
 import time
-from collections import defaultdict, deque
+from collections import deque
+from typing import Deque, Dict, Optional, Set, Tuple
+
+# Conteúdo repetido: mensagens normalizadas com menos caracteres que isto não contam
+# ("oi", "kkk", "bom dia" se repetem naturalmente entre usuários)
+MIN_DUPLICATE_CHARS = 12
+
+_MENTION = re.compile(r"<@[!&]?\d+>|<#\d+>")
+# Só mensagens com link ou convite contam como cópia entre contas: frases comuns
+# ("boa noite galera") e perguntas repetidas ao bot se repetem naturalmente
+_LINK = re.compile(r"https?://|www\.|discord(?:app)?\.(?:gg|com/invite)/", re.IGNORECASE)
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_content(content: str) -> str:
+    """Minúsculas, sem menções e sem pontuação/espaços extras (cópias levemente alteradas colidem)."""
+    return _NON_WORD.sub(" ", _MENTION.sub(" ", content.lower())).strip()
+
 
 class SpamDetector:
-    def __init__(self, max_messages=5, time_window=5):
+    """
+    Janela deslizante de mensagens por usuário e detector de cópias entre contas.
+
+    Cada usuário guarda só os últimos `max_messages + 1` instantes (é o que basta
+    para saber se passou do limite). A expiração é amortizada: cada mensagem entra
+    em uma fila por tamanho de janela, em ordem de chegada; ao processar uma
+    mensagem, saem da frente só as entradas já vencidas e o usuário é descartado
+    se aquela era a sua última mensagem. Custo constante por mensagem, sem varrer
+    todos os usuários.
+
+    Limites por servidor (guild_settings) sobrescrevem os padrões via
+    set_guild_limits. O mesmo texto com link ou convite (normalizado) enviado por
+    `duplicate_accounts` contas diferentes dentro de `duplicate_window` segundos é
+    tratado como spam a partir dessa cópia.
+    """
+
+    def __init__(self, max_messages=5, time_window=5, duplicate_accounts=3, duplicate_window=30):
         self.max_messages = max_messages
         self.time_window = time_window
-        self.user_messages = defaultdict(deque)
+        self.duplicate_accounts = duplicate_accounts
+        self.duplicate_window = duplicate_window
+        self.guild_limits: Dict[int, Tuple[int, float]] = {}
 
-    def is_spam(self, user_id):
-        current_time = time.time()
+        # (guild_id, user_id) -> instantes das mensagens mais recentes
+        self.user_messages: Dict[Tuple, Deque[float]] = {}
+        # janela -> fila de (instante, chave) em ordem de chegada
+        self._expiry: Dict[float, Deque[Tuple[float, Tuple]]] = {}
 
-        # Limpeza periódica de usuários inativos para evitar memory leak
-        if len(self.user_messages) > 100:
-            inactive = [
-                uid for uid, ts in self.user_messages.items()
-                if not ts or ts[-1] < current_time - self.time_window
-            ]
-            for uid in inactive:
-                del self.user_messages[uid]
+        # (guild_id, hash do conteúdo) -> (primeiro envio, contas que enviaram)
+        self.recent_contents: Dict[Tuple[int, int], Tuple[float, Set[int]]] = {}
+        self._content_expiry: Deque[Tuple[float, Tuple[int, int]]] = deque()
 
-        timestamps = self.user_messages[user_id]
+    def set_guild_limits(self, guild_id, max_messages=None, time_window=None):
+        """Define os limites de um servidor; None volta ao padrão."""
+        if max_messages is None and time_window is None:
+            self.guild_limits.pop(guild_id, None)
+            return
+        self.guild_limits[guild_id] = (
+            max_messages if max_messages is not None else self.max_messages,
+            time_window if time_window is not None else self.time_window,
+        )
+
+    def limits(self, guild_id=None) -> Tuple[int, float]:
+        return self.guild_limits.get(guild_id, (self.max_messages, self.time_window))
+
+    def is_spam(self, user_id, guild_id=None, content: Optional[str] = None):
+        current_time = time.time()
+        self._expire(current_time)
+
+        max_messages, time_window = self.limits(guild_id)
+        key = (guild_id, user_id)
+        timestamps = self.user_messages.get(key)
+        if timestamps is None or timestamps.maxlen != max_messages + 1:
+            # Novo usuário (ou limite do servidor alterado): só as últimas max+1 importam
+            timestamps = self.user_messages[key] = deque(timestamps or (), maxlen=max_messages + 1)
 
         # Remove old timestamps
-        while timestamps and timestamps[0] < current_time - self.time_window:
+        while timestamps and timestamps[0] < current_time - time_window:
             timestamps.popleft()
 
         # Add current timestamp
         timestamps.append(current_time)
+        self._expiry.setdefault(time_window, deque()).append((current_time, key))
 
         # Check if spam
-        if len(timestamps) > self.max_messages:
+        if len(timestamps) > max_messages:
             return True
-        
+
+        if content and guild_id is not None:
+            return self._is_duplicate_flood(guild_id, user_id, content, current_time)
         return False
+
+    def _is_duplicate_flood(self, guild_id, user_id, content: str, current_time: float) -> bool:
+        if not _LINK.search(content):
+            return False
+        normalized = normalize_content(content)
+        if len(normalized) < MIN_DUPLICATE_CHARS:
+            return False
+        digest = int.from_bytes(hashlib.blake2b(normalized.encode(), digest_size=8).digest(), "big")
+        key = (guild_id, digest)
+
+        entry = self.recent_contents.get(key)
+        if entry is None:
+            entry = self.recent_contents[key] = (current_time, set())
+            self._content_expiry.append((current_time, key))
+        users = entry[1]
+        if len(users) < self.duplicate_accounts:
+            users.add(user_id)
+        # As primeiras contas passam; a que completa o limite e qualquer cópia depois dela, não
+        return len(users) >= self.duplicate_accounts
+
+    def _expire(self, current_time: float):
+        for window, queue in self._expiry.items():
+            cutoff = current_time - window
+            while queue and queue[0][0] < cutoff:
+                sent_at, key = queue.popleft()
+                timestamps = self.user_messages.get(key)
+                # Só descarta se esta era a última mensagem do usuário
+                if timestamps is not None and timestamps[-1] == sent_at:
+                    del self.user_messages[key]
+
+        cutoff = current_time - self.duplicate_window
+        while self._content_expiry and self._content_expiry[0][0] < cutoff:
+            _, key = self._content_expiry.popleft()
+            self.recent_contents.pop(key, None)
@@ -8,6 +8,8 @@ logger = logging.getLogger(__name__)
 class StatsAnalyzer:
     def __init__(self, db):
         self.db = db
+        # MemoryManager (optional): its cached profiles are dropped after each analysis
+        self.memory_manager = None
 
     async def execute_analysis_loop(self, guilds):
         """Runs the analysis for all guilds."""
@@ -114,4 +116,6 @@ class StatsAnalyzer:
                         logger.error(f"Failed to update stats for {uid}: {ex}")
 
             await fetch_and_update()
+            if self.memory_manager:
+                self.memory_manager.invalidate_guild_profiles(guild.id)
             logger.info(f"✅ Context stats updated for {guild.name}")
@@ -59,6 +59,28 @@ class TelegramNotifier:
         )
         await self.send(msg)
 
+    async def log_messages_deleted(self, guild, channel, messages, reason: str = "IA"):
+        """Notifica de uma vez várias mensagens deletadas pela moderação no mesmo canal."""
+        if len(messages) == 1:
+            msg = messages[0]
+            await self.log_message_deleted(guild, channel, msg.author, msg.content, reason)
+            return
+        lines = []
+        for msg in messages[:10]:
+            safe_content = msg.content[:100].replace("<", "&lt;").replace(">", "&gt;")
+            lines.append(f"👤 {msg.author} (<code>{msg.author.id}</code>): <code>{safe_content}</code>")
+        if len(messages) > 10:
+            lines.append(f"… e mais {len(messages) - 10} mensagem(ns)")
+        text = (
+            f"🛡️ <b>{len(messages)} Mensagens Deletadas</b>\n"
+            f"🏠 Servidor: {guild.name}\n"
+            f"📢 Canal: #{channel.name}\n"
+            + "\n".join(lines) + "\n"
+            f"⚠️ Motivo: {reason}\n"
+            f"🕒 {self._now()}"
+        )
+        await self.send(text)
+
     async def log_user_warned(self, guild, user, reason: str):
         """Notifica quando um usuário recebe um aviso."""
         msg = (
@@ -0,0 +1,76 @@
+# utils/user_stats_service.py - Cache das estatísticas pessoais (/stats me)
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Tuple
+
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+
+class UserStatsService:
+    """Serve as estatísticas detalhadas de usuário com cache por (guild, usuário, janela).
+
+    Entradas expiram após `ttl` segundos e são descartadas assim que o
+    usuário recebe pontos (PointsManager chama invalidate). Misses simultâneos
+    da mesma chave compartilham uma única consulta (single-flight).
+    """
+
+    def __init__(self, db: Database, ttl: float = 60.0):
+        self.db = db
+        self.ttl = ttl
+        # Formato: {(guild_id, user_id): {days: (expira_em, stats)}}
+        self._cache: Dict[Tuple[int, int], Dict[int, Tuple[float, Dict[str, Any]]]] = {}
+        # Consultas em andamento, no mesmo formato: {(guild_id, user_id): {days: future}}
+        self._inflight: Dict[Tuple[int, int], Dict[int, asyncio.Future]] = {}
+        self._next_prune = 0.0
+
+    async def get_user_stats(self, user_id: int, guild_id: int, days: int = 30) -> Dict[str, Any]:
+        """Retorna as estatísticas do usuário, consultando o banco só em cache miss."""
+        user_key = (guild_id, user_id)
+        now = time.monotonic()
+        cached = self._cache.get(user_key, {}).get(days)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        flights = self._inflight.setdefault(user_key, {})
+        future = flights.get(days)
+        if future is None:
+            future = asyncio.ensure_future(self.db.get_detailed_user_stats(user_id, guild_id, days))
+            flights[days] = future
+            future.add_done_callback(lambda done: self._store(user_key, days, done))
+        # shield: um chamador cancelado não cancela a consulta dos demais
+        return await asyncio.shield(future)
+
+    def _store(self, user_key: Tuple[int, int], days: int, future: asyncio.Future):
+        """Grava o resultado da consulta, a menos que invalidate tenha rodado no meio."""
+        flights = self._inflight.get(user_key)
+        if flights is None or flights.get(days) is not future:
+            return
+        del flights[days]
+        if not flights:
+            del self._inflight[user_key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        now = time.monotonic()
+        self._cache.setdefault(user_key, {})[days] = (now + self.ttl, future.result())
+        self._prune(now)
+
+    def invalidate(self, user_id: int, guild_id: int):
+        """Descarta todas as janelas em cache de um usuário numa guild."""
+        self._cache.pop((guild_id, user_id), None)
+        # Consultas em andamento começaram antes dos pontos novos: não entram no cache
+        self._inflight.pop((guild_id, user_id), None)
+
+    def _prune(self, now: float):
+        """Remove entradas expiradas (no máximo uma varredura por `ttl`)."""
+        if now < self._next_prune:
+            return
+        self._next_prune = now + self.ttl
+        for user_key, windows in list(self._cache.items()):
+            for days in [d for d, (expires, _) in windows.items() if expires <= now]:
+                del windows[days]
+            if not windows:
+                del self._cache[user_key]
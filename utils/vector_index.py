@@ -0,0 +1,130 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # Optional: without numpy the no-pgvector fallback stays "most recent memories"
+    np = None
+
+logger = logging.getLogger(__name__)
+
+
+class _GuildVectors:
+    """Normalized float32 rows of one guild, with spare capacity for O(1) amortized appends."""
+
+    def __init__(self, dim: int, capacity: int = 64):
+        self.size = 0
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.owners = np.zeros(capacity, dtype=np.int64)  # 0 = guild-wide memory
+        self.memories: List[Dict[str, Any]] = []
+
+    def append(self, vector, user_id: Optional[int], memory: Dict[str, Any]):
+        if self.size == len(self.matrix):
+            grow = max(64, len(self.matrix))
+            self.matrix = np.concatenate([self.matrix, np.zeros((grow, self.matrix.shape[1]), np.float32)])
+            self.owners = np.concatenate([self.owners, np.zeros(grow, np.int64)])
+        norm = float(np.linalg.norm(vector))
+        self.matrix[self.size] = vector / norm if norm else vector
+        self.owners[self.size] = user_id or 0
+        self.memories.append(memory)
+        self.size += 1
+
+
+class LocalVectorIndex:
+    """
+    In-process cosine search over bot_memories for databases without pgvector.
+
+    Each guild's embeddings (float32 blobs) are loaded once into a NumPy matrix
+    and searched with a single matrix-vector product; new memories are appended
+    in place. At most `max_guilds` guilds stay loaded, the least recently used
+    one is evicted first and simply reloaded on its next search.
+    """
+
+    def __init__(self, db, max_guilds: int = 64):
+        self.db = db
+        self.max_guilds = max_guilds
+        self._guilds: "OrderedDict[int, _GuildVectors]" = OrderedDict()
+        self._loading: Dict[int, asyncio.Future] = {}
+        self._generation: Dict[int, int] = {}  # Bumped by writes that race with a load
+
+    @staticmethod
+    def available() -> bool:
+        return np is not None
+
+    async def search(self, guild_id: int, embedding: List[float], user_id: Optional[int],
+                     limit: int = 3) -> List[Dict[str, Any]]:
+        """Top `limit` memories of the user or guild-wide, same shape as Database.search_memories."""
+        index = await self._load(guild_id)
+        if index is None or not index.size:
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if norm:
+            query /= norm
+        scores = index.matrix[:index.size] @ query
+        owners = index.owners[:index.size]
+        scores[(owners != (user_id or 0)) & (owners != 0)] = -np.inf
+
+        k = min(limit, index.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {**index.memories[i], "similarity": float(scores[i])}
+            for i in top if scores[i] != -np.inf
+        ]
+
+    def add(self, guild_id: int, user_id: Optional[int], content: str, embedding: List[float], created_at=None):
+        """Appends a freshly stored memory to the guild's matrix (if it is loaded)."""
+        self._generation[guild_id] = self._generation.get(guild_id, 0) + 1
+        index = self._guilds.get(guild_id)
+        if index is not None:
+            index.append(np.asarray(embedding, dtype=np.float32), user_id,
+                         {"content": content, "created_at": created_at})
+
+    def invalidate(self, guild_id: Optional[int] = None):
+        """Drops a guild (or every guild) so the next search reloads it from the database."""
+        if guild_id is None:
+            self._guilds.clear()
+            for gid in list(self._generation):
+                self._generation[gid] += 1
+            return
+        self._guilds.pop(guild_id, None)
+        self._generation[guild_id] = self._generation.get(guild_id, 0) + 1
+
+    async def _load(self, guild_id: int) -> Optional[_GuildVectors]:
+        index = self._guilds.get(guild_id)
+        if index is not None:
+            self._guilds.move_to_end(guild_id)
+            return index
+
+        future = self._loading.get(guild_id)
+        if future is None:
+            future = asyncio.ensure_future(self._read(guild_id))
+            self._loading[guild_id] = future
+            future.add_done_callback(lambda _: self._loading.pop(guild_id, None))
+        try:
+            return await asyncio.shield(future)
+        except Exception as e:
+            logger.error(f"Error loading memory vectors for guild {guild_id}: {e}")
+            return None
+
+    async def _read(self, guild_id: int) -> _GuildVectors:
+        generation = self._generation.get(guild_id, 0)
+        rows = await self.db.get_memory_vectors(guild_id)
+        # embedding_blob: float32 little-endian (Database._pack_embedding_blob)
+        vectors = [np.frombuffer(row["embedding_blob"], dtype="<f4") for row in rows]
+        dim = len(vectors[0]) if vectors else 768
+        index = _GuildVectors(dim, capacity=max(64, len(rows)))
+        for row, vector in zip(rows, vectors):
+            if len(vector) == dim:
+                index.append(vector, row["user_id"], {"content": row["content"], "created_at": row["created_at"]})
+
+        # A write during the read may be missing from the rows: serve them, but do not cache
+        if self._generation.get(guild_id, 0) == generation:
+            self._guilds[guild_id] = index
+            while len(self._guilds) > self.max_guilds:
+                self._guilds.popitem(last=False)
+        return index
@@ -0,0 +1,88 @@
+# utils/voice_sessions.py - Registro em memória das sessões de voz abertas
+
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class VoiceSession(NamedTuple):
+    id: int
+    channel_id: int
+    joined_at: datetime
+
+
+class VoiceSessionRegistry:
+    """Sessões de voz abertas por (guild, usuário), com a chave primária da linha no banco.
+
+    Cada transição é uma única escrita indexada: entrar é um INSERT ... RETURNING,
+    sair é um UPDATE pela chave primária (id, joined_at) e trocar de canal fecha e
+    abre no mesmo comando. Sem a sessão no registro (ex.: a entrada falhou), a
+    saída cai no UPDATE antigo por usuário/canal.
+
+    Na inicialização reconcile() fecha as sessões que ficaram abertas e abre as
+    dos membros que estão em voz agora; checkpoint() grava periodicamente o tempo
+    corrido, que é onde uma sessão interrompida por queda é fechada.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        # Formato: {(guild_id, user_id): VoiceSession}
+        self._sessions: Dict[Tuple[int, int], VoiceSession] = {}
+
+    def get(self, guild_id: int, user_id: int) -> Optional[VoiceSession]:
+        return self._sessions.get((guild_id, user_id))
+
+    async def join(self, guild_id: int, user_id: int, channel_id: int):
+        """Abre a sessão do usuário no canal."""
+        row = await self.db.open_voice_session(user_id, channel_id, guild_id)
+        self._sessions[(guild_id, user_id)] = VoiceSession(row["id"], channel_id, row["joined_at"])
+
+    async def leave(self, guild_id: int, user_id: int, channel_id: int):
+        """Fecha a sessão do usuário pela chave primária."""
+        session = self._sessions.pop((guild_id, user_id), None)
+        if session is None or session.channel_id != channel_id:
+            await self.db.update_voice_leave(user_id, channel_id)
+            return
+        await self.db.close_voice_session(session.id, session.joined_at)
+
+    async def move(self, guild_id: int, user_id: int, from_channel_id: int, to_channel_id: int):
+        """Troca de canal: fecha a sessão atual e abre a nova em um só comando."""
+        session = self._sessions.pop((guild_id, user_id), None)
+        if session is None or session.channel_id != from_channel_id:
+            await self.db.update_voice_leave(user_id, from_channel_id)
+            await self.join(guild_id, user_id, to_channel_id)
+            return
+        row = await self.db.move_voice_session(
+            session.id, session.joined_at, user_id, to_channel_id, guild_id
+        )
+        self._sessions[(guild_id, user_id)] = VoiceSession(row["id"], to_channel_id, row["joined_at"])
+
+    async def checkpoint(self):
+        """Grava o tempo corrido de todas as sessões abertas em um único UPDATE."""
+        sessions = list(self._sessions.values())
+        await self.db.checkpoint_voice_sessions(
+            [s.id for s in sessions], [s.joined_at for s in sessions]
+        )
+
+    async def reconcile(self, guilds: Iterable) -> Tuple[int, int]:
+        """
+        Fecha as sessões abertas de antes da inicialização e reabre as dos membros em voz.
+
+        Returns:
+            (sessões fechadas, sessões abertas)
+        """
+        members = []
+        for guild in guilds:
+            for channel in list(guild.voice_channels) + list(guild.stage_channels):
+                for member in channel.members:
+                    if not member.bot:
+                        members.append((member.id, member.name, channel.id, guild.id))
+
+        result = await self.db.reconcile_voice_sessions(members)
+        self._sessions = {
+            (row["guild_id"], row["user_id"]): VoiceSession(row["id"], row["channel_id"], row["joined_at"])
+            for row in result["opened"]
+        }
+        return result["closed"], len(self._sessions)